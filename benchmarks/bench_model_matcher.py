@@ -0,0 +1,132 @@
+"""
+Benchmark for the trigram model matcher against a plain process.extractOne scan.
+
+Builds synthetic catalogs of model names (10k, 100k and 1M by default), then
+times ModelMatcher.extract_one on chat-style messages and reports build time,
+p50/p99 latency and how often the accept/reject decision (score > 78) and the
+accepted model agree with the full scan. Short replies ("ok", "x5", "4") have
+too few trigrams to rank names by and take their own path, so they are timed
+and checked separately. The full scan is O(n) per message,
+so it only runs on a few messages and only up to --scan-max-size names.
+
+    python benchmarks/bench_model_matcher.py
+    python benchmarks/bench_model_matcher.py --sizes 10000 100000 --queries 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+warnings.filterwarnings('ignore')  # fuzzywuzzy warns when python-Levenshtein is missing
+
+from fuzzywuzzy import process
+
+from create_large_db import models
+from model_matcher import MATCH_THRESHOLD, ModelMatcher
+
+TRIMS = ['LX', 'EX', 'SE', 'GT', 'XLE', 'Sport', 'Limited', 'Hybrid', 'Touring', 'Premium']
+TEMPLATES = [
+    "tell me about the {}",
+    "how much is the {}",
+    "what is the mileage of {}",
+    "{} price in bdt",
+    "engine of the {}",
+    "is the {} available in india",
+]
+
+SHORT_MESSAGES = ["ok", "yes", "no", "x5", "4", "y", "hi", "k", "ok thanks", "go on", "es", "gt"]
+
+
+def synthetic_names(count, seed):
+    rng = random.Random(seed)
+    base = [model for model_list in models.values() for model in model_list]
+    names = list(base)
+    seen = set(names)
+    while len(names) < count:
+        name = f"{rng.choice(base)} {rng.choice(TRIMS)} {rng.randint(100, 99999)}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names[:count]
+
+
+def misspell(name, rng):
+    if len(name) < 5 or rng.random() < 0.5:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1:]
+
+
+def chat_messages(names, count, seed):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(misspell(rng.choice(names), rng)) for _ in range(count)]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def decision(result):
+    return result[0] if result and result[1] > MATCH_THRESHOLD else None
+
+
+def time_messages(matcher, names, messages, scan_queries):
+    """(latencies in ms, full scan ms per message, agreeing decisions) for one set of messages."""
+    latencies = []
+    results = []
+    for message in messages:
+        start = time.perf_counter()
+        results.append(matcher.extract_one(message))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    scan_ms = []
+    agree = 0
+    for message, result in zip(messages[:scan_queries], results):
+        start = time.perf_counter()
+        expected = process.extractOne(message, names)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+        agree += decision(expected) == decision(result)
+    return latencies, scan_ms, agree
+
+
+def run(size, queries, scan_queries, seed):
+    """Times one catalog size and prints a result line for chat messages and one for short replies."""
+    names = synthetic_names(size, seed)
+    messages = chat_messages(names, queries, seed + 1)
+
+    start = time.perf_counter()
+    matcher = ModelMatcher(names)
+    build_s = time.perf_counter() - start
+
+    for label, batch, scans in (('chat', messages, scan_queries),
+                                ('short', SHORT_MESSAGES, len(SHORT_MESSAGES) if scan_queries else 0)):
+        latencies, scan_ms, agree = time_messages(matcher, names, batch, scans)
+        print(f"{size:>9,} names {label:<5} | build {build_s:6.2f}s | "
+              f"indexed p50 {statistics.median(latencies):8.2f} ms  p99 {percentile(latencies, 99):8.2f} ms | "
+              + (f"full scan {statistics.mean(scan_ms):10.1f} ms/msg | agreement {agree}/{len(scan_ms)}"
+                 if scan_ms else "full scan skipped"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200, help="messages timed per size")
+    parser.add_argument('--scan-queries', type=int, default=20,
+                        help="messages also run through the full extractOne scan (0 to skip)")
+    parser.add_argument('--scan-max-size', type=int, default=10_000,
+                        help="largest catalog that is also checked with the full scan")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        scan_queries = args.scan_queries if size <= args.scan_max_size else 0
+        run(size, args.queries, scan_queries, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark for the chatbot's hot path: parse -> filter -> render, and /ask end to end.
+
+For each catalog size (synthetic catalogs from create_large_db.py), times
+parse_user_input, filter_cars, format_price, every generate_response intent
+and the /ask route through Flask's test client, both on a cold response cache
+and on repeats. Reports calls/s and p50/p99 latency per operation.
+
+--save writes the results as JSON. --baseline compares them with an earlier
+save and exits with status 1 if an operation's p50 got slower by more than
+--tolerance (a fraction, 0.25 = 25%) and by at least --ignore-below-us
+microseconds, so timer noise on sub-microsecond operations is not a regression.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 --save after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+warnings.filterwarnings('ignore')  # fuzzywuzzy warns when python-Levenshtein is missing
+
+import flask_app
+from car_store import CarStore
+from create_large_db import generate_large_catalog
+
+CURRENCIES = ['USD', 'BDT', 'EUR', 'INR']
+MODEL_TEMPLATES = {
+    'get_price': "how much is the {}",
+    'get_mileage': "what is the mileage of the {}",
+    'get_engine': "what engine does the {} have",
+    'get_availability': "where is the {} available",
+    'get_all_info': "tell me about the {}",
+}
+OTHER_MESSAGES = [
+    "hello",
+    "thanks",
+    "bye",
+    "ok",
+    "tell me about toyota",
+    "recommend me the cheapest suv",
+    "what is the most fuel efficient sedan",
+    "show me trucks under 30000",
+    "find bmw cars over 60000 in eur",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(function, inputs, min_seconds, min_calls):
+    """Calls function(*args) over inputs round-robin until both minimums are met."""
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_calls or time.perf_counter() - started < min_seconds:
+        args = inputs[len(latencies) % len(inputs)]
+        start = time.perf_counter()
+        function(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    total_s = sum(latencies) / 1000
+    return {
+        'calls': len(latencies),
+        'calls_per_s': len(latencies) / max(total_s, 1e-9),
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def build_catalog(size, seed, directory):
+    path = os.path.join(directory, f'cars_{size}.csv')
+    if not os.path.exists(path):
+        generate_large_catalog(path, size, seed=seed, workers=1)
+    car_data = CarStore.from_csv(path)
+    car_data.freeze()
+    return car_data
+
+
+def workload(car_data, queries, seed):
+    """Chat messages for every intent, with real model names from the catalog."""
+    rng = random.Random(seed)
+    models = list(car_data.keys('Model'))
+    messages = {intent: [template.format(rng.choice(models)) for _ in range(queries)]
+                for intent, template in MODEL_TEMPLATES.items()}
+    messages['other'] = OTHER_MESSAGES
+    return messages
+
+
+def run_size(car_data, queries, seed, min_seconds, min_calls):
+    messages = workload(car_data, queries, seed)
+    all_messages = [message for group in messages.values() for message in group]
+    bench = lambda function, inputs: measure(function, inputs, min_seconds, min_calls)
+    results = {}
+
+    results['parse_user_input'] = bench(flask_app.parse_user_input, [(m, car_data) for m in all_messages])
+
+    parsed = [flask_app.parse_user_input(m, car_data) for m in OTHER_MESSAGES]
+    filters = [(details, car_data) for intent, details in parsed if intent == 'filter_cars']
+    results['filter_cars'] = bench(flask_app.filter_cars, filters)
+
+    prices = car_data.numbers('Price_Base_USD')
+    results['format_price'] = bench(flask_app.format_price,
+                                    [(prices[row_id], currency) for row_id in range(min(len(car_data), 200))
+                                     for currency in CURRENCIES])
+
+    # generate_response per intent, with the details the parser produces for it.
+    by_intent = {}
+    for message in all_messages:
+        intent, details = flask_app.parse_user_input(message, car_data)
+        if intent in MODEL_TEMPLATES:
+            details = flask_app.get_car_details(details, car_data) if details else None
+        by_intent.setdefault(intent, []).append((intent, details, 'USD', car_data))
+    for intent, inputs in sorted(by_intent.items(), key=lambda item: str(item[0])):
+        results[f'generate_response[{intent}]'] = bench(flask_app.generate_response, inputs)
+
+    # /ask through the test client: every call a cache miss, then repeats served from the cache.
+    flask_app.publish_knowledge_base(car_data)
+    client = flask_app.app.test_client()
+    ask = lambda message: client.post('/ask', json={'message': message})
+    def ask_cold(message):
+        flask_app.RESPONSE_CACHE.clear()
+        ask(message)
+    results['/ask'] = bench(ask_cold, [(m,) for m in all_messages])
+    results['/ask (cached)'] = bench(ask, [(m,) for m in OTHER_MESSAGES])
+    return results
+
+
+def compare(results, baseline, tolerance, ignore_below_us=0.0):
+    """Lines describing operations whose p50 regressed beyond tolerance and by at least ignore_below_us."""
+    regressions = []
+    for size, operations in results.items():
+        for name, current in operations.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous or (current['p50_ms'] - previous['p50_ms']) * 1000 < ignore_below_us:
+                continue
+            if current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{size:>9} {name}: p50 {previous['p50_ms'] * 1000:.1f} -> {current['p50_ms'] * 1000:.1f} µs "
+                                   f"({current['p50_ms'] / max(previous['p50_ms'], 1e-9) - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=50, help="messages generated per model intent")
+    parser.add_argument('--min-seconds', type=float, default=0.5, help="minimum time spent per operation")
+    parser.add_argument('--min-calls', type=int, default=100, help="minimum calls per operation")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--catalog-dir', help="where generated catalogs are kept (default: a temporary directory)")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file from an earlier --save to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--ignore-below-us', type=float, default=5.0,
+                        help="p50 slowdowns smaller than this many microseconds are never regressions")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        catalog_dir = args.catalog_dir or temporary_dir
+        os.makedirs(catalog_dir, exist_ok=True)
+        results = {}
+        for size in args.sizes:
+            car_data = build_catalog(size, args.seed, catalog_dir)
+            results[str(size)] = run_size(car_data, args.queries, args.seed, args.min_seconds, args.min_calls)
+            print(f"\n{size:,} cars")
+            for name, result in results[str(size)].items():
+                print(f"  {name:<42} {result['calls_per_s']:>10,.0f} calls/s | "
+                      f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms")
+
+    if args.save:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created_at': time.time(),
+            'settings': {'queries': args.queries, 'seed': args.seed},
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nSaved results to '{args.save}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance, args.ignore_below_us)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against '{args.baseline}':")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions against '{args.baseline}' "
+              f"(tolerance {args.tolerance:.0%}, ignoring changes under {args.ignore_below_us:g} µs).")
+
+
+if __name__ == '__main__':
+    main()
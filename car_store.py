@@ -0,0 +1,686 @@
+"""
+Columnar, typed in-memory store for the car catalog.
+
+Each column of cars.csv is parsed once at load time. Numeric columns keep
+their values in typed arrays, and repeated strings are dictionary-encoded
+so a million rows cost a few bytes per cell instead of a dict per car.
+"""
+import csv
+import heapq
+import os
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping
+from itertools import islice
+
+from filter_engine import column_bounds, mask_select, numpy
+from model_matcher import ModelMatcher
+
+CSV_COLUMNS = [
+    'Company', 'Model', 'Year', 'Mileage_kmpl', 'Engine_CC', 'Type',
+    'Price_Base_USD', 'Price_TopTrim_USD', 'Available_Countries', 'Image_URL', 'Notes'
+]
+
+# Parsed into floats once; the original text is kept for display.
+NUMERIC_COLUMNS = ('Year', 'Mileage_kmpl', 'Engine_CC', 'Price_Base_USD', 'Price_TopTrim_USD')
+
+# Mostly unique per row, so dictionary encoding would only add overhead.
+PLAIN_COLUMNS = ('Model', 'Image_URL')
+
+# Hash indexes from a key to the row ids holding it. Model names are matched
+# exactly; company and type are matched on their lowercase form like the parser does.
+INDEXED_COLUMNS = {
+    'Model': str,
+    'Company': str.lower,
+    'Type': str.lower,
+}
+
+# Numeric columns that keep a sorted index for range queries (used when numpy is not installed).
+SORTED_COLUMNS = ('Price_Base_USD', 'Price_TopTrim_USD', 'Mileage_kmpl', 'Engine_CC', 'Year')
+
+# Without numpy, select() intersects its candidate lists as sets when they hold fewer than
+# this many rows per probe it would otherwise make (a set row costs about a third of a probe).
+SET_INTERSECT_RATIO = 3
+
+# Materialized top-k rankings, kept overall and per Type. Each ranking orders
+# rows by value * direction (ties by row id), so the best row is always first.
+RANKINGS = {
+    'price_asc': ('Price_Base_USD', 1),
+    'mileage_desc': ('Mileage_kmpl', -1),
+}
+TOP_K = 10
+
+# Rows read from a CSV per chunk while loading.
+CHUNK_ROWS = 50_000
+
+NAN = float('nan')
+
+
+def resident_memory_mb():
+    """The process's resident memory in MB, or None where it cannot be read cheaply."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current size; ru_maxrss is in KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def parse_number(text):
+    try:
+        return float(text)
+    except (ValueError, TypeError):
+        return NAN
+
+
+# --- Column types ---
+class DictColumn:
+    """A string column stored as one integer code per row plus one copy of each distinct value."""
+    __slots__ = ('values', 'codes', '_lookup')
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('I')
+        self._lookup = {}
+
+    def encode(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self._lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.encode(value))
+
+    def extend(self, values):
+        lookup, encode = self._lookup, self.encode
+        codes = []
+        for value in values:
+            code = lookup.get(value)
+            codes.append(encode(value) if code is None else code)
+        self.codes.extend(codes)
+
+    def set(self, row_id, value):
+        self.codes[row_id] = self.encode(value)
+
+    def __getitem__(self, row_id):
+        return self.values[self.codes[row_id]]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class NumericColumn:
+    """A numeric column: float values in a typed array, NaN where the text is not a number."""
+    __slots__ = ('numbers', 'text')
+
+    def __init__(self):
+        self.numbers = array('d')
+        self.text = DictColumn()
+
+    def append(self, value):
+        self.numbers.append(parse_number(value))
+        self.text.append(value)
+
+    def extend(self, values):
+        self.numbers.extend(map(parse_number, values))
+        self.text.extend(values)
+
+    def set(self, row_id, value):
+        self.numbers[row_id] = parse_number(value)
+        self.text.set(row_id, value)
+
+    def __getitem__(self, row_id):
+        return self.text[row_id]
+
+    def __len__(self):
+        return len(self.numbers)
+
+
+class PlainColumn:
+    """A string column stored as-is."""
+    __slots__ = ('values',)
+
+    def __init__(self):
+        self.values = []
+
+    def append(self, value):
+        self.values.append(value)
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def set(self, row_id, value):
+        self.values[row_id] = value
+
+    def __getitem__(self, row_id):
+        return self.values[row_id]
+
+    def __len__(self):
+        return len(self.values)
+
+
+def make_column(name):
+    if name in NUMERIC_COLUMNS:
+        return NumericColumn()
+    if name in PLAIN_COLUMNS:
+        return PlainColumn()
+    return DictColumn()
+
+
+# --- Hash index ---
+class HashIndex:
+    """Maps a key to the row ids holding it, kept in catalog order.
+
+    A key held by a single row stores the bare row id, so a mostly unique column
+    like Model costs one dict entry per row rather than one array per row.
+    """
+    __slots__ = ('rows',)
+
+    def __init__(self, rows=None):
+        self.rows = {} if rows is None else rows
+
+    def get(self, key):
+        row_ids = self.rows.get(key)
+        if row_ids is None:
+            return ()
+        return (row_ids,) if type(row_ids) is int else row_ids
+
+    def keys(self):
+        return self.rows.keys()
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, key, row_id):
+        """Adds row_id under key. Returns True if the key is new."""
+        row_ids = self.rows.get(key)
+        if row_ids is None:
+            self.rows[key] = row_id
+            return True
+        if not isinstance(row_ids, array):
+            row_ids = self.rows[key] = array('I', (row_ids,) if type(row_ids) is int else row_ids)
+        if row_ids[-1] > row_id:
+            row_ids.insert(bisect_left(row_ids, row_id), row_id)
+        else:
+            row_ids.append(row_id)
+        return False
+
+    def remove(self, key, row_id):
+        """Removes row_id from key. Returns True if the key is gone."""
+        row_ids = self.rows[key]
+        if type(row_ids) is int:
+            del self.rows[key]
+            return True
+        row_ids = array('I', row_ids)
+        row_ids.remove(row_id)
+        self.rows[key] = row_ids[0] if len(row_ids) == 1 else row_ids
+        return False
+
+
+# --- Sorted index ---
+class SortedIndex:
+    """Row ids of a numeric column ordered by value (ties by row id), for binary-searched range queries.
+
+    Rows whose value is NaN are left out, so they never satisfy a range.
+    """
+    __slots__ = ('keys', 'row_ids')
+
+    def __init__(self, numbers):
+        order = sorted((row_id for row_id, value in enumerate(numbers) if value == value), key=numbers.__getitem__)
+        self.row_ids = array('I', order)
+        self.keys = array('d', [numbers[row_id] for row_id in order])
+
+    @classmethod
+    def from_arrays(cls, keys, row_ids):
+        """An index over already sorted keys and their row ids (used when loading a snapshot)."""
+        index = cls.__new__(cls)
+        index.keys = keys
+        index.row_ids = row_ids
+        return index
+
+    def _position(self, key, row_id):
+        low = bisect_left(self.keys, key)
+        high = bisect_right(self.keys, key, low)
+        return bisect_left(self.row_ids, row_id, low, high)
+
+    def insert(self, key, row_id):
+        if key != key:
+            return
+        position = self._position(key, row_id)
+        self.keys.insert(position, key)
+        self.row_ids.insert(position, row_id)
+
+    def remove(self, key, row_id):
+        if key != key:
+            return
+        position = self._position(key, row_id)
+        del self.keys[position]
+        del self.row_ids[position]
+
+    def between(self, above=None, below=None):
+        """Row ids with above < value < below, in value order. Either bound may be None."""
+        start = 0 if above is None else bisect_right(self.keys, above)
+        end = len(self.keys) if below is None else bisect_left(self.keys, below, start)
+        return self.row_ids[start:max(start, end)]
+
+    def span(self, bounds):
+        """(start, end) positions of the values within bounds (a filter_engine.Bounds); empty if end <= start."""
+        start = (bisect_left if bounds.low_inclusive else bisect_right)(self.keys, bounds.low)
+        end = (bisect_right if bounds.high_inclusive else bisect_left)(self.keys, bounds.high, start)
+        return start, end
+
+    def within(self, bounds):
+        """Row ids whose value is within bounds, in value order."""
+        start, end = self.span(bounds)
+        return self.row_ids[start:max(start, end)]
+
+    def __len__(self):
+        return len(self.row_ids)
+
+
+# --- Row view ---
+class CarRow(Mapping):
+    """A read-only view of one row that behaves like the old per-car dict."""
+    __slots__ = ('_store', 'row_id')
+
+    def __init__(self, store, row_id):
+        self._store = store
+        self.row_id = row_id
+
+    def __getitem__(self, key):
+        return self._store.column(key)[self.row_id]
+
+    def __iter__(self):
+        return iter(self._store.columns)
+
+    def __len__(self):
+        return len(self._store.columns)
+
+    def number(self, key):
+        """Returns the parsed value of a numeric column without touching the text."""
+        return self._store.numbers(key)[self.row_id]
+
+    def __repr__(self):
+        return f"CarRow({self.row_id}, {dict(self)!r})"
+
+
+# --- The store ---
+class CarStore:
+    def __init__(self, columns=CSV_COLUMNS):
+        self.columns = list(columns)
+        self._columns = {name: make_column(name) for name in self.columns}
+        self._indexes = {name: HashIndex() for name in INDEXED_COLUMNS if name in self._columns}
+        # Dictionary codes behind each index key, so a row can be tested against a key in O(1).
+        self._index_codes = {name: {} for name in self._indexes if isinstance(self._columns[name], DictColumn)}
+        self._sorted = {}
+        self._rankings = {}  # (sort_by, type key or None) -> sorted [(rank, row_id)], at most TOP_K long
+        self._rankings_live = False
+        self.model_matcher = None
+        self.key_generation = 0  # bumped whenever an index gains or loses a key
+        self._frozen = False
+        self.load_stats = None
+        self.snapshot_buffer = None  # the mapped snapshot file backing the arrays, if loaded from one
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row_id in range(self._size):
+            yield CarRow(self, row_id)
+
+    def __getitem__(self, row_id):
+        if not 0 <= row_id < self._size:
+            raise IndexError(row_id)
+        return CarRow(self, row_id)
+
+    def column(self, name):
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def numbers(self, name):
+        """The typed array of parsed values for a numeric column."""
+        return self.column(name).numbers
+
+    def values(self, name, row_ids):
+        """The text of one column for many rows."""
+        column = self.column(name)
+        return [column[row_id] for row_id in row_ids]
+
+    # --- Hash indexes ---
+    def lookup(self, name, key):
+        """Row ids whose value in an indexed column matches key, in catalog order."""
+        return self._indexes[name].get(key)
+
+    def keys(self, name):
+        """The distinct (normalised) values of an indexed column, in first-seen order."""
+        return self._indexes[name].keys()
+
+    def find(self, name, key):
+        """The first row matching key in an indexed column, or None."""
+        row_ids = self.lookup(name, key)
+        return CarRow(self, row_ids[0]) if row_ids else None
+
+    def _index_row(self, name, row_id):
+        column = self._columns[name]
+        key = INDEXED_COLUMNS[name](column[row_id])
+        if name in self._index_codes:
+            # Codes are never removed: a code always decodes to the same value, so it stays valid.
+            codes = self._index_codes[name].get(key)
+            if codes is None:
+                codes = self._index_codes[name][key] = set()
+            codes.add(column.codes[row_id])
+        if name == 'Model' and self.model_matcher is not None:
+            self.model_matcher.add(key)
+        if self._indexes[name].add(key, row_id):
+            self.key_generation += 1
+
+    def _unindex_row(self, name, row_id):
+        key = INDEXED_COLUMNS[name](self._columns[name][row_id])
+        if self._indexes[name].remove(key, row_id):
+            self.key_generation += 1
+            if name == 'Model' and self.model_matcher is not None:
+                self.model_matcher.remove(key)
+
+    def build_indexes(self):
+        """Builds the sorted indexes and top-k rankings once; later appends and updates keep them current."""
+        self.build_sorted_indexes()
+        for sort_by in self._ranking_names():
+            for group in self._groups():
+                self._rebuild_ranking(sort_by, group)
+        if 'Model' in self._indexes:
+            self.model_matcher = ModelMatcher(self.keys('Model'))
+        self._rankings_live = True
+
+    def start_live_indexes(self):
+        """Keeps the rankings and model matcher current from now on, for stores filled in chunks.
+
+        The sorted indexes are left to build_sorted_indexes(): inserting into them row by
+        row costs O(n) per row, while one sort at the end costs O(n log n) in total.
+        """
+        for sort_by in self._ranking_names():
+            for group in self._groups():
+                self._rebuild_ranking(sort_by, group)
+        if 'Model' in self._indexes and self.model_matcher is None:
+            self.model_matcher = ModelMatcher(self.keys('Model'))
+        self._rankings_live = True
+
+    def build_sorted_indexes(self):
+        for name in SORTED_COLUMNS:
+            if name in self._columns:
+                self._sorted[name] = SortedIndex(self.numbers(name))
+
+    # --- Sorted indexes and range queries ---
+    def sorted_index(self, name):
+        if name not in self._sorted:
+            self._sorted[name] = SortedIndex(self.numbers(name))
+        return self._sorted[name]
+
+    def select(self, equals=None, conditions=()):
+        """Row ids, in catalog order, matching every equality key and numeric comparison.
+
+        equals maps an indexed column to a key (normalised like the index);
+        conditions are (numeric column, op, value) triples, op being one of
+        filter_engine.COMPARISONS. With numpy installed, every constraint is
+        evaluated as a boolean mask over all rows at once. Otherwise each constraint
+        gives a candidate list from a hash or sorted index; the smallest drives the
+        scan and the other constraints are probed per candidate in O(1), so the cost
+        is O(log n + k) for the smallest k, unless the lists are close enough in size
+        to intersect as sets.
+        """
+        equals = equals or {}
+        ranges = column_bounds(conditions)
+        if not equals and not ranges:
+            return range(self._size)
+        if numpy is not None:
+            return self._mask_select(equals, ranges)
+
+        # Counting a range's candidates is a binary search; they are only copied out if used.
+        sources = []
+        for name, key in equals.items():
+            sources.append((len(self.lookup(name, key)), 'equals', name, key))
+        for name, bounds in ranges.items():
+            start, end = self.sorted_index(name).span(bounds)
+            if end - start < self._size:  # a range every row is in constrains nothing
+                sources.append((max(0, end - start), 'range', name, bounds))
+        if not sources:
+            return range(self._size)
+        sources.sort(key=lambda source: source[0])
+        driver_size, driver_kind, driver_name, driver_key = sources[0]
+        if not driver_size:
+            return []
+        driver = self._candidates(driver_kind, driver_name, driver_key)
+        others = sources[1:]
+        if sum(source[0] for source in others) < SET_INTERSECT_RATIO * driver_size * len(others):
+            # Every list is about as long as the driver: intersecting them in C beats probing in Python.
+            candidates = set(driver)
+            for _, kind, name, key in others:
+                candidates.intersection_update(self._candidates(kind, name, key))
+            return sorted(candidates)
+
+        probes = []
+        for _, kind, name, key in others:
+            if kind == 'range':
+                probes.append(key.probe(self.numbers(name)))
+            else:
+                probes.append(self._equals_probe(name, key))
+        row_ids = [row_id for row_id in driver if all(probe(row_id) for probe in probes)]
+        if driver_kind == 'range':
+            row_ids.sort()
+        return row_ids
+
+    def _candidates(self, kind, name, key):
+        if kind == 'range':
+            return self.sorted_index(name).within(key)
+        return self.lookup(name, key)
+
+    def _mask_select(self, equals, ranges):
+        code_matches, row_matches = [], []
+        for name, key in equals.items():
+            if name in self._index_codes:
+                code_matches.append((self._columns[name].codes, self._index_codes[name].get(key, ())))
+            else:
+                row_matches.append(self.lookup(name, key))
+        return mask_select(self._size, code_matches, row_matches,
+                           [(self.numbers(name), bounds) for name, bounds in ranges.items()])
+
+    def _equals_probe(self, name, key):
+        if name in self._index_codes:
+            codes = self._index_codes[name].get(key, ())
+            column_codes = self._columns[name].codes
+            return lambda row_id: column_codes[row_id] in codes
+        member_rows = set(self.lookup(name, key))
+        return member_rows.__contains__
+
+    # --- Top-k rankings ---
+    def top(self, sort_by, car_type=None):
+        """The best row for a ranking, overall or within one (lowercase) type, or None."""
+        ranking = self._rankings.get((sort_by, car_type))
+        return CarRow(self, ranking[0][1]) if ranking else None
+
+    def _ranking_names(self):
+        return [sort_by for sort_by, (name, _) in RANKINGS.items() if name in self._columns]
+
+    def _groups(self, row_id=None):
+        """Ranking groups: None for the whole catalog plus each type (or just the row's type)."""
+        if 'Type' not in self._indexes:
+            return [None]
+        if row_id is None:
+            return [None, *self.keys('Type')]
+        return [None, INDEXED_COLUMNS['Type'](self._columns['Type'][row_id])]
+
+    def _rank(self, sort_by, row_id):
+        name, direction = RANKINGS[sort_by]
+        value = self.numbers(name)[row_id]
+        return None if value != value else (direction * value, row_id)
+
+    def _rebuild_ranking(self, sort_by, group):
+        row_ids = range(self._size) if group is None else self.lookup('Type', group)
+        ranks = (self._rank(sort_by, row_id) for row_id in row_ids)
+        self._rankings[(sort_by, group)] = heapq.nsmallest(TOP_K, (rank for rank in ranks if rank is not None))
+
+    def _rerank(self, sort_by, group, row_id, old_rank):
+        """Moves one row within a ranking after it was added or changed.
+
+        old_rank is the row's rank in this group before the change (None if it was
+        not in the group). A member that got worse or left may uncover a row outside
+        the top k, so only then is the group re-ranked from scratch.
+        """
+        ranking = self._rankings.setdefault((sort_by, group), [])
+        new_rank = self._rank(sort_by, row_id) if group in self._groups(row_id) else None
+        if old_rank is not None:
+            position = bisect_left(ranking, old_rank)
+            if position < len(ranking) and ranking[position] == old_rank:
+                if new_rank is None or new_rank > old_rank:
+                    self._rebuild_ranking(sort_by, group)
+                    return
+                del ranking[position]
+        if new_rank is not None and (len(ranking) < TOP_K or new_rank < ranking[-1]):
+            insort(ranking, new_rank)
+            del ranking[TOP_K:]
+
+    # --- Mutation ---
+    def freeze(self):
+        """Makes the store read-only, so it can be shared as a published snapshot."""
+        self._frozen = True
+
+    def _check_writable(self):
+        if self._frozen:
+            raise RuntimeError("This car catalog is a published snapshot and cannot be changed.")
+
+    def append(self, row):
+        """Adds a row given as a dict of strings and returns its row id."""
+        self._check_writable()
+        row_id = self._size
+        for name, column in self._columns.items():
+            column.append(row.get(name) or '')
+        self._size += 1
+        for name in self._indexes:
+            self._index_row(name, row_id)
+        for name, index in self._sorted.items():
+            index.insert(self.numbers(name)[row_id], row_id)
+        if self._rankings_live:
+            for sort_by in self._ranking_names():
+                for group in self._groups(row_id):
+                    self._rerank(sort_by, group, row_id, None)
+        return row_id
+
+    def extend(self, rows):
+        """Adds a chunk of rows given as lists of strings in column order, column by column."""
+        self._check_writable()
+        width = len(self.columns)
+        # csv.reader reads a blank line as [], which is not a car.
+        rows = [row if len(row) == width else (row + [''] * width)[:width] for row in rows if row]
+        if not rows:
+            return
+        start = self._size
+        for column, values in zip(self._columns.values(), zip(*rows)):
+            column.extend([value.strip() for value in values])
+        self._size += len(rows)
+        new_rows = range(start, self._size)
+        for name in self._indexes:
+            for row_id in new_rows:
+                self._index_row(name, row_id)
+        for name, index in self._sorted.items():
+            numbers = self.numbers(name)
+            for row_id in new_rows:
+                index.insert(numbers[row_id], row_id)
+        if self._rankings_live:
+            self._rank_chunk(new_rows)
+
+    def _rank_chunk(self, row_ids):
+        # Merge each group's best rows from the chunk into its ranking in one step.
+        for sort_by in self._ranking_names():
+            ranks_by_group = {}
+            for row_id in row_ids:
+                rank = self._rank(sort_by, row_id)
+                if rank is not None:
+                    for group in self._groups(row_id):
+                        ranks_by_group.setdefault(group, []).append(rank)
+            for group, ranks in ranks_by_group.items():
+                ranking = self._rankings.get((sort_by, group), [])
+                self._rankings[(sort_by, group)] = heapq.nsmallest(TOP_K, ranking + ranks)
+
+    def update(self, row_id, **values):
+        """Changes some cells of an existing row, keeping the indexes in step."""
+        self._check_writable()
+        rerank = self._rankings_live and any(
+            name == 'Type' or name == RANKINGS[sort_by][0]
+            for name in values for sort_by in self._ranking_names())
+        if rerank:
+            old_groups = self._groups(row_id)
+            old_ranks = {sort_by: self._rank(sort_by, row_id) for sort_by in self._ranking_names()}
+        for name, value in values.items():
+            column = self.column(name)
+            if name in self._sorted:
+                self._sorted[name].remove(column.numbers[row_id], row_id)
+                column.set(row_id, value or '')
+                self._sorted[name].insert(column.numbers[row_id], row_id)
+            elif name in self._indexes:
+                self._unindex_row(name, row_id)
+                column.set(row_id, value or '')
+                self._index_row(name, row_id)
+            else:
+                column.set(row_id, value or '')
+        if rerank:
+            new_groups = self._groups(row_id)
+            for sort_by, old_rank in old_ranks.items():
+                for group in old_groups:
+                    self._rerank(sort_by, group, row_id, old_rank)
+                for group in new_groups:
+                    if group not in old_groups:
+                        self._rerank(sort_by, group, row_id, None)
+
+    @classmethod
+    def from_csv(cls, filepath, chunk_rows=CHUNK_ROWS, max_memory_mb=None, progress=None):
+        """Streams a CSV into a new store, chunk_rows rows at a time.
+
+        Only one chunk of raw text is alive at once. If max_memory_mb is set, loading
+        stops with MemoryError once the process grows past it, instead of being killed
+        by the OS. progress(rows_loaded, rows_per_second) is called after each chunk.
+        The timing of the load is kept in store.load_stats.
+        """
+        started = time.perf_counter()
+        with open(filepath, mode='r', encoding='utf-8', newline='') as file:
+            reader = csv.reader(file)
+            header = [name.strip() for name in next(reader, [])]
+            store = cls(header)
+            store.start_live_indexes()
+            while True:
+                chunk = list(islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                store.extend(chunk)
+                del chunk
+                rate = len(store) / max(time.perf_counter() - started, 1e-9)
+                memory_mb = resident_memory_mb()
+                if max_memory_mb and memory_mb and memory_mb > max_memory_mb:
+                    raise MemoryError(f"Loading '{filepath}' used {memory_mb:.0f} MB after {len(store)} rows, "
+                                      f"over the {max_memory_mb} MB ceiling.")
+                if progress:
+                    progress(len(store), rate)
+        store.build_sorted_indexes()
+        seconds = time.perf_counter() - started
+        store.load_stats = {
+            'rows': len(store),
+            'seconds': seconds,
+            'rows_per_second': len(store) / max(seconds, 1e-9),
+            'memory_mb': resident_memory_mb(),
+        }
+        return store
@@ -0,0 +1,100 @@
+"""
+Background reloading of the car catalog.
+
+A reload parses and indexes the new file on a background thread and only then
+hands the finished, frozen snapshot to a publish callback, which swaps it in
+with a single assignment. Requests that already hold the old snapshot keep
+using it until they finish, so every request sees one consistent catalog.
+"""
+import os
+import threading
+import time
+
+
+class CatalogReloader:
+    def __init__(self, filepath, load, publish, poll_interval=0):
+        """load() returns a new catalog or None on failure; publish(catalog) makes it live.
+
+        With poll_interval > 0 the file is checked for changes every poll_interval seconds.
+        """
+        self.filepath = filepath
+        self.load = load
+        self.publish = publish
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_at = None
+        self._lock = threading.Lock()
+        self._building = False
+        self._signature = self._file_signature()
+        self._watcher = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        """Starts watching the file, if polling is enabled."""
+        if self.poll_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='catalog-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.poll_interval)
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            # Wait for the file to stay the same for one full interval so a copy in progress is not read.
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            self.reload(wait=True)
+
+    def reload(self, wait=False):
+        """Starts a rebuild unless one is already running. Returns False if one was running."""
+        with self._lock:
+            if self._building:
+                return False
+            self._building = True
+        if wait:
+            self._build()
+        else:
+            threading.Thread(target=self._build, name='catalog-reload', daemon=True).start()
+        return True
+
+    def _build(self):
+        signature = self._file_signature()
+        try:
+            catalog = self.load()
+            if catalog is None:
+                self.failures += 1
+                print("Catalog reload failed; keeping the current catalog.")
+                return
+            catalog.freeze()
+            self.publish(catalog)
+            self.reloads += 1
+            self.last_reload_at = time.time()
+            print(f"Catalog reloaded with {len(catalog)} cars.")
+        except Exception as e:
+            self.failures += 1
+            print(f"Error reloading catalog: {e}")
+        finally:
+            # A broken file is not retried until it changes again.
+            self._signature = signature
+            with self._lock:
+                self._building = False
+
+    def status(self):
+        return {
+            'reloading': self._building,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_reload_at': self.last_reload_at,
+        }
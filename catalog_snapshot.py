@@ -0,0 +1,438 @@
+"""
+Binary snapshots of a parsed car catalog, for fast cold starts.
+
+Parsing cars.csv and building the indexes costs seconds on a large catalog;
+every worker used to pay it at startup. compile_catalog.py saves a built
+CarStore once, and load_snapshot() maps it back in. Nothing is rebuilt per row:
+the typed arrays (column codes, numbers, index row ids, sorted keys, trigram
+postings) are used straight from the mapped file, strings are decoded only when
+a cell is read, and the hash index and trigram lookups binary-search key tables
+kept sorted in the file. Every worker mapping the same snapshot shares its pages.
+
+File layout:
+
+    magic b'CARGENIE' | u32 format version | u32 header length | u32 CRC-32 of the rest
+    JSON header (source file stamp, columns, rankings, section table)
+    payload sections, each aligned to 8 bytes
+
+The prefix is little-endian; the payload arrays are in the writer's native
+byte order, which the header records and the loader checks.
+
+A snapshot records the size, mtime and SHA-256 of the CSV it was built from
+and is refused (SnapshotError) when it no longer matches, so callers can fall
+back to the CSV. Checking the CRC reads the whole file, so a server loads with
+verify=False (only the header and the pages it touches are read) and calls
+snapshot_intact() off the request path.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate
+
+from car_store import CarStore, DictColumn, NumericColumn, PlainColumn, SortedIndex, resident_memory_mb
+from model_matcher import ModelMatcher
+
+MAGIC = b'CARGENIE'
+FORMAT_VERSION = 3
+PREFIX = struct.Struct('<8sIII')
+ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """The snapshot is missing, corrupt, from another format version or out of date."""
+
+
+def source_stamp(filepath, with_hash=True):
+    stat = os.stat(filepath)
+    stamp = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        stamp['sha256'] = digest.hexdigest()
+    return stamp
+
+
+def default_snapshot_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.snapshot'
+
+
+# --- Writing ---
+class _SectionWriter:
+    def __init__(self):
+        self.sections = {}  # name -> [offset, nbytes, typecode or 'str', count]
+        self.chunks = []
+        self.size = 0
+
+    def _add(self, name, data, kind, count):
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(b'\0' * padding)
+            self.size += padding
+        self.sections[name] = [self.size, len(data), kind, count]
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def numbers(self, name, typecode, values):
+        values = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+        self._add(name, values.tobytes(), typecode, len(values))
+
+    def strings(self, name, values):
+        """The UTF-8 text of values back to back, plus a '.offsets' section of where each one starts."""
+        encoded = [value.encode('utf-8') for value in values]
+        self.numbers(f'{name}.offsets', 'Q', accumulate(map(len, encoded), initial=0))
+        self._add(name, b''.join(encoded), 'str', len(encoded))
+
+
+def _write_dict_column(sections, prefix, column):
+    sections.numbers(f'{prefix}.codes', 'I', column.codes)
+    sections.strings(f'{prefix}.values', column.values)
+
+
+def _write_hash_index(sections, prefix, index):
+    offsets = array('Q', [0])
+    row_ids = array('I')
+    for value in index.rows.values():
+        if type(value) is int:
+            row_ids.append(value)
+        else:
+            row_ids.extend(value)
+        offsets.append(len(row_ids))
+    keys = list(index.rows)
+    sections.strings(f'{prefix}.keys', keys)
+    # Key positions in sorted order (str order is UTF-8 byte order), for binary search.
+    sections.numbers(f'{prefix}.order', 'I', sorted(range(len(keys)), key=keys.__getitem__))
+    sections.numbers(f'{prefix}.offsets', 'Q', offsets)
+    sections.numbers(f'{prefix}.rows', 'I', row_ids)
+
+
+def _write_matcher(sections, matcher):
+    names = matcher._names
+    sections.strings('matcher.names', [name or '' for name in names])
+    sections.numbers('matcher.sizes', 'I', matcher._sizes)
+    sections.numbers('matcher.short_ids', 'I', matcher._short_ids)
+    offsets = array('Q', [0])
+    name_ids = array('I')
+    grams = sorted(matcher._postings)
+    for gram in grams:
+        name_ids.extend(matcher._postings[gram])
+        offsets.append(len(name_ids))
+    sections.strings('matcher.grams', grams)
+    sections.numbers('matcher.offsets', 'Q', offsets)
+    sections.numbers('matcher.ids', 'I', name_ids)
+    return [name_id for name_id, name in enumerate(names) if name is None]
+
+
+def write_snapshot(store, path, source_path=None):
+    """Saves store (with its indexes) to path; source_path is the CSV it was built from."""
+    if store.model_matcher is None or not store._sorted:
+        store.build_indexes()
+    sections = _SectionWriter()
+    column_kinds = {}
+    for name, column in store._columns.items():
+        prefix = f'column.{name}'
+        if isinstance(column, NumericColumn):
+            column_kinds[name] = 'numeric'
+            sections.numbers(f'{prefix}.numbers', 'd', column.numbers)
+            _write_dict_column(sections, f'{prefix}.text', column.text)
+        elif isinstance(column, DictColumn):
+            column_kinds[name] = 'dict'
+            _write_dict_column(sections, prefix, column)
+        else:
+            column_kinds[name] = 'plain'
+            sections.strings(f'{prefix}.values', column.values)
+    for name, index in store._indexes.items():
+        _write_hash_index(sections, f'index.{name}', index)
+    for name, index in store._sorted.items():
+        sections.numbers(f'sorted.{name}.keys', 'd', index.keys)
+        sections.numbers(f'sorted.{name}.row_ids', 'I', index.row_ids)
+    removed_names = _write_matcher(sections, store.model_matcher)
+
+    header = {
+        'source': source_stamp(source_path) if source_path else None,
+        'created_at': time.time(),
+        'byteorder': sys.byteorder,
+        'itemsizes': {typecode: array(typecode).itemsize for typecode in 'IQd'},
+        'rows': len(store),
+        'columns': store.columns,
+        'column_kinds': column_kinds,
+        'index_codes': {name: {key: sorted(codes) for key, codes in keys.items()}
+                        for name, keys in store._index_codes.items()},
+        'sorted': list(store._sorted),
+        'rankings': [[sort_by, group, ranking] for (sort_by, group), ranking in store._rankings.items()],
+        'key_generation': store.key_generation,
+        'removed_names': removed_names,
+        'sections': sections.sections,
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(PREFIX.size + len(header_bytes)) % ALIGNMENT)
+
+    checksum = zlib.crc32(header_bytes)
+    for chunk in sections.chunks:
+        checksum = zlib.crc32(chunk, checksum)
+
+    # Written next to the target and renamed into place, so a reader never maps a half-written file.
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes), checksum))
+        file.write(header_bytes)
+        for chunk in sections.chunks:
+            file.write(chunk)
+    os.replace(temporary_path, path)
+    return os.path.getsize(path)
+
+
+# --- Loading ---
+class _SectionReader:
+    def __init__(self, buffer, base, sections):
+        self.buffer = buffer
+        self.base = base
+        self.sections = sections
+
+    def _view(self, name):
+        try:
+            offset, nbytes, kind, count = self.sections[name]
+        except KeyError:
+            raise SnapshotError(f"Snapshot is missing section '{name}'.") from None
+        start = self.base + offset
+        return self.buffer[start:start + nbytes], kind, count
+
+    def numbers(self, name):
+        """A zero-copy, read-only view of a typed section."""
+        view, typecode, _ = self._view(name)
+        return view.cast(typecode)
+
+    def strings(self, name, removed=()):
+        view, _, _ = self._view(name)
+        return MappedStrings(view, self.numbers(f'{name}.offsets'), removed)
+
+
+class MappedStrings(Sequence):
+    """A read-only list of strings decoded from the mapped file each time one is read.
+
+    Positions in removed read as None.
+    """
+    __slots__ = ('_data', '_offsets', '_removed')
+
+    def __init__(self, data, offsets, removed=()):
+        self._data = data
+        self._offsets = offsets
+        self._removed = frozenset(removed)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self._offsets) - 1:
+            raise IndexError(i)
+        if i in self._removed:
+            return None
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value, order=None):
+        """Position of value, or None. The strings must be sorted, or order must list their positions sorted."""
+        target = value.encode('utf-8')
+        data, offsets = self._data, self._offsets
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            i = middle if order is None else order[middle]
+            if bytes(data[offsets[i]:offsets[i + 1]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(offsets) - 1:
+            return None
+        i = low if order is None else order[low]
+        return i if data[offsets[i]:offsets[i + 1]] == target else None
+
+
+class MappedHashIndex:
+    """The read-only HashIndex of a snapshot: keys in catalog order, found by binary search."""
+    __slots__ = ('_keys', '_order', '_offsets', '_rows')
+
+    def __init__(self, keys, order, offsets, rows):
+        self._keys = keys
+        self._order = order
+        self._offsets = offsets
+        self._rows = rows
+
+    def get(self, key):
+        i = self._keys.find(key, self._order)
+        if i is None:
+            return ()
+        return self._rows[self._offsets[i]:self._offsets[i + 1]]
+
+    def keys(self):
+        return self._keys
+
+    def __contains__(self, key):
+        return self._keys.find(key, self._order) is not None
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class MappedModelMatcher(ModelMatcher):
+    """The read-only ModelMatcher of a snapshot: names, sizes and postings stay in the mapped file."""
+    def __init__(self, names, sizes, short_ids, grams, offsets, name_ids, removed_count):
+        super().__init__()
+        self._names = names
+        self._sizes = sizes
+        self._grams = grams
+        self._offsets = offsets
+        self._name_ids = name_ids
+        self._count = len(names) - removed_count
+        self._short_ids = short_ids
+
+    def __len__(self):
+        return self._count
+
+    def add(self, name):
+        raise RuntimeError("A catalog snapshot is read-only.")
+
+    def remove(self, name):
+        raise RuntimeError("A catalog snapshot is read-only.")
+
+    def _posting_sizes(self, grams):
+        sizes = {}
+        for gram in grams:
+            i = self._grams.find(gram)
+            if i is not None:
+                sizes[gram] = self._offsets[i + 1] - self._offsets[i]
+        return sizes
+
+    def _posting(self, gram):
+        i = self._grams.find(gram)
+        return self._name_ids[self._offsets[i]:self._offsets[i + 1]]
+
+    def _grams_containing(self, text):
+        return [gram for gram in self._grams if text in gram]
+
+
+def _read_dict_column(sections, prefix):
+    column = DictColumn()
+    column.codes = sections.numbers(f'{prefix}.codes')
+    column.values = sections.strings(f'{prefix}.values')
+    column._lookup = None  # only needed to encode new values, and the store is frozen
+    return column
+
+
+def _read_hash_index(sections, prefix):
+    return MappedHashIndex(sections.strings(f'{prefix}.keys'), sections.numbers(f'{prefix}.order'),
+                           sections.numbers(f'{prefix}.offsets'), sections.numbers(f'{prefix}.rows'))
+
+
+def _read_matcher(sections, removed_names):
+    return MappedModelMatcher(sections.strings('matcher.names', removed_names), sections.numbers('matcher.sizes'),
+                              sections.numbers('matcher.short_ids'), sections.strings('matcher.grams'), sections.numbers('matcher.offsets'),
+                              sections.numbers('matcher.ids'), len(removed_names))
+
+
+def snapshot_intact(store):
+    """Whether the file behind a store from load_snapshot(verify=False) matches its CRC. Reads all of it."""
+    view = memoryview(store.snapshot_buffer)
+    _, _, checksum = read_header(view)
+    return zlib.crc32(view[PREFIX.size:]) == checksum
+
+
+def read_header(buffer):
+    if len(buffer) < PREFIX.size:
+        raise SnapshotError("Snapshot is truncated.")
+    magic, version, header_len, checksum = PREFIX.unpack_from(buffer)
+    if magic != MAGIC:
+        raise SnapshotError("Not a CarGenie catalog snapshot.")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {version} is not supported (expected {FORMAT_VERSION}).")
+    try:
+        header = json.loads(bytes(buffer[PREFIX.size:PREFIX.size + header_len]))
+    except ValueError:
+        raise SnapshotError("Snapshot header is corrupt.") from None
+    return header, PREFIX.size + header_len, checksum
+
+
+def source_matches(recorded, source_path):
+    """Whether source_path still has the content recorded by source_stamp(). A missing file matches."""
+    try:
+        current = source_stamp(source_path, with_hash=False)
+    except FileNotFoundError:
+        return True  # the derived file may be shipped on its own
+    if current['size'] != recorded['size']:
+        return False
+    # Copying files around changes their mtime, so a different mtime alone falls back to the content hash.
+    return current['mtime_ns'] == recorded['mtime_ns'] or source_stamp(source_path)['sha256'] == recorded['sha256']
+
+
+def load_snapshot(path, source_path=None, verify=True):
+    """Maps a snapshot back into a frozen CarStore.
+
+    Raises SnapshotError if the file is unusable or source_path no longer matches it.
+    verify checks the CRC of the whole file first, which reads every page of it.
+    The store keeps the file mapped for as long as it is alive.
+    """
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot open snapshot '{path}': {e}") from None
+    view = memoryview(buffer)
+    header, base, checksum = read_header(view)
+    if header['byteorder'] != sys.byteorder or any(
+            array(typecode).itemsize != size for typecode, size in header['itemsizes'].items()):
+        raise SnapshotError("Snapshot was built on a machine with a different binary layout.")
+    if source_path and header.get('source') and not source_matches(header['source'], source_path):
+        raise SnapshotError(f"'{source_path}' has changed since the snapshot was built.")
+    if verify and zlib.crc32(view[PREFIX.size:]) != checksum:
+        raise SnapshotError("Snapshot checksum does not match; the file is corrupt.")
+
+    sections = _SectionReader(view, base, header['sections'])
+    store = CarStore(header['columns'])
+    for name, kind in header['column_kinds'].items():
+        prefix = f'column.{name}'
+        if kind == 'numeric':
+            column = NumericColumn()
+            column.numbers = sections.numbers(f'{prefix}.numbers')
+            column.text = _read_dict_column(sections, f'{prefix}.text')
+        elif kind == 'dict':
+            column = _read_dict_column(sections, prefix)
+        else:
+            column = PlainColumn()
+            column.values = sections.strings(f'{prefix}.values')
+        store._columns[name] = column
+    store._indexes = {name: _read_hash_index(sections, f'index.{name}') for name in store._indexes}
+    store._index_codes = {name: {key: set(codes) for key, codes in keys.items()}
+                          for name, keys in header['index_codes'].items()}
+    store._sorted = {name: SortedIndex.from_arrays(sections.numbers(f'sorted.{name}.keys'),
+                                                   sections.numbers(f'sorted.{name}.row_ids'))
+                     for name in header['sorted']}
+    store._rankings = {(sort_by, group): [tuple(rank) for rank in ranking]
+                       for sort_by, group, ranking in header['rankings']}
+    store._rankings_live = True
+    store.model_matcher = _read_matcher(sections, header['removed_names'])
+    store.key_generation = header['key_generation']
+    store._size = header['rows']
+    store.snapshot_buffer = buffer
+    store.freeze()
+
+    seconds = time.perf_counter() - started
+    store.load_stats = {
+        'rows': len(store),
+        'seconds': seconds,
+        'rows_per_second': len(store) / max(seconds, 1e-9),
+        'memory_mb': resident_memory_mb(),
+        'snapshot': path,
+    }
+    return store
@@ -0,0 +1,62 @@
+"""
+Compiles cars.csv into a binary snapshot (cars.snapshot) for fast cold starts.
+
+flask_app loads the snapshot instead of parsing the CSV whenever it was built
+from the current cars.csv. Rerun this after every change to the CSV.
+
+    python compile_catalog.py
+    python compile_catalog.py big_cars.csv -o big_cars.snapshot
+    python compile_catalog.py --sqlite      # cars.sqlite, for CARGENIE_STORAGE=sqlite
+"""
+import argparse
+import os
+import time
+
+from car_store import CarStore
+from catalog_snapshot import SnapshotError, default_snapshot_path, load_snapshot, write_snapshot
+from sqlite_store import SqliteCarStore, build_database, default_database_path
+
+
+def compile_catalog(csv_path='cars.csv', snapshot_path=None):
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    store = CarStore.from_csv(csv_path)
+    store.build_indexes()
+    nbytes = write_snapshot(store, snapshot_path, source_path=csv_path)
+    print(f"Parsed {len(store):,} cars from '{csv_path}' in {store.load_stats['seconds']:.2f}s.")
+
+    # Load it back once, so a broken snapshot is caught here and not at startup.
+    started = time.perf_counter()
+    snapshot = load_snapshot(snapshot_path, source_path=csv_path)
+    if len(snapshot) != len(store):
+        raise SnapshotError(f"'{snapshot_path}' read back {len(snapshot)} cars instead of {len(store)}.")
+    print(f"Wrote '{snapshot_path}' ({nbytes / 2 ** 20:.1f} MB); "
+          f"it loads in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return snapshot_path
+
+
+def compile_database(csv_path='cars.csv', db_path=None):
+    db_path = db_path or default_database_path(csv_path)
+    started = time.perf_counter()
+    rows = build_database(csv_path, db_path)
+    store = SqliteCarStore(db_path)
+    if len(store) != rows:
+        raise ValueError(f"'{db_path}' read back {len(store)} cars instead of {rows}.")
+    print(f"Wrote '{db_path}' with {rows:,} cars in {time.perf_counter() - started:.2f}s "
+          f"({os.path.getsize(db_path) / 2 ** 20:.1f} MB).")
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default='cars.csv')
+    parser.add_argument('-o', '--output', help="output path (default: the CSV path with a .snapshot or .sqlite extension)")
+    parser.add_argument('--sqlite', action='store_true', help="build the SQLite database instead of a snapshot")
+    args = parser.parse_args()
+    if args.sqlite:
+        compile_database(args.csv_path, args.output)
+    else:
+        compile_catalog(args.csv_path, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Server-side conversation context, keyed by an opaque id kept in a cookie.
+
+A context is a small JSON-able dict: the last car talked about, the last
+filter (criteria, currency and the offset of the next page) and the preferred
+currency. MemoryContextStore keeps contexts in the process with LRU and TTL
+eviction. SqliteContextStore keeps them in a local SQLite file, so every worker
+of a pre-forked server (serve.py) and a restarted server see the same
+conversations.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Expired rows are deleted on roughly one write in this many.
+PURGE_EVERY = 256
+
+
+def new_context_id():
+    return secrets.token_urlsafe(16)
+
+
+class MemoryContextStore:
+    def __init__(self, max_entries=10_000, ttl_seconds=1800.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # context id -> (expires_at, context), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, context_id):
+        """A copy of the context, or None if there is none or it has expired."""
+        with self._lock:
+            entry = self._entries.get(context_id)
+            if entry is None:
+                return None
+            expires_at, context = entry
+            if expires_at < time.monotonic():
+                del self._entries[context_id]
+                return None
+            self._entries.move_to_end(context_id)
+            return dict(context)
+
+    def put(self, context_id, context):
+        with self._lock:
+            self._entries[context_id] = (time.monotonic() + self.ttl_seconds, dict(context))
+            self._entries.move_to_end(context_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, context_id):
+        with self._lock:
+            self._entries.pop(context_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteContextStore:
+    """Contexts in a SQLite file, expired by TTL; safe to share between processes."""
+
+    def __init__(self, path, ttl_seconds=1800.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connect().execute(
+                'CREATE TABLE IF NOT EXISTS contexts (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connect(self):
+        # One connection per process: a connection must not be used on both sides of a fork.
+        if self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, context_id):
+        with self._lock:
+            row = self._connect().execute('SELECT data, expires_at FROM contexts WHERE id = ?', (context_id,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def put(self, context_id, context):
+        data = json.dumps(context, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute('INSERT OR REPLACE INTO contexts (id, data, expires_at) VALUES (?, ?, ?)',
+                               (context_id, data, now + self.ttl_seconds))
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                connection.execute('DELETE FROM contexts WHERE expires_at < ?', (now,))
+
+    def delete(self, context_id):
+        with self._lock:
+            self._connect().execute('DELETE FROM contexts WHERE id = ?', (context_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM contexts WHERE expires_at >= ?',
+                                           (time.time(),)).fetchone()[0]
@@ -1,5 +1,26 @@
+"""
+Synthetic car catalogs.
+
+Without arguments this rewrites cars.csv with one row per model in `models`,
+as before. With --rows it generates a catalog of any size for benchmarks and
+capacity tests: rows are built in fixed-size blocks on a process pool, and
+each block draws from its own random stream seeded by (seed, block number).
+The same --seed and --rows therefore give byte-identical output whatever the
+worker count or sharding.
+
+    python create_large_db.py --rows 1000000 --seed 7 -o big_cars.csv
+    python create_large_db.py --rows 20000000 --workers 8 --shards 8 -o shards/cars.csv
+"""
+import argparse
 import csv
+import io
+import math
+import os
 import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
 
 # Define some real-world data to mix and match
 makes = [
@@ -28,11 +49,23 @@ models = {
 
 types = ["Sedan", "SUV", "Truck", "Coupe", "Hatchback", "Convertible", "Wagon"]
 
+HEADER = ['Company', 'Model', 'Year', 'Mileage_kmpl', 'Engine_CC', 'Type', 'Price_Base_USD', 'Price_TopTrim_USD', 'Available_Countries', 'Image_URL', 'Notes']
+
+def model_type(model):
+    # Logic for type based on model name hints
+    if any(x in model for x in ["RAV4", "CR-V", "Explorer", "Equinox", "Rogue", "X3", "X5", "GLC", "GLE", "Q5", "Q7", "Tucson", "Santa Fe", "Sportage", "Sorento", "Forester", "Outback", "CX-5", "CX-9", "RX", "NX", "GX", "Cherokee", "Compass", "Model X", "Model Y"]):
+        return "SUV"
+    if any(x in model for x in ["F-150", "Silverado", "Frontier", "Tacoma", "Gladiator", "Cybertruck"]):
+        return "Truck"
+    if any(x in model for x in ["Mustang", "Corvette", "M3", "MX-5"]):
+        return "Coupe"
+    return "Sedan"
+
 def generate_cars_csv():
     with open('cars.csv', 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         # Header
-        writer.writerow(['Company', 'Model', 'Year', 'Mileage_kmpl', 'Engine_CC', 'Type', 'Price_Base_USD', 'Price_TopTrim_USD', 'Available_Countries', 'Image_URL', 'Notes'])
+        writer.writerow(HEADER)
         
         count = 0
         for make, model_list in models.items():
@@ -40,14 +73,7 @@ def generate_cars_csv():
                 # Generate realistic-looking data
                 year = 2024
                 
-                # Logic for type based on model name hints
-                car_type = "Sedan"
-                if any(x in model for x in ["RAV4", "CR-V", "Explorer", "Equinox", "Rogue", "X3", "X5", "GLC", "GLE", "Q5", "Q7", "Tucson", "Santa Fe", "Sportage", "Sorento", "Forester", "Outback", "CX-5", "CX-9", "RX", "NX", "GX", "Cherokee", "Compass", "Model X", "Model Y"]):
-                    car_type = "SUV"
-                elif any(x in model for x in ["F-150", "Silverado", "Frontier", "Tacoma", "Gladiator", "Cybertruck"]):
-                    car_type = "Truck"
-                elif any(x in model for x in ["Mustang", "Corvette", "M3", "MX-5"]):
-                    car_type = "Coupe"
+                car_type = model_type(model)
                 
                 # Mileage and Engine logic
                 if make == "Tesla" or model == "e-tron":
@@ -83,5 +109,142 @@ def generate_cars_csv():
         
         print(f"Successfully generated {count} cars in cars.csv")
 
+
+# --- Large synthetic catalogs ---
+# Rough market shares, so common makes dominate the catalog like they do on the road.
+MAKE_WEIGHTS = {
+    "Toyota": 14, "Honda": 9, "Ford": 12, "Chevrolet": 11, "Nissan": 7, "BMW": 4, "Mercedes-Benz": 4,
+    "Volkswagen": 5, "Audi": 3, "Hyundai": 7, "Kia": 6, "Subaru": 4, "Mazda": 3, "Lexus": 2, "Jeep": 5, "Tesla": 4
+}
+MAKE_CUM_WEIGHTS = list(accumulate(MAKE_WEIGHTS[make] for make in makes))
+MODEL_TYPES = {model: model_type(model) for model_list in models.values() for model in model_list}
+LUXURY_MAKES = {"BMW", "Mercedes-Benz", "Audi", "Lexus", "Tesla"}
+ELECTRIC_MODELS = {"e-tron"}  # besides every Tesla
+
+# Median base price in USD and engine sizes by type.
+TYPE_PRICES = {"Sedan": 27000, "SUV": 36000, "Truck": 42000, "Coupe": 45000, "Hatchback": 23000, "Convertible": 48000, "Wagon": 31000}
+TYPE_ENGINES = {
+    "Sedan": [1500, 1600, 2000, 2500], "SUV": [2000, 2500, 3000, 3500], "Truck": [2700, 3500, 5000, 5700],
+    "Coupe": [2000, 3000, 5000], "Hatchback": [1200, 1500, 1600], "Convertible": [2000, 3000], "Wagon": [2000, 2500],
+}
+TRIMS = ["Base", "LX", "EX", "SE", "GT", "XLE", "Sport", "Limited", "Touring", "Premium", "Hybrid"]
+REGIONS = ["USA", "Canada", "Mexico", "Europe", "UK", "Japan", "South Korea", "China", "India",
+           "Bangladesh", "Australia", "Middle East", "Brazil", "South Africa"]
+
+BLOCK_ROWS = 10_000
+
+def synthetic_row(rng, row_number):
+    """One catalog row; row_number keeps model names unique across the whole catalog."""
+    make = rng.choices(makes, cum_weights=MAKE_CUM_WEIGHTS)[0]
+    base_model = rng.choice(models[make])
+    trim = rng.choice(TRIMS)
+    car_type = MODEL_TYPES[base_model]
+    if car_type == "Sedan" and rng.random() < 0.15:
+        car_type = rng.choice(["Hatchback", "Wagon", "Convertible"])
+    year = min(2025, int(rng.triangular(2012, 2026, 2025)))
+
+    electric = make == "Tesla" or base_model in ELECTRIC_MODELS or (year >= 2020 and rng.random() < 0.06)
+    if electric:
+        engine = 0
+        mileage = round(min(650.0, max(200.0, rng.gauss(420, 70))), 1)  # range in km, as in cars.csv
+        notes = "Electric Vehicle. Mileage represents range in km."
+    else:
+        engine = rng.choice(TYPE_ENGINES[car_type])
+        mileage = round(min(30.0, max(5.0, rng.gauss(24 - engine / 400, 2))), 1)
+        notes = f"Standard {make} reliability."
+
+    # Prices are log-normal around the type's median, higher for luxury makes and newer cars.
+    median = TYPE_PRICES[car_type] * (1.6 if make in LUXURY_MAKES else 1.0) * (1 - 0.04 * (2025 - year))
+    base_price = int(median * math.exp(rng.gauss(0, 0.25)) / 100) * 100
+    top_price = int(base_price * rng.uniform(1.2, 1.8) / 100) * 100
+
+    if rng.random() < 0.25:
+        countries = "Global"
+    else:
+        countries = ", ".join(sorted(rng.sample(REGIONS, rng.randint(1, 6)), key=REGIONS.index))
+
+    model = f"{base_model} {trim} {row_number}"
+    image_url = f"https://placehold.co/600x400?text={make}+{base_model}"
+    return [make, model, year, mileage, engine, car_type, base_price, top_price, countries, image_url, notes]
+
+def generate_block(seed, block, start, stop):
+    """CSV text for rows [start, stop); the rows depend only on (seed, block)."""
+    rng = random.Random(f"{seed}:{block}")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row_number in range(start, stop):
+        writer.writerow(synthetic_row(rng, row_number + 1))
+    return buffer.getvalue()
+
+def _blocks(rows, seed):
+    for block, start in enumerate(range(0, rows, BLOCK_ROWS)):
+        yield seed, block, start, min(start + BLOCK_ROWS, rows)
+
+def _ordered_results(executor, tasks, window):
+    """Runs tasks in parallel but yields results in task order, with at most window in flight."""
+    if executor is None:
+        for task in tasks:
+            yield generate_block(*task)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(generate_block, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def shard_paths(output, shards):
+    if shards <= 1:
+        return [output]
+    stem, extension = os.path.splitext(output)
+    return [f"{stem}-{shard:05d}-of-{shards:05d}{extension}" for shard in range(shards)]
+
+def generate_large_catalog(output, rows, seed=0, workers=None, shards=1):
+    """Writes rows synthetic cars to output (or to numbered shard files), streaming block by block.
+
+    Memory stays at a few blocks per worker however many rows are asked for.
+    Each shard is a complete CSV with its own header and a contiguous run of rows.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(shards, math.ceil(rows / BLOCK_ROWS) or 1))
+    blocks = list(_blocks(rows, seed))
+    paths = shard_paths(output, shards)
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    started = time.perf_counter()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        results = _ordered_results(executor, blocks, window=workers * 4)
+        written = 0
+        for shard, path in enumerate(paths):
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                csv.writer(file, lineterminator='\n').writerow(HEADER)
+                for _, _, start, stop in blocks[len(blocks) * shard // shards:len(blocks) * (shard + 1) // shards]:
+                    file.write(next(results))
+                    written += stop - start
+            print(f"  ... {written:,} of {rows:,} cars written ({path})")
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    seconds = time.perf_counter() - started
+    print(f"Successfully generated {rows:,} cars in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s).")
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate cars.csv or a large synthetic car catalog.")
+    parser.add_argument('--rows', type=int, help="number of synthetic cars (default: the small cars.csv catalog)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--shards', type=int, default=1, help="split the output into this many CSV files")
+    parser.add_argument('-o', '--output', default='large_cars.csv')
+    args = parser.parse_args()
+    if args.rows is None:
+        generate_cars_csv()
+    else:
+        generate_large_catalog(args.output, args.rows, seed=args.seed, workers=args.workers, shards=args.shards)
+
 if __name__ == "__main__":
-    generate_cars_csv()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Exchange rates read from a local file, and catalog prices pre-formatted per currency.
+
+ExchangeRates holds the rate table from a JSON file such as
+
+    {"base": "USD", "rates": {"USD": 1.0, "BDT": 120.0, "EUR": 0.92, "INR": 83.0}}
+
+and re-reads it when the file changes (checked at most every check_interval
+seconds, so a request costs one clock read). The rate table is replaced, never
+changed in place, so "is it the same dict" tells whether rates moved.
+
+PriceStrings converts and formats one price column in one currency for every
+row at once, when a catalog or the rates change. Each distinct price is
+formatted once, and the results are packed into a single UTF-8 buffer with an
+offset per row, so rendering a listing only slices strings out of it.
+"""
+import json
+import math
+import os
+import threading
+import time
+from array import array
+
+CURRENCY_SYMBOLS = {'USD': '$', 'BDT': '৳', 'EUR': '€', 'INR': '₹'}
+
+# The price columns listings show; these are the ones formatted ahead of time.
+LISTING_PRICE_COLUMNS = ('Price_Base_USD',)
+
+
+def format_converted(amount, currency):
+    """An amount already in currency, formatted like "৳1,234 BDT" (unknown currencies as USD)."""
+    if currency not in CURRENCY_SYMBOLS:
+        currency = 'USD'
+    return f"{CURRENCY_SYMBOLS[currency]}{amount:,.0f} {currency}"
+
+
+def load_rates(path, defaults):
+    """The rate table in the file at path, on top of defaults. Raises OSError or ValueError.
+
+    Only currencies in defaults are taken; others are reported and skipped.
+    """
+    with open(path, encoding='utf-8') as file:
+        payload = json.load(file)
+    if not isinstance(payload, dict) or not isinstance(payload.get('rates'), dict):
+        raise ValueError("expected a JSON object with a 'rates' object")
+    if payload.get('base', 'USD') != 'USD':
+        raise ValueError("rates must be relative to USD")
+    rates = dict(defaults)
+    for currency, rate in payload['rates'].items():
+        if currency not in defaults:
+            print(f"Skipping exchange rate for unsupported currency '{currency}'.")
+            continue
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not math.isfinite(rate) or rate <= 0:
+            raise ValueError(f"invalid rate for {currency}: {rate!r}")
+        rates[currency] = float(rate)
+    return rates
+
+
+class ExchangeRates:
+    def __init__(self, path, defaults, check_interval=60.0, on_change=None):
+        """on_change() is called after the rates change (not on the first load)."""
+        self.path = path
+        self.defaults = dict(defaults)
+        self.check_interval = check_interval
+        self.on_change = None
+        self.rates = dict(defaults)
+        self.version = 0
+        self.last_error = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+        self.on_change = on_change
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        """The rate table, re-read first if the file has changed since the last check."""
+        if self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._file_signature() != self._signature:
+                self.reload()
+        return self.rates
+
+    def reload(self):
+        """Re-reads the file. On failure the current rates stay and False is returned."""
+        with self._lock:
+            signature = self._file_signature()
+            self._signature = signature  # a broken file is not retried until it changes again
+            if signature is None:
+                # No file: the built-in defaults apply.
+                rates = dict(self.defaults)
+            else:
+                try:
+                    rates = load_rates(self.path, self.defaults)
+                except (OSError, ValueError) as e:
+                    self.last_error = str(e)
+                    print(f"Error loading exchange rates from '{self.path}': {e}")
+                    return False
+            self.last_error = None
+            if rates == self.rates:
+                return True
+            self.rates = rates
+            self.version += 1
+            print(f"Exchange rates updated: {', '.join(f'{code} {rate:g}' for code, rate in rates.items())}.")
+        if self.on_change is not None:
+            self.on_change()
+        return True
+
+    def status(self):
+        return {'rates': self.rates, 'version': self.version, 'path': self.path, 'error': self.last_error}
+
+
+class PriceStrings:
+    """A price column converted and formatted in one currency, for every row of a catalog."""
+
+    def __init__(self, prices, rate, currency):
+        formatted = {}  # price -> encoded text, so each distinct price is formatted once
+        parts = []
+        offsets = array('Q', [0])
+        position = 0
+        for price in prices:
+            text = formatted.get(price)
+            if text is None:
+                # NaN marks a price that was not a number in the CSV.
+                text = (format_converted(price * rate, currency) if price == price else 'N/A').encode('utf-8')
+                formatted[price] = text
+            parts.append(text)
+            position += len(text)
+            offsets.append(position)
+        self._buffer = b''.join(parts)
+        self._offsets = offsets
+
+    def __getitem__(self, row_id):
+        offsets = self._offsets
+        return self._buffer[offsets[row_id]:offsets[row_id + 1]].decode('utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class FormattedPrices:
+    """The same lookups as PriceStrings, formatted on access (for catalogs too big to format up front)."""
+
+    def __init__(self, prices, rate, currency):
+        self._prices = prices
+        self._rate = rate
+        self._currency = currency
+
+    def __getitem__(self, row_id):
+        price = self._prices[row_id]
+        return format_converted(price * self._rate, self._currency) if price == price else 'N/A'
+
+
+class PriceTable:
+    """Listing prices for one catalog and one rate table, in every currency."""
+
+    def __init__(self, car_data, rates, precompute=True):
+        self.rates = rates
+        kind = PriceStrings if precompute else FormattedPrices
+        self._columns = {}
+        for name in LISTING_PRICE_COLUMNS:
+            if name in car_data.columns:
+                prices = car_data.numbers(name)
+                for currency, rate in rates.items():
+                    self._columns[(name, currency)] = kind(prices, rate, currency)
+
+    def column(self, name, currency):
+        """Row id -> formatted price; KeyError for a column or currency the table does not have."""
+        return self._columns[(name, currency)]
@@ -0,0 +1,96 @@
+"""
+Multi-column catalog filters, evaluated as boolean masks over typed columns.
+
+A filter is equality keys on indexed columns (Company, Type) plus comparisons
+on numeric columns (base and top-trim price, mileage, engine CC, year), given
+as (column, op, value) conditions. Conditions on the same column are merged
+into one Bounds.
+
+With numpy installed, mask_select() views the store's typed arrays as numpy
+arrays without copying, turns every constraint into one vectorized comparison
+over all rows, ANDs the masks and returns the row ids left set. Without numpy,
+CarStore.select() reads the narrowest constraint off its hash or sorted index
+and probes the others per candidate. Either way a NaN (a value that was not a
+number in the CSV) never satisfies a comparison.
+"""
+import math
+import operator
+from array import array
+
+try:
+    import numpy
+except ImportError:  # numpy is optional; CarStore falls back to its sorted indexes
+    numpy = None
+
+COMPARISONS = ('<', '<=', '>', '>=', '==')
+
+
+class Bounds:
+    """The values a numeric column may take: from low to high, each end inclusive or not."""
+    __slots__ = ('low', 'low_inclusive', 'high', 'high_inclusive')
+
+    def __init__(self):
+        self.low, self.low_inclusive = -math.inf, False
+        self.high, self.high_inclusive = math.inf, False
+
+    def add(self, op, value):
+        """Narrows the bounds by one comparison. Raises ValueError for an unknown op."""
+        if op not in COMPARISONS:
+            raise ValueError(f"unknown comparison '{op}'")
+        value = float(value)
+        if value != value:
+            # Nothing compares true with NaN.
+            self.low, self.high = math.inf, -math.inf
+            return
+        if op in ('>', '>=', '==') and (value > self.low or (value == self.low and op == '>')):
+            self.low, self.low_inclusive = value, op != '>'
+        if op in ('<', '<=', '==') and (value < self.high or (value == self.high and op == '<')):
+            self.high, self.high_inclusive = value, op != '<'
+
+    def probe(self, numbers):
+        """row_id -> whether numbers[row_id] is within the bounds."""
+        low, high = self.low, self.high
+        above = operator.ge if self.low_inclusive else operator.gt
+        below = operator.le if self.high_inclusive else operator.lt
+        return lambda row_id: above(numbers[row_id], low) and below(numbers[row_id], high)
+
+    def mask(self, values):
+        """A numpy boolean mask of the values within the bounds."""
+        mask = values >= self.low if self.low_inclusive else values > self.low
+        mask &= values <= self.high if self.high_inclusive else values < self.high
+        return mask
+
+
+def column_bounds(conditions):
+    """{column: Bounds} from (column, op, value) conditions."""
+    bounds = {}
+    for name, op, value in conditions:
+        if name not in bounds:
+            bounds[name] = Bounds()
+        bounds[name].add(op, value)
+    return bounds
+
+
+def mask_select(size, code_matches=(), row_matches=(), ranges=()):
+    """Row ids (an array('I'), in catalog order) of the rows every constraint holds for. Needs numpy.
+
+    code_matches are (array('I') of per-row codes, set of wanted codes) pairs,
+    row_matches are lists of matching row ids (for columns that are not
+    dictionary-encoded), and ranges are (array('d') of values, Bounds) pairs.
+    """
+    mask = numpy.ones(size, dtype=bool)
+    for codes, wanted in code_matches:
+        column = numpy.frombuffer(codes, dtype=numpy.uintc)
+        if len(wanted) == 1:
+            mask &= column == next(iter(wanted))
+        else:
+            mask &= numpy.isin(column, numpy.fromiter(wanted, dtype=numpy.uintc, count=len(wanted)))
+    for row_ids in row_matches:
+        matched = numpy.zeros(size, dtype=bool)
+        matched[numpy.asarray(row_ids, dtype=numpy.intp)] = True
+        mask &= matched
+    for numbers, bounds in ranges:
+        mask &= bounds.mask(numpy.frombuffer(numbers, dtype=numpy.float64))
+    row_ids = array('I')
+    row_ids.frombytes(numpy.flatnonzero(mask).astype(numpy.uintc).tobytes())
+    return row_ids
@@ -1,15 +1,30 @@
-from flask import Flask, request, jsonify, render_template_string, session
-from fuzzywuzzy import process
-import csv
+from flask import Flask, Response, abort, request, jsonify, render_template_string, stream_with_context
+import base64
+import gc
+import json
 import os
-import time 
 import re 
+import threading
+import time
+import weakref
+from car_store import CarStore
+from catalog_reloader import CatalogReloader
+from catalog_snapshot import SnapshotError, default_snapshot_path, load_snapshot, snapshot_intact
+from context_store import MemoryContextStore, SqliteContextStore, new_context_id
+from exchange_rates import ExchangeRates, PriceTable, format_converted
+from keyword_matcher import KeywordMatcher
+from metrics import Registry, stage, timing
+from model_matcher import MATCH_THRESHOLD
+from request_profiler import RequestProfiler
+from response_cache import ResponseCache
+from sqlite_store import SqliteCarStore
+from static_assets import Asset, StaticAssets
 
 app = Flask(__name__)
-app.secret_key = 'car_genie_secret_key'
 
 # --- Configuration ---
-# Exchange rates relative to 1 USD
+# Built-in exchange rates relative to 1 USD, and the currencies the bot supports.
+# exchange_rates.json overrides the rates (see RATES below).
 EXCHANGE_RATES = {
     'USD': 1.0,
     'BDT': 120.0,  # 1 USD = 120 Taka
@@ -17,17 +32,130 @@ EXCHANGE_RATES = {
     'INR': 83.0    # 1 USD = 83 Rupees
 }
 
+# How long the chat UI keeps its "typing" indicator up, in milliseconds. The wait
+# happens in the browser, so /ask never holds a worker for it and API clients get
+# their answer immediately. Set CARGENIE_TYPING_DELAY_MS per deployment (0 disables it).
+TYPING_DELAY_MS = int(os.environ.get('CARGENIE_TYPING_DELAY_MS', '1500'))
+
+# Answers to repeated /ask messages are served from a bounded LRU/TTL cache.
+RESPONSE_CACHE = ResponseCache(
+    max_entries=int(os.environ.get('CARGENIE_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('CARGENIE_CACHE_TTL', '300')),
+)
+
+# Live rates come from CARGENIE_RATES_FILE and are re-read when it changes (checked every
+# CARGENIE_RATES_CHECK_INTERVAL seconds) or on POST /admin/reload_rates. Cached answers
+# have prices in them, so new rates empty the response cache (see rates_changed below).
+RATES = ExchangeRates(
+    os.environ.get('CARGENIE_RATES_FILE', os.path.join(os.path.dirname(__file__), 'exchange_rates.json')),
+    EXCHANGE_RATES,
+    check_interval=float(os.environ.get('CARGENIE_RATES_CHECK_INTERVAL', '60')),
+)
+
+# Conversation context (last car, last filter and preferred currency) is kept on the server;
+# the browser only holds an opaque id in the CONTEXT_COOKIE cookie. CARGENIE_CONTEXT_STORE=sqlite
+# keeps it in CARGENIE_CONTEXT_DB instead, shared by all workers and kept over restarts; serve.py
+# switches to it on its own when it runs more than one worker.
+CONTEXT_COOKIE = 'cargenie_context'
+CONTEXT_TTL = float(os.environ.get('CARGENIE_CONTEXT_TTL', '1800'))
+CONTEXT_DB = os.environ.get('CARGENIE_CONTEXT_DB', os.path.join(os.path.dirname(__file__), 'contexts.sqlite'))
+if os.environ.get('CARGENIE_CONTEXT_STORE', 'memory').lower() == 'sqlite':
+    CONTEXT_STORE = SqliteContextStore(CONTEXT_DB, ttl_seconds=CONTEXT_TTL)
+else:
+    CONTEXT_STORE = MemoryContextStore(max_entries=int(os.environ.get('CARGENIE_CONTEXT_MAX', '10000')),
+                                       ttl_seconds=CONTEXT_TTL)
+
+# /ask requests slower than CARGENIE_SLOW_REQUEST_MS are saved to CARGENIE_PROFILE_DIR with their message.
+# A CARGENIE_PROFILE_RATE fraction of requests (0 to 1), and any request an admin sends with
+# X-Profile: 1, also runs under cProfile so the saved capture includes a profile.
+REQUEST_PROFILER = RequestProfiler(
+    os.environ.get('CARGENIE_PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles')),
+    sample_rate=float(os.environ.get('CARGENIE_PROFILE_RATE', '0')),
+    slow_ms=float(os.environ.get('CARGENIE_SLOW_REQUEST_MS', '500')),
+    keep=int(os.environ.get('CARGENIE_PROFILE_KEEP', '100')),
+)
+
+# Filter answers list this many cars at a time; the chat UI fetches the rest on
+# demand from /filter_results, which API clients can also stream as NDJSON.
+RESULTS_PAGE_SIZE = int(os.environ.get('CARGENIE_RESULTS_PAGE_SIZE', '20'))
+MAX_RESULTS_PAGE_SIZE = int(os.environ.get('CARGENIE_MAX_RESULTS_PAGE_SIZE', '10000'))
+
+# Files under static/ are served from /assets/ with their content hash in the name,
+# so they can be cached for good. Plain /static/ URLs are only revalidated hourly.
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+STATIC_ASSETS = StaticAssets(app.static_folder)
+
 # --- Part 1: Data Loading ---
+# The catalog is streamed in chunks. CARGENIE_LOAD_MAX_MEMORY_MB makes a load that
+# outgrows the ceiling fail cleanly instead of getting the worker OOM-killed.
+LOAD_CHUNK_ROWS = int(os.environ.get('CARGENIE_LOAD_CHUNK_ROWS', '50000'))
+LOAD_MAX_MEMORY_MB = float(os.environ.get('CARGENIE_LOAD_MAX_MEMORY_MB', '0')) or None
+
+# CARGENIE_STORAGE=sqlite serves the catalog from an indexed SQLite file next to the
+# CSV (built on first use and again whenever the CSV changes) instead of from memory,
+# for catalogs too large to hold in every worker.
+STORAGE_BACKEND = os.environ.get('CARGENIE_STORAGE', 'memory').lower()
+
+def report_load_progress(rows, rows_per_second):
+    if rows % LOAD_CHUNK_ROWS:
+        return  # the last, partial chunk is covered by the summary line
+    print(f"  ... {rows:,} cars loaded ({rows_per_second:,.0f} rows/s)")
+
+# Snapshots whose CRC failed, by (path, mtime, size): skipped until compile_catalog.py rewrites them.
+_corrupt_snapshots = set()
+
+def snapshot_signature(path):
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+def load_snapshot_if_current(filepath):
+    """The catalog from the compiled snapshot next to filepath, or None if there is no usable one.
+
+    The snapshot's CRC is not checked here (that reads the whole file); check_snapshot_in_background()
+    does it once the catalog is live.
+    """
+    snapshot_path = default_snapshot_path(filepath)
+    if not os.path.exists(snapshot_path):
+        return None
+    if snapshot_signature(snapshot_path) in _corrupt_snapshots:
+        print(f"Not using '{snapshot_path}' (its checksum did not match); loading the CSV instead.")
+        return None
+    try:
+        knowledge_base = load_snapshot(snapshot_path, source_path=filepath, verify=False)
+    except SnapshotError as e:
+        print(f"Not using '{snapshot_path}' ({e}); loading the CSV instead.")
+        return None
+    print(f"Knowledge base loaded from snapshot with {len(knowledge_base)} cars "
+          f"in {knowledge_base.load_stats['seconds'] * 1000:.0f} ms.")
+    return knowledge_base
+
+def load_sqlite_knowledge_base(filepath):
+    try:
+        knowledge_base = SqliteCarStore.open_or_build(filepath, chunk_rows=LOAD_CHUNK_ROWS, progress=report_load_progress)
+    except FileNotFoundError:
+        print(f"Error: The file at '{filepath}' was not found.")
+        return None
+    except Exception as e:
+        print(f"Error loading knowledge base: {e}")
+        return None
+    print(f"Knowledge base opened from '{knowledge_base.path}' with {len(knowledge_base)} cars.")
+    return knowledge_base
+
 def load_knowledge_base(filename='cars.csv'):
     filepath = os.path.join(os.path.dirname(__file__), filename)
-    knowledge_base = []
+    if STORAGE_BACKEND == 'sqlite':
+        return load_sqlite_knowledge_base(filepath)
+    # A snapshot built by compile_catalog.py skips parsing and indexing entirely.
+    knowledge_base = load_snapshot_if_current(filepath)
+    if knowledge_base is not None:
+        return knowledge_base
     try:
-        with open(filepath, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                clean_row = {key.strip(): val.strip() for key, val in row.items()}
-                knowledge_base.append(clean_row)
-        print(f"Knowledge base loaded successfully with {len(knowledge_base)} cars.")
+        knowledge_base = CarStore.from_csv(filepath, chunk_rows=LOAD_CHUNK_ROWS, max_memory_mb=LOAD_MAX_MEMORY_MB,
+                                           progress=report_load_progress)
+        stats = knowledge_base.load_stats
+        print(f"Knowledge base loaded successfully with {len(knowledge_base)} cars "
+              f"({stats['rows_per_second']:,.0f} rows/s).")
     except FileNotFoundError:
         print(f"Error: The file at '{filepath}' was not found.")
         return None
@@ -36,28 +164,141 @@ def load_knowledge_base(filename='cars.csv'):
         return None
     return knowledge_base
 
-CAR_DATA = load_knowledge_base()
+CATALOG_FILE = 'cars.csv'
+
+# The live catalog snapshot. It is frozen and only ever replaced as a whole, so a
+# request that reads CAR_DATA once sees one consistent catalog from start to end.
+CAR_DATA = load_knowledge_base(CATALOG_FILE)
+if CAR_DATA:
+    CAR_DATA.freeze()
+
+def publish_knowledge_base(car_data):
+    global CAR_DATA
+    if car_data:
+        price_table(car_data)  # formats the listing prices before the catalog goes live
+    CAR_DATA = car_data
+    check_snapshot_in_background(car_data)
+
+def check_snapshot_in_background(car_data):
+    """Checks the CRC of a live catalog's snapshot; if it is corrupt, the catalog is reloaded from the CSV."""
+    if getattr(car_data, 'snapshot_buffer', None) is None:
+        return None
+    try:
+        signature = snapshot_signature(car_data.load_stats['snapshot'])
+    except OSError:
+        signature = None  # removed since; the mapping still holds its pages
+
+
+    def check():
+        if snapshot_intact(car_data):
+            return
+        _corrupt_snapshots.add(signature)
+        print(f"'{car_data.load_stats['snapshot']}' is corrupt (checksum mismatch); reloading the catalog from the CSV.")
+        if CAR_DATA is car_data:
+            CATALOG_RELOADER.reload()
+
+    thread = threading.Thread(target=check, name='snapshot-check', daemon=True)
+    thread.start()
+    return thread
+
+# Catalog updates are picked up without a restart: POST /admin/reload (with the
+# CARGENIE_ADMIN_TOKEN in X-Admin-Token) or set CARGENIE_RELOAD_INTERVAL to poll cars.csv.
+CATALOG_RELOADER = CatalogReloader(
+    os.path.join(os.path.dirname(__file__), CATALOG_FILE),
+    load=lambda: load_knowledge_base(CATALOG_FILE),
+    publish=publish_knowledge_base,
+    poll_interval=float(os.environ.get('CARGENIE_RELOAD_INTERVAL', '0')),
+)
+check_snapshot_in_background(CAR_DATA)
 
 def get_car_details(model_name, car_data):
     if not car_data:
         return None
-    for car in car_data:
-        if car['Model'] == model_name:
-            return car
-    return None
+    return car_data.find('Model', model_name)
+
+# --- Keyword Vocabulary ---
+# All of these, plus the catalog's companies and types, are compiled into one
+# automaton so a message is scanned once. Within each group the first entry
+# found wins, exactly like the checks they replace.
+CONV_INTENTS = {
+    'greeting': ['hello', 'hi', 'hey', 'salam'],
+    'goodbye': ['bye', 'goodbye', 'quit', 'exit'],
+    'thanks': ['thanks', 'thank you', 'appreciate it'],
+}
+RECOMMEND_KEYWORDS = ['best', 'most', 'cheapest', 'recommend me']
+SORT_KEYWORDS = {
+    'price_asc': ['cheapest', 'lowest price'],
+    'mileage_desc': ['most efficient', 'best mileage', 'highest mileage'],
+}
+FILTER_KEYWORDS = ['find', 'show me', 'looking for', 'under', 'over', 'cheaper than', 'less than', 'more than']
+# Filter words only in a message with a number: "is the corolla above average?" asks about a car.
+NUMBER_FILTER_KEYWORDS = ['below', 'above']
+PRICE_BOUND_KEYWORDS = {
+    'price_less_than': ['under', 'below', 'less than', 'cheaper than'],
+    'price_more_than': ['over', 'above', 'more than'],
+}
+POWERTRAIN_KEYWORDS = {
+    'ev': ['electric', 'ev', 'evs', 'battery'],
+    'ice': ['petrol', 'gasoline', 'diesel', 'combustion', 'gas'],
+}
+TASK_INTENTS = {
+    'get_price': ['price', 'cost', 'how much'],
+    'get_mileage': ['mileage', 'fuel', 'kmpl', 'range', 'milage', 'millage'], 
+    'get_engine': ['engine', 'cc', 'horsepower'],
+    'get_availability': ['available', 'country', 'countries', 'sell in'],
+    'get_all_info': ['tell me about', 'details', 'info', 'information on']
+}
+# A currency named in a message (a '$' counts as USD) replaces the one the conversation remembers.
+CURRENCY_KEYWORDS = {
+    'BDT': ['bdt', 'taka', 'bangladesh'],
+    'EUR': ['eur', 'euro'],
+    'INR': ['inr', 'rupee', 'india'],
+    'USD': ['usd', 'dollar', '$'],
+}
+
+def build_keyword_matcher(car_data):
+    matcher = KeywordMatcher()
+    groups = [
+        ('conversation', CONV_INTENTS, True),
+        ('sort_by', SORT_KEYWORDS, False),
+        ('price_bound', PRICE_BOUND_KEYWORDS, False),
+        ('task', TASK_INTENTS, False),
+        ('currency', CURRENCY_KEYWORDS, False),
+        ('powertrain', POWERTRAIN_KEYWORDS, True),
+    ]
+    for category, keywords_by_value, whole_word in groups:
+        for rank, (value, keywords) in enumerate(keywords_by_value.items()):
+            for keyword in keywords:
+                matcher.add(keyword, category, value, rank, whole_word)
+    for keyword in RECOMMEND_KEYWORDS:
+        matcher.add(keyword, 'recommend')
+    for keyword in FILTER_KEYWORDS:
+        matcher.add(keyword, 'filter')
+    for keyword in NUMBER_FILTER_KEYWORDS:
+        matcher.add(keyword, 'number_filter')
+    if car_data:
+        for rank, car_type in enumerate(car_data.keys('Type')):
+            matcher.add(car_type, 'type', car_type, rank)
+        for rank, company in enumerate(car_data.keys('Company')):
+            matcher.add(company, 'company', company, rank)
+    return matcher
+
+# The automaton for the catalog it was built from, rebuilt when the catalog's companies or types change.
+_keyword_cache = None
+
+def scan_keywords(text, car_data):
+    global _keyword_cache
+    generation = car_data.key_generation if car_data else None
+    cache = _keyword_cache
+    if cache is None or cache[0] is not car_data or cache[1] != generation:
+        cache = _keyword_cache = (car_data, generation, build_keyword_matcher(car_data))
+    return cache[2].scan(text.lower())
 
 # --- Helper: Detect Currency in User Text ---
-def detect_currency(text):
-    text = text.lower()
-    if 'bdt' in text or 'taka' in text or 'bangladesh' in text:
-        return 'BDT'
-    if 'eur' in text or 'euro' in text:
-        return 'EUR'
-    if 'inr' in text or 'rupee' in text or 'india' in text:
-        return 'INR'
-    if 'usd' in text or 'dollar' in text:
-        return 'USD'
-    return None 
+def detect_currency(text, keywords=None):
+    if keywords is None:
+        keywords = scan_keywords(text, CAR_DATA)
+    return keywords.get('currency')
 
 # --- Helper: Format Price with Conversion ---
 def format_price(price_usd, target_currency='USD'):
@@ -65,75 +306,187 @@ def format_price(price_usd, target_currency='USD'):
         price_val = float(price_usd)
     except (ValueError, TypeError):
         return "N/A"
+    if price_val != price_val:  # NaN marks a price that was not a number in the CSV
+        return "N/A"
+
+    rate = RATES.current().get(target_currency, 1.0)
+    return format_converted(price_val * rate, target_currency)
+
+# Listing prices for each catalog, converted and formatted in every currency. A catalog's
+# table is built before it goes live; after a rate change one background thread rebuilds
+# them all while requests keep using the previous tables. Catalogs that are no longer
+# referenced drop out on their own.
+_price_tables = weakref.WeakKeyDictionary()
+_price_tables_lock = threading.Lock()
+
+def build_price_table(car_data, rates):
+    # A SQLite catalog may not fit in memory, so its prices are still formatted per row.
+    return PriceTable(car_data, rates, precompute=not isinstance(car_data, SqliteCarStore))
+
+def price_table(car_data):
+    entry = _price_tables.get(car_data)
+    if entry is None:
+        with _price_tables_lock:
+            entry = _price_tables.get(car_data)
+            if entry is None:
+                entry = _price_tables[car_data] = build_price_table(car_data, RATES.current())
+    return entry
+
+def refresh_price_tables():
+    """Rebuilds the price tables made with older rates, then empties the response cache."""
+    with _price_tables_lock:
+        rates = RATES.rates
+        for car_data, entry in list(_price_tables.items()):
+            if entry.rates is not rates:
+                _price_tables[car_data] = build_price_table(car_data, rates)
+    RESPONSE_CACHE.clear()
+
+def rates_changed():
+    """RATES on_change hook: answers with single-car prices update at once, listings once rebuilt."""
+    RESPONSE_CACHE.clear()
+    thread = threading.Thread(target=refresh_price_tables, name='price-tables', daemon=True)
+    thread.start()
+    return thread
+
+RATES.on_change = rates_changed
+
+def listing_prices(car_data, currency):
+    """Row id -> the row's formatted base price in currency."""
+    return price_table(car_data).column('Price_Base_USD', currency)
+
+# --- Helper: Numeric Filter Phrases ---
+# A bound word and the number after it ("under $30,000", "over 15 kmpl", "after 2020",
+# "between 1500 and 2500 cc") make one comparison. The unit, or else the quantity named
+# just before the bound ("mileage over 15", "top trim under 60000"), picks the column;
+# a year bound ("after 2020") means the model year, and anything else the base price.
+# "from", "since" and "until" include the number; "from 2020" alone means that year.
+_NUMBER = r'\$?(\d[\d,]*(?:\.\d+)?)\s*(kmpl|km/l|km|cc|usd|dollars?)?\b'
+NUMERIC_FILTER_PATTERN = re.compile(
+    rf'\b(?:between|from)\s+{_NUMBER}\s+(?:and|to|until)\s+{_NUMBER}'
+    rf'|\b(under|below|less than|cheaper than|over|above|more than|newer than|older than|after|before|since|from|until)'
+    rf'\s+{_NUMBER}')
+LESS_THAN_BOUNDS = {'under', 'below', 'less than', 'cheaper than', 'older than', 'before', 'until'}
+INCLUSIVE_BOUNDS = {'since', 'from', 'until'}
+YEAR_BOUNDS = {'newer than', 'older than', 'after', 'before', 'since', 'from', 'until', 'between'}
+UNIT_QUANTITIES = {'kmpl': 'mileage', 'km/l': 'mileage', 'km': 'range', 'cc': 'engine_cc',
+                   'usd': 'price', 'dollar': 'price', 'dollars': 'price'}
+# The last of these named before a bound wins, except a top-trim phrase, which always does.
+QUANTITY_KEYWORDS = {
+    'price': ['price', 'cost', 'priced', 'budget'],
+    'mileage': ['mileage', 'milage', 'millage', 'efficiency', 'kmpl'],
+    'range': ['range', 'per charge'],
+    'engine_cc': ['engine', 'displacement'],
+    'year': ['year', 'made', 'built', 'released'],
+}
+TOP_PRICE_KEYWORDS = ['top trim', 'top-trim', 'fully loaded']
+# Mileage_kmpl holds kmpl for combustion cars and the range in km for EVs, so a bound on
+# either one also picks the powertrain (unless the message names one).
+QUANTITY_POWERTRAINS = {'mileage': 'ice', 'range': 'ev'}
 
-    rate = EXCHANGE_RATES.get(target_currency, 1.0)
-    converted_price = price_val * rate
+def looks_like_year(number):
+    return number.is_integer() and 1900 <= number <= 2100
 
-    if target_currency == 'BDT':
-        return f"৳{converted_price:,.0f} BDT"
-    elif target_currency == 'EUR':
-        return f"€{converted_price:,.0f} EUR"
-    elif target_currency == 'INR':
-        return f"₹{converted_price:,.0f} INR"
+def filter_quantity(context, unit, has_dollar, bound, number):
+    """Which quantity a bound on number applies to, from its unit or the text before it."""
+    if unit:
+        return UNIT_QUANTITIES[unit]
+    if any(keyword in context for keyword in TOP_PRICE_KEYWORDS):
+        return 'top_price'
+    if has_dollar:
+        return 'price'
+    named, position = None, -1
+    for quantity, keywords in QUANTITY_KEYWORDS.items():
+        for keyword in keywords:
+            found = context.rfind(keyword)
+            if found > position:
+                named, position = quantity, found
+    if named:
+        return named
+    if bound in YEAR_BOUNDS and looks_like_year(number):
+        return 'year'
+    return 'price'
+
+def add_numeric_bound(criteria, quantity, bound, number):
+    if quantity in QUANTITY_POWERTRAINS:
+        criteria['powertrain'] = QUANTITY_POWERTRAINS[quantity]
+        quantity = 'mileage'
+    if quantity == 'year':
+        year = int(number)
+        if bound in LESS_THAN_BOUNDS:
+            criteria['year_to'] = year if bound == 'until' else year - 1
+        else:
+            criteria['year_from'] = year if bound in INCLUSIVE_BOUNDS else year + 1
+            if bound == 'from':
+                criteria.setdefault('year_to', year)  # "from 2020" is the 2020 model year
+    elif bound in INCLUSIVE_BOUNDS:
+        direction = 'at_most' if bound in LESS_THAN_BOUNDS else 'at_least'
+        criteria[f'{quantity}_{direction}'] = number
     else:
-        return f"${converted_price:,.0f} USD"
+        direction = 'less_than' if bound in LESS_THAN_BOUNDS else 'more_than'
+        criteria[f'{quantity}_{direction}'] = number
+
+def parse_numeric_filters(user_text):
+    """Numeric filter criteria (price, top-trim price, mileage, engine CC, year) named in user_text."""
+    criteria = {}
+    previous_end = 0
+    for match in NUMERIC_FILTER_PATTERN.finditer(user_text):
+        context = user_text[previous_end:match.start()]
+        previous_end = match.end()
+        if match.group(1):
+            # "between low and high" and "from low to high" include both ends.
+            low, high = sorted(float(match.group(i).replace(',', '')) for i in (1, 3))
+            quantity = filter_quantity(context, match.group(2) or match.group(4), '$' in match.group(0), 'between', low)
+            if quantity == 'year' and not looks_like_year(high):
+                quantity = 'price'
+            add_numeric_bound(criteria, quantity, 'from', low)
+            add_numeric_bound(criteria, quantity, 'until', high)
+        else:
+            bound, number, unit = match.group(5), float(match.group(6).replace(',', '')), match.group(7)
+            quantity = filter_quantity(context, unit, '$' in match.group(0), bound, number)
+            add_numeric_bound(criteria, quantity, bound, number)
+    return criteria
 
 # --- 'parse_user_input' (FIXED LOGIC ORDER) ---
-def parse_user_input(user_text, car_data):
+def parse_user_input(user_text, car_data, keywords=None):
     user_text = user_text.lower()
+    # One pass over the message finds every keyword; the checks below only read the result.
+    if keywords is None:
+        keywords = scan_keywords(user_text, car_data)
     
     # 1. Conversational intents (Highest Priority)
-    conv_intents = {
-        'greeting': ['hello', 'hi', 'hey', 'salam'],
-        'goodbye': ['bye', 'goodbye', 'quit', 'exit'],
-        'thanks': ['thanks', 'thank you', 'appreciate it'],
-    }
-    for intent, keywords in conv_intents.items():
-        for keyword in keywords:
-            if re.search(r'\b' + re.escape(keyword) + r'\b', user_text):
-                return intent, None
+    if 'conversation' in keywords:
+        return keywords['conversation'], None
 
     # 2. Recommendation Intent
-    if any(k in user_text for k in ['best', 'most', 'cheapest', 'recommend me']):
+    if 'recommend' in keywords:
         criteria = {}
-        car_types = set(car['Type'].lower() for car in car_data if 'Type' in car)
-        for car_type in car_types:
-            if car_type in user_text:
-                criteria['type'] = car_type
-                break
-        if any(k in user_text for k in ['cheapest', 'lowest price']):
-            criteria['sort_by'] = 'price_asc'
-        elif any(k in user_text for k in ['most efficient', 'best mileage', 'highest mileage']):
-            criteria['sort_by'] = 'mileage_desc'
-        
-        if 'sort_by' in criteria:
+        if 'type' in keywords:
+            criteria['type'] = keywords['type']
+        if 'sort_by' in keywords:
+            criteria['sort_by'] = keywords['sort_by']
             return 'get_recommendation', criteria 
 
     # 3. Filter Intent
-    filter_keywords = ['find', 'show me', 'looking for', 'under', 'over', 'cheaper than', 'less than', 'more than']
-    if any(keyword in user_text for keyword in filter_keywords):
+    if 'filter' in keywords or ('number_filter' in keywords and any(char.isdigit() for char in user_text)):
         criteria = {}
-        car_types = set(car['Type'].lower() for car in car_data if 'Type' in car)
-        for car_type in car_types:
-            if car_type in user_text:
-                criteria['type'] = car_type
-                break
-        price_match = re.search(r'(\$)?([0-9,]+)', user_text)
+        if 'type' in keywords:
+            criteria['type'] = keywords['type']
+        if 'powertrain' in keywords:
+            criteria['powertrain'] = keywords['powertrain']
+        numeric_criteria = parse_numeric_filters(user_text)
+        for key, value in numeric_criteria.items():
+            criteria.setdefault(key, value)
+        price_match = None if numeric_criteria else re.search(r'(\$)?([0-9,]+)', user_text)
         if price_match:
             price_str = price_match.group(2).replace(',', '') 
             try:
                 price_num = float(price_str)
-                if any(k in user_text for k in ['under', 'less than', 'cheaper than']):
-                    criteria['price_less_than'] = price_num
-                elif any(k in user_text for k in ['over', 'more than']):
-                    criteria['price_more_than'] = price_num
+                if 'price_bound' in keywords:
+                    criteria[keywords['price_bound']] = price_num
             except ValueError:
                 pass 
-        companies = set(car['Company'].lower() for car in car_data if 'Company' in car)
-        for company in companies:
-            if company in user_text:
-                criteria['company'] = company
-                break
+        if 'company' in keywords:
+            criteria['company'] = keywords['company']
         if criteria: 
             return 'filter_cars', criteria
 
@@ -143,26 +496,15 @@ def parse_user_input(user_text, car_data):
     
     # 4. Check for specific Car Model
     matched_entity = None
-    if car_data:
-        model_list = [car['Model'] for car in car_data if 'Model' in car]
-        best_match, score = process.extractOne(user_text, model_list)
+    if car_data and car_data.model_matcher:
+        with stage('match'):
+            best = car_data.model_matcher.extract_one(user_text)
         # High threshold to avoid bad guesses
-        if score > 78: 
-            matched_entity = best_match 
+        if best and best[1] > MATCH_THRESHOLD: 
+            matched_entity = best[0] 
             
     # 5. Find the task intent (price, mileage, etc.)
-    task_intents = {
-        'get_price': ['price', 'cost', 'how much'],
-        'get_mileage': ['mileage', 'fuel', 'kmpl', 'range', 'milage', 'millage'], 
-        'get_engine': ['engine', 'cc', 'horsepower'],
-        'get_availability': ['available', 'country', 'countries', 'sell in'],
-        'get_all_info': ['tell me about', 'details', 'info', 'information on']
-    }
-    matched_intent = None
-    for intent, keywords in task_intents.items():
-        if any(keyword in user_text for keyword in keywords):
-            matched_intent = intent
-            break
+    matched_intent = keywords.get('task')
 
     # --- DECISION TIME ---
 
@@ -174,54 +516,115 @@ def parse_user_input(user_text, car_data):
 
     # B. If we found NO car, *then* check if they asked about a COMPANY (e.g. "Toyota")
     # This prevents "Toyota Corolla" from triggering the Company summary.
-    if car_data:
-        companies = set(car['Company'].lower() for car in car_data if 'Company' in car)
-        for company in companies:
-            if company in user_text:
-                return 'get_company_info', company 
+    if 'company' in keywords:
+        return 'get_company_info', keywords['company'] 
 
     # C. Return whatever intent we found (or None)
     return matched_intent, None
 
 # --- 'filter_cars' ---
-def filter_cars(criteria, car_data):
-    matches = []
+# Numeric criteria and the comparison each one makes on a catalog column.
+FILTER_CONDITIONS = {
+    'price_less_than': ('Price_Base_USD', '<'),
+    'price_more_than': ('Price_Base_USD', '>'),
+    'price_at_most': ('Price_Base_USD', '<='),
+    'price_at_least': ('Price_Base_USD', '>='),
+    'top_price_less_than': ('Price_TopTrim_USD', '<'),
+    'top_price_more_than': ('Price_TopTrim_USD', '>'),
+    'top_price_at_most': ('Price_TopTrim_USD', '<='),
+    'top_price_at_least': ('Price_TopTrim_USD', '>='),
+    'mileage_less_than': ('Mileage_kmpl', '<'),
+    'mileage_more_than': ('Mileage_kmpl', '>'),
+    'mileage_at_most': ('Mileage_kmpl', '<='),
+    'mileage_at_least': ('Mileage_kmpl', '>='),
+    'engine_cc_less_than': ('Engine_CC', '<'),
+    'engine_cc_more_than': ('Engine_CC', '>'),
+    'engine_cc_at_most': ('Engine_CC', '<='),
+    'engine_cc_at_least': ('Engine_CC', '>='),
+    'year_from': ('Year', '>='),
+    'year_to': ('Year', '<='),
+}
+# Electric cars are listed with a 0 CC engine.
+POWERTRAIN_CONDITIONS = {
+    'ev': ('Engine_CC', '==', 0),
+    'ice': ('Engine_CC', '>', 0),
+}
+
+def filter_car_ids(criteria, car_data):
+    """Row ids of the cars matching criteria, in catalog order."""
     if not car_data:
-        return matches
-    for car in car_data:
-        passes_all_checks = True
-        if 'type' in criteria:
-            if car.get('Type', '').lower() != criteria['type']:
-                passes_all_checks = False
-                continue 
-        if 'company' in criteria:
-            if car.get('Company', '').lower() != criteria['company']:
-                passes_all_checks = False
-                continue
-        if 'price_less_than' in criteria:
-            try:
-                car_price = float(car.get('Price_Base_USD', 'inf'))
-                if car_price >= criteria['price_less_than']:
-                    passes_all_checks = False
-                    continue
-            except (ValueError, TypeError):
-                passes_all_checks = False 
-                continue
-        if 'price_more_than' in criteria:
-            try:
-                car_price = float(car.get('Price_Base_USD', '-inf'))
-                if car_price <= criteria['price_more_than']:
-                    passes_all_checks = False
-                    continue
-            except (ValueError, TypeError):
-                passes_all_checks = False 
-                continue
-        if passes_all_checks:
-            matches.append(car)
-    return matches
+        return []
+    equals = {}
+    if 'type' in criteria:
+        equals['Type'] = criteria['type']
+    if 'company' in criteria:
+        equals['Company'] = criteria['company']
+    conditions = [(column, op, criteria[key]) for key, (column, op) in FILTER_CONDITIONS.items() if key in criteria]
+    if 'powertrain' in criteria:
+        conditions.append(POWERTRAIN_CONDITIONS[criteria['powertrain']])
+    with stage('filter'):
+        return car_data.select(equals, conditions)
+
+def filter_cars(criteria, car_data):
+    return [car_data[row_id] for row_id in filter_car_ids(criteria, car_data)]
+
+# --- Filter result pages ---
+FILTER_CRITERIA = {'type': str, 'company': str, 'powertrain': str, 'year_from': int, 'year_to': int,
+                   **{key: float for key in FILTER_CONDITIONS if key not in ('year_from', 'year_to')}}
+
+def clean_filter_criteria(raw):
+    """Filter criteria from untrusted input (a cursor or query string). Raises ValueError."""
+    criteria = {}
+    for key, value in raw.items():
+        if key not in FILTER_CRITERIA:
+            raise ValueError(f"unknown filter '{key}'")
+        criteria[key] = FILTER_CRITERIA[key](value)
+        if isinstance(criteria[key], str):
+            criteria[key] = criteria[key].lower()
+    if criteria.get('powertrain', 'ev') not in POWERTRAIN_CONDITIONS:
+        raise ValueError(f"unknown powertrain '{criteria['powertrain']}'")
+    return criteria
+
+def encode_cursor(criteria, currency, offset):
+    payload = json.dumps({'criteria': criteria, 'currency': currency, 'offset': offset}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(criteria, currency, offset) from a cursor made by encode_cursor. Raises ValueError.
+
+    Cursors hold the query, not the results, so a page after a catalog reload
+    comes from the new catalog.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        criteria = clean_filter_criteria(payload['criteria'])
+        offset = int(payload['offset'])
+        currency = payload['currency']
+        if offset < 0 or not isinstance(currency, str) or currency not in EXCHANGE_RATES:
+            raise ValueError("invalid cursor")
+    except (TypeError, KeyError, AttributeError, ValueError, OverflowError) as e:
+        raise ValueError("invalid cursor") from e
+    return criteria, currency, offset
+
+def format_filter_match(car, price_str):
+    return f"• <b>{car.get('Company')} {car.get('Model')}</b> ({car.get('Type')}) - Starts at {price_str}<br>"
+
+def filter_page_html(criteria, row_ids, offset, currency, car_data):
+    """One page of matches starting at offset, plus a "Show more" button if any remain."""
+    end = min(offset + RESULTS_PAGE_SIZE, len(row_ids))
+    prices = listing_prices(car_data, currency)
+    parts = [format_filter_match(car_data[row_ids[i]], prices[row_ids[i]]) for i in range(offset, end)]
+    remaining = len(row_ids) - end
+    if remaining > 0:
+        cursor = encode_cursor(criteria, currency, end)
+        parts.append(f'<button class="show-more-btn" onclick="showMoreResults(this)" data-cursor="{cursor}">'
+                     f'Show {min(RESULTS_PAGE_SIZE, remaining)} more (of {remaining} left)</button>')
+    return "".join(parts)
 
 # --- 'generate_response' (UPDATED with currency) ---
-def generate_response(intent, details, currency='USD'): 
+def generate_response(intent, details, currency='USD', car_data=None): 
+    if car_data is None:
+        car_data = CAR_DATA
     if intent == 'greeting':
         return "Hello! How can I help you with car information today?"
     if intent == 'goodbye':
@@ -231,7 +634,7 @@ def generate_response(intent, details, currency='USD'):
 
     if intent == 'get_company_info':
         company_name = details 
-        models = [car['Model'] for car in CAR_DATA if car.get('Company', '').lower() == company_name]
+        models = car_data.values('Model', car_data.lookup('Company', company_name))
         model_list_str = ", ".join(models)
         
         if company_name == 'tesla':
@@ -254,45 +657,28 @@ def generate_response(intent, details, currency='USD'):
 
     if intent == 'get_recommendation':
         criteria = details
-        matches = []
-        if 'type' in criteria:
-            matches = filter_cars({'type': criteria['type']}, CAR_DATA)
-        else:
-            matches = list(CAR_DATA) 
-        if not matches:
-            return "I'm sorry, I couldn't find any cars for that recommendation."
-
         sort_key = criteria.get('sort_by')
+        type_str = criteria.get('type', 'car')
+        if sort_key not in ('price_asc', 'mileage_desc'):
+            return "I can find the cheapest or most fuel-efficient car. What would you like?"
+        # Read straight from the materialized top-k ranking kept by the store.
+        top_car = car_data.top(sort_key, criteria.get('type'))
+        if top_car is None:
+            return "I'm sorry, I couldn't find any cars for that recommendation."
         if sort_key == 'price_asc':
-            try:
-                sorted_matches = sorted(matches, key=lambda car: float(car.get('Price_Base_USD', 'inf')))
-                top_car = sorted_matches[0]
-                type_str = criteria.get('type', 'car')
-                price_str = format_price(top_car.get('Price_Base_USD'), currency)
-                return f"The cheapest <b>{type_str}</b> in my database is the <b>{top_car['Company']} {top_car['Model']}</b>, starting at <b>{price_str}</b>."
-            except Exception as e:
-                return "I had trouble sorting the prices for that request."
-        if sort_key == 'mileage_desc':
-            try:
-                sorted_matches = sorted(matches, key=lambda car: float(car.get('Mileage_kmpl', '0')), reverse=True)
-                top_car = sorted_matches[0]
-                type_str = criteria.get('type', 'car')
-                mileage_response = generate_response('get_mileage', top_car, currency) 
-                return f"The most efficient <b>{type_str}</b> I found is the <b>{top_car['Company']} {top_car['Model']}</b>.<br>{mileage_response}"
-            except Exception as e:
-                return "I had trouble sorting the mileage for that request."
-        return "I can find the cheapest or most fuel-efficient car. What would you like?"
+            price_str = format_price(top_car.number('Price_Base_USD'), currency)
+            return f"The cheapest <b>{type_str}</b> in my database is the <b>{top_car['Company']} {top_car['Model']}</b>, starting at <b>{price_str}</b>."
+        mileage_response = generate_response('get_mileage', top_car, currency) 
+        return f"The most efficient <b>{type_str}</b> I found is the <b>{top_car['Company']} {top_car['Model']}</b>.<br>{mileage_response}"
 
     if intent == 'filter_cars':
         criteria = details 
-        matches = filter_cars(criteria, CAR_DATA)
-        if not matches:
+        row_ids = filter_car_ids(criteria, car_data)
+        if not row_ids:
             return "I'm sorry, I couldn't find any cars that match your criteria."
-        response = f"I found <b>{len(matches)} cars</b> matching your criteria:<br><br>"
-        for car in matches:
-            price_str = format_price(car.get('Price_Base_USD'), currency)
-            response += f"• <b>{car.get('Company')} {car.get('Model')}</b> ({car.get('Type')}) - Starts at {price_str}<br>"
-        return response
+        # Only the first page is rendered; the rest is fetched with the cursor in the "Show more" button.
+        return (f"I found <b>{len(row_ids)} cars</b> matching your criteria:<br><br>"
+                + filter_page_html(criteria, row_ids, 0, currency, car_data))
 
     car_details = details 
     if not car_details:
@@ -303,8 +689,8 @@ def generate_response(intent, details, currency='USD'):
     company, model = car_details.get('Company'), car_details.get('Model')
     
     if intent == 'get_price':
-        base_price = format_price(car_details.get('Price_Base_USD'), currency)
-        top_price = format_price(car_details.get('Price_TopTrim_USD'), currency)
+        base_price = format_price(car_details.number('Price_Base_USD'), currency)
+        top_price = format_price(car_details.number('Price_TopTrim_USD'), currency)
         notes = car_details.get('Notes')
         response = f"The {company} {model} starts at around <b>{base_price}</b>."
         if car_details.get('Price_TopTrim_USD'):
@@ -363,329 +749,7 @@ HTML_TEMPLATE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Car Genie</title>
-    <style>
-        /* --- Variables for Themes --- */
-        :root {
-            /* Dark Mode (Default) */
-            --dark-bg: #131314;
-            --input-bg: #1e1f20;
-            --text-color: #e3e3e3;
-            --text-secondary: #9b9b9b;
-            --chip-bg: #2a2a2d;
-            --chip-hover: #3b3b3e;
-            --user-msg-bg: #2a2a2d;
-            --bot-msg-bg: #2a2a2d;
-            --shadow-color: rgba(0,0,0,0.3);
-            --btn-hover-bg: #3b3b3e;
-        }
-        
-        /* Light Mode Class */
-        .light-mode {
-            --dark-bg: #ffffff;
-            --input-bg: #f0f2f5;
-            --text-color: #1f1f1f;
-            --text-secondary: #5f6368;
-            --chip-bg: #e3e3e3;
-            --chip-hover: #d1d1d1;
-            --user-msg-bg: #e3e3e3;
-            --bot-msg-bg: #f1f3f4;
-            --shadow-color: rgba(0,0,0,0.1);
-            --btn-hover-bg: #e0e0e0;
-        }
-
-        body { 
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; 
-            background-color: var(--dark-bg); 
-            color: var(--text-color);
-            margin: 0; 
-            padding: 20px; 
-            display: flex; 
-            justify-content: center; 
-            align-items: center; 
-            min-height: 95vh; 
-            transition: background-color 0.3s, color 0.3s;
-        }
-        .main-container {
-            width: 100%;
-            max-width: 800px;
-            height: 90vh;
-            display: flex;
-            flex-direction: column;
-            justify-content: flex-end; 
-        }
-        
-        /* Header & Settings */
-        .app-header {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            padding: 0 10px 15px 10px; 
-            font-size: 1.25rem; 
-            font-weight: 500;
-            color: var(--text-secondary); 
-            position: relative;
-        }
-        .app-header img {
-            height: 28px; 
-            width: auto;
-        }
-        .header-spacer {
-            flex-grow: 1; 
-        }
-        
-        /* Icons (Reset, Settings) */
-        .header-btn {
-            background: none;
-            border: none;
-            color: var(--text-secondary);
-            font-size: 24px;
-            cursor: pointer;
-            transition: color 0.2s;
-            padding: 0 5px;
-            line-height: 1;
-        }
-        .header-btn:hover {
-            color: var(--text-color);
-        }
-
-        /* Compact Settings Modal */
-        .modal-overlay {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0, 0, 0, 0.5);
-            display: none;
-            justify-content: center;
-            align-items: center;
-            z-index: 1000;
-        }
-        .modal-content {
-            background-color: var(--input-bg);
-            padding: 15px; 
-            border-radius: 16px; 
-            width: 240px; 
-            box-shadow: 0 4px 20px var(--shadow-color);
-            color: var(--text-color);
-        }
-        .modal-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 10px;
-            font-size: 1rem; 
-            font-weight: bold;
-        }
-        .close-modal {
-            cursor: pointer;
-            font-size: 20px;
-        }
-        .setting-item {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 8px 0; 
-            border-bottom: 1px solid var(--chip-bg);
-            font-size: 0.9rem; 
-        }
-        .setting-item:last-child {
-            border-bottom: none;
-        }
-        
-        /* Compact Toggle Switch */
-        .switch {
-            position: relative;
-            display: inline-block;
-            width: 40px;
-            height: 20px;
-            transform: scale(0.8); 
-        }
-        .switch input { opacity: 0; width: 0; height: 0; }
-        .slider {
-            position: absolute;
-            cursor: pointer;
-            top: 0; left: 0; right: 0; bottom: 0;
-            background-color: #ccc;
-            transition: .4s;
-            border-radius: 34px;
-        }
-        .slider:before {
-            position: absolute;
-            content: "";
-            height: 16px;
-            width: 16px;
-            left: 2px;
-            bottom: 2px;
-            background-color: white;
-            transition: .4s;
-            border-radius: 50%;
-        }
-        input:checked + .slider { background-color: #2196F3; }
-        input:checked + .slider:before { transform: translateX(20px); }
-        
-        /* Compact Clear Button */
-        .clear-btn {
-            width: 100%; 
-            background-color: #ff4d4d; 
-            color: white; 
-            border: none;
-            border-radius: 12px;
-            padding: 6px 10px;
-            font-size: 12px;
-            cursor: pointer;
-        }
-        
-        /* Normal Chat Styles */
-        .chat-box { 
-            flex-grow: 1; 
-            padding: 20px 0; 
-            overflow-y: auto; 
-            display: flex; 
-            flex-direction: column; 
-            gap: 15px; 
-            scrollbar-width: thin;
-            scrollbar-color: var(--chip-bg) transparent;
-        }
-        .greeting {
-            font-size: 3.5rem;
-            font-weight: 500;
-            text-align: center;
-            color: var(--text-secondary);
-            margin: auto; 
-        }
-        .greeting img { display: none; }
-        .message { 
-            padding: 12px 18px; 
-            border-radius: 20px; 
-            max-width: 75%; 
-            line-height: 1.5; 
-            word-wrap: break-word;
-        }
-        .user-message { 
-            background: var(--user-msg-bg); 
-            color: var(--text-color); 
-            align-self: flex-end; 
-            border-radius: 20px 20px 5px 20px; 
-        }
-        .bot-message { 
-            background-color: var(--bot-msg-bg); 
-            color: var(--text-color); 
-            align-self: flex-start; 
-            border-radius: 20px 20px 20px 5px; 
-        }
-        
-        /* New Show/Hide Button Styles */
-        .show-img-btn {
-            background-color: var(--chip-bg);
-            color: var(--text-color);
-            border: 1px solid var(--chip-hover);
-            border-radius: 12px;
-            padding: 6px 12px;
-            font-size: 0.85rem;
-            cursor: pointer;
-            transition: background-color 0.2s;
-            margin-top: 5px;
-        }
-        .show-img-btn:hover {
-            background-color: var(--chip-hover);
-        }
-
-        /* Typing Indicator */
-        .typing-indicator {
-            display: flex;
-            align-items: center;
-            padding: 8px 0; 
-        }
-        .typing-indicator div {
-            width: 6px; 
-            height: 6px; 
-            border-radius: 50%;
-            background-color: var(--text-secondary);
-            animation: typing-bounce 1.2s infinite ease-in-out;
-            margin: 0 2px; 
-        }
-        .typing-indicator div:nth-child(1) { animation-delay: -0.24s; }
-        .typing-indicator div:nth-child(2) { animation-delay: -0.12s; }
-        @keyframes typing-bounce {
-            0%, 80%, 100% { transform: scale(0); } 
-            40% { transform: scale(1.0); }
-        }
-        
-        /* Input Area */
-        .input-container {
-            position: relative;
-            display: flex;
-            align-items: center;
-            background-color: var(--input-bg);
-            border-radius: 28px;
-            padding: 5px 5px 5px 20px;
-            box-shadow: 0 4px 12px var(--shadow-color);
-        }
-        #userInput { 
-            flex-grow: 1; 
-            background: transparent;
-            border: none;
-            color: var(--text-color);
-            font-size: 16px; 
-            outline: none; 
-            padding: 15px 0;
-            line-height: 1.5;
-        }
-        .input-icon-btn {
-            background: none;
-            border: none;
-            color: var(--text-secondary);
-            font-size: 18px;
-            padding: 10px;
-            cursor: pointer;
-            transition: color 0.2s;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .input-icon-btn:hover { color: var(--text-color); }
-        
-        #sendButton { 
-            background-color: var(--chip-bg); 
-            color: var(--text-color); 
-            border: none; 
-            border-radius: 50%; 
-            width: 44px;
-            height: 44px;
-            margin-left: 10px; 
-            cursor: pointer; 
-            font-size: 20px; 
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            transition: background-color 0.2s;
-        }
-        #sendButton:hover { background-color: var(--btn-hover-bg); }
-        
-        /* Suggestion Chips */
-        .suggestion-area {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 12px;
-            padding: 20px 0;
-            justify-content: center; 
-        }
-        .suggestion-btn {
-            background-color: var(--chip-bg);
-            color: var(--text-color);
-            border: none;
-            border-radius: 16px;
-            padding: 8px 14px;
-            font-size: 14px;
-            cursor: pointer;
-            transition: background-color 0.2s;
-        }
-        .suggestion-btn:hover { background-color: var(--btn-hover-bg); }
-
-        /* Font Size Classes */
-        .large-font { font-size: 1.2em; }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/chat.css') }}">
 </head>
 <body>
     <!-- Settings Modal -->
@@ -734,7 +798,7 @@ HTML_TEMPLATE = """
         <div class="app-header">
             <button class="header-btn" title="Settings" onclick="toggleSettings()">⚙️</button>
             
-            <img src="{{ url_for('static', filename='images/logo.png') }}" alt="Car Genie Logo" id="appLogo">
+            <img src="{{ asset_url('images/logo.png') }}" alt="Car Genie Logo" id="appLogo">
             <span>Car Genie</span>
             
             <div class="header-spacer"></div>
@@ -765,203 +829,375 @@ HTML_TEMPLATE = """
     </div>
 
     <script>
-        const chatBox = document.getElementById('chatBox');
-        const userInput = document.getElementById('userInput');
-        const sendButton = document.getElementById('sendButton');
-        const greeting = document.getElementById('greeting');
-        const suggestionArea = document.getElementById('suggestionArea');
-        const resetButton = document.getElementById('resetButton');
-        
-        // Settings Elements
-        const settingsModal = document.getElementById('settingsModal');
-        const themeToggle = document.getElementById('themeToggle');
-        const fontToggle = document.getElementById('fontToggle');
-        const logoToggle = document.getElementById('logoToggle');
-        const appLogo = document.getElementById('appLogo');
-        const mainContainer = document.getElementById('mainContainer');
-
-        // --- Toggle Image Function (Global Scope) ---
-        window.toggleImage = function(btn) {
-            const imgContainer = btn.nextElementSibling;
-            if (imgContainer.style.display === 'none') {
-                imgContainer.style.display = 'block';
-                btn.textContent = '🙈 Hide Image';
-            } else {
-                imgContainer.style.display = 'none';
-                btn.textContent = '📸 Show Image';
-            }
-        }
-
-        // --- Settings Logic ---
-        function toggleSettings() {
-            if (settingsModal.style.display === 'flex') {
-                settingsModal.style.display = 'none';
-            } else {
-                settingsModal.style.display = 'flex';
-            }
-        }
-
-        themeToggle.addEventListener('change', function() {
-            if (this.checked) {
-                document.body.classList.add('light-mode');
-            } else {
-                document.body.classList.remove('light-mode');
-            }
-        });
-
-        fontToggle.addEventListener('change', function() {
-            if (this.checked) {
-                mainContainer.classList.add('large-font');
-            } else {
-                mainContainer.classList.remove('large-font');
-            }
-        });
-
-        logoToggle.addEventListener('change', function() {
-            if (this.checked) {
-                appLogo.style.display = 'block';
-            } else {
-                appLogo.style.display = 'none';
-            }
-        });
-
-        function clearChatHistory() {
-            chatBox.innerHTML = ''; 
-            chatBox.appendChild(greeting); 
-            greeting.style.display = 'block'; 
-            suggestionArea.style.display = 'flex'; 
-            resetButton.style.display = 'none';
-            fetch('/reset_memory', { method: 'POST' });
-            toggleSettings(); // Close modal
-        }
-
-        // Close modal if clicked outside
-        window.onclick = function(event) {
-            if (event.target == settingsModal) {
-                settingsModal.style.display = "none";
-            }
-        }
-
-        // --- Chat Logic ---
-        const suggestionButtons = document.querySelectorAll('.suggestion-btn');
-        suggestionButtons.forEach(button => {
-            button.addEventListener('click', () => {
-                const suggestionText = button.innerText;
-                userInput.value = suggestionText;
-                sendMessage();
-            });
-        });
-        
-        async function sendMessage() {
-            const userText = userInput.value.trim();
-            if (userText === '') return;
-
-            if (greeting.style.display !== 'none') {
-                greeting.style.display = 'none';
-                suggestionArea.style.display = 'none';
-                resetButton.style.display = 'block'; 
-            }
-
-            addMessage(userText, 'user-message');
-            userInput.value = '';
-
-            try {
-                const typingIndicatorHTML = `
-                    <div class="typing-indicator">
-                        <div></div>
-                        <div></div>
-                        <div></div>
-                    </div>`;
-                const typingIndicator = addMessage(typingIndicatorHTML, 'bot-message');
-                
-                const response = await fetch('/ask', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: userText })
-                });
-                const data = await response.json();
-                
-                chatBox.removeChild(typingIndicator);
-                addMessage(data.answer, 'bot-message');
-
-            } catch (error) {
-                console.error('Error:', error);
-                addMessage('Sorry, something went wrong. Please try again.', 'bot-message');
-            }
-        }
-
-        function addMessage(text, className) {
-            const messageElement = document.createElement('div');
-            messageElement.classList.add('message', className);
-            messageElement.innerHTML = text; 
-            chatBox.appendChild(messageElement);
-            chatBox.scrollTop = chatBox.scrollHeight;
-            return messageElement; 
-        }
-        
-        function resetChat() {
-            clearChatHistory();
-        }
-        
-        sendButton.addEventListener('click', sendMessage);
-        resetButton.addEventListener('click', resetChat); 
-        
-        userInput.addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') {
-                e.preventDefault(); 
-                sendMessage();
-            }
-        });
+        const TYPING_DELAY_MS = {{ typing_delay_ms | int }};
     </script>
+    <script src="{{ asset_url('js/chat.js') }}"></script>
 </body>
 </html>
 """
 
+def asset_url(name):
+    return f"/assets/{STATIC_ASSETS.versioned_name(name)}"
+
+def asset_response(asset, cache_control):
+    """The asset in the best encoding the client accepts, or 304 if its ETag still matches."""
+    encoding, body = asset.negotiate(request.accept_encodings)
+    response = Response(body, content_type=asset.mimetype)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different representation, so each gets its own strong ETag.
+    response.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+    return response.make_conditional(request)
+
+# The page has nothing per-request in it, so it is rendered and compressed once.
+with app.app_context():
+    HOME_PAGE = Asset(render_template_string(HTML_TEMPLATE, typing_delay_ms=TYPING_DELAY_MS, asset_url=asset_url)
+                      .encode('utf-8'), 'text/html; charset=utf-8')
+
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE)
+    # Revalidated on every visit (a 304 while it is unchanged) so a new deploy shows up at once.
+    return asset_response(HOME_PAGE, 'no-cache')
+
+@app.route('/assets/<path:name>')
+def static_asset(name):
+    asset = STATIC_ASSETS.get(name)
+    if asset is None:
+        abort(404)
+    return asset_response(asset, ASSET_CACHE_CONTROL)
 
 @app.route('/reset_memory', methods=['POST'])
 def reset_memory():
-    session.pop('last_car_model', None)
+    context_id = request.cookies.get(CONTEXT_COOKIE)
+    if context_id:
+        CONTEXT_STORE.delete(context_id)
     return '', 204
 
-@app.route('/ask', methods=['POST'])
-def ask():
-    if not CAR_DATA:
-        return jsonify({'answer': 'I am sorry, my knowledge base of cars could not be loaded.'})
+CAR_INTENTS = ['get_price', 'get_mileage', 'get_engine', 'get_all_info', 'get_availability']
 
-    user_message = request.json['message']
-    
-    # 1. Detect currency from message
-    req_currency = detect_currency(user_message)
+# --- Metrics ---
+# Per-stage timings and answer counters for /ask and /ask_batch, served on /metrics.
+# Stages nest: 'parse' includes 'match' (fuzzy model matching) and 'render' includes 'filter'.
+METRICS = Registry()
+INTENT_LABELS = [*CONV_INTENTS, 'get_recommendation', 'filter_cars', 'next_page', 'get_company_info', *TASK_INTENTS,
+                 'none']
+STAGES = ['keywords', 'parse', 'match', 'lookup', 'render', 'filter']
+ASK_SECONDS = METRICS.histogram('cargenie_ask_seconds', "Time to answer one message.",
+                                {'intent': INTENT_LABELS, 'cache': ['hit', 'miss']})
+STAGE_SECONDS = METRICS.histogram('cargenie_ask_stage_seconds', "Time spent in each stage of answering a message.",
+                                  {'stage': STAGES, 'intent': INTENT_LABELS})
+INTENTS_TOTAL = METRICS.counter('cargenie_intents_total', "Messages answered, by intent.", {'intent': INTENT_LABELS})
+CURRENCIES_TOTAL = METRICS.counter('cargenie_currencies_total', "Messages answered, by the currency prices were shown in.",
+                                   {'currency': list(EXCHANGE_RATES)})
+FALLBACKS_TOTAL = METRICS.counter('cargenie_fallback_answers_total',
+                                  "Messages answered with an apology: nothing understood, or no known car to talk about.",
+                                  {'reason': ['unrecognized', 'unknown_car']})
+
+def record_answer(timer, seconds, intent, fallback, currency, cached):
+    intent = intent or 'none'
+    updates = [*ASK_SECONDS.updates(seconds, intent, 'hit' if cached else 'miss'),
+               *INTENTS_TOTAL.updates(intent), *CURRENCIES_TOTAL.updates(currency)]
+    for stage_name, stage_seconds in timer.stages:
+        updates.extend(STAGE_SECONDS.updates(stage_seconds, stage_name, intent))
+    if fallback:
+        updates.extend(FALLBACKS_TOTAL.updates(fallback))
+    METRICS.record(updates)
+
+def answer_message(user_message, last_car_context, car_data, keywords=None, currency=None):
+    """Returns (response_text, car model to remember or None, whether last_car_context was used,
+    intent, fallback reason or None, filter criteria or None)."""
+    # 1. Detect currency from message, unless the caller chose one
+    if keywords is None:
+        with stage('keywords'):
+            keywords = scan_keywords(user_message, car_data)
+    req_currency = currency or detect_currency(user_message, keywords)
     if not req_currency:
         req_currency = 'USD' # Default to USD if no specific currency mentioned
 
-    intent, details = parse_user_input(user_message, CAR_DATA)
+    with stage('parse'):
+        intent, details = parse_user_input(user_message, car_data, keywords)
     car_details = None
-    
-    last_car_context = session.get('last_car_model')
+    remembered_model = None
+    # A follow-up like "what about its price" depends on the remembered car, even when there is none.
+    uses_context = intent in CAR_INTENTS and not details
 
-    if intent in ['get_price', 'get_mileage', 'get_engine', 'get_all_info', 'get_availability'] and not details:
+    if uses_context:
         if last_car_context:
             details = last_car_context
-            car_details = get_car_details(details, CAR_DATA)
-
-    if intent not in ['greeting', 'goodbye', 'thanks', 'filter_cars', 'get_recommendation', 'get_company_info']:
-        if details: 
-            car_details = get_car_details(details, CAR_DATA)
-            session['last_car_model'] = details
-        response_text = generate_response(intent, car_details, req_currency)
-    elif intent in ['filter_cars', 'get_recommendation']:
-        response_text = generate_response(intent, details, req_currency)
-    elif intent == 'get_company_info':
-        response_text = generate_response(intent, details, req_currency)
+            with stage('lookup'):
+                car_details = get_car_details(details, car_data)
+
+    with stage('render'):
+        if intent not in ['greeting', 'goodbye', 'thanks', 'filter_cars', 'get_recommendation', 'get_company_info']:
+            if details: 
+                with stage('lookup'):
+                    car_details = get_car_details(details, car_data)
+                remembered_model = details
+            response_text = generate_response(intent, car_details, req_currency, car_data)
+        elif intent in ['filter_cars', 'get_recommendation']:
+            response_text = generate_response(intent, details, req_currency, car_data)
+        elif intent == 'get_company_info':
+            response_text = generate_response(intent, details, req_currency, car_data)
+        else:
+            response_text = generate_response(intent, None, req_currency, car_data)
+    fallback = None
+    if intent is None:
+        fallback = 'unrecognized'
+    elif intent in CAR_INTENTS and not car_details:
+        fallback = 'unknown_car'
+    filter_criteria = details if intent == 'filter_cars' else None
+    return response_text, remembered_model, uses_context, intent, fallback, filter_criteria
+
+def answer_cached(user_message, last_car_context, car_data, currency=None, default_currency=None):
+    """(response_text, car model to remember or None, filter criteria or None, currency shown or None)
+    through the response cache.
+
+    currency overrides the message; default_currency is used when the message names none.
+    """
+    started = time.perf_counter()
+    computed = False
+    RATES.current()  # new rates empty the cache, so check before answering from it
+    with timing() as timer:
+        user_message = user_message.strip().lower()
+        with stage('keywords'):
+            keywords = scan_keywords(user_message, car_data)
+        currency = currency or detect_currency(user_message, keywords) or default_currency
+        cache_key = (user_message, currency)
+
+        def compute():
+            nonlocal computed
+            computed = True
+            response_text, remembered_model, uses_context, intent, fallback, filter_criteria = answer_message(
+                user_message, last_car_context, car_data, keywords, currency)
+            return (response_text, remembered_model, intent, fallback, filter_criteria), uses_context
+
+        response_text, remembered_model, intent, fallback, filter_criteria = RESPONSE_CACHE.get(
+            car_data, cache_key, last_car_context, compute)
+    record_answer(timer, time.perf_counter() - started, intent, fallback, currency or 'USD', not computed)
+    return response_text, remembered_model, filter_criteria, currency
+
+# "Next page" style follow-ups continue the last filter answer from the conversation context.
+NEXT_PAGE_MESSAGES = {'next', 'next page', 'more', 'show more', 'more results', 'show more results'}
+
+def answer_next_page(last_filter, car_data):
+    """(response_text, offset after this page) for the page of the last filter answer at its offset.
+
+    Like a cursor, the context holds the query and not the results, so the
+    page comes from the current catalog.
+    """
+    started = time.perf_counter()
+    criteria, currency, offset = last_filter['criteria'], last_filter['currency'], last_filter['offset']
+    with timing() as timer:
+        row_ids = filter_car_ids(criteria, car_data)
+        with stage('render'):
+            if offset >= len(row_ids):
+                response_text = "That's all the cars matching your criteria."
+            else:
+                end = min(offset + RESULTS_PAGE_SIZE, len(row_ids))
+                response_text = (f"Cars {offset + 1} to {end} of <b>{len(row_ids)}</b>:<br><br>"
+                                 + filter_page_html(criteria, row_ids, offset, currency, car_data))
+                offset = end
+    record_answer(timer, time.perf_counter() - started, 'next_page', None, currency, False)
+    return response_text, offset
+
+def load_context():
+    """(context id, context, whether the id is new) for this request's context cookie."""
+    context_id = request.cookies.get(CONTEXT_COOKIE)
+    context = CONTEXT_STORE.get(context_id) if context_id else None
+    if context is None:
+        # An unknown or expired id is not reused, so a client cannot pick its own id.
+        return new_context_id(), {}, True
+    return context_id, context, False
+
+@app.route('/ask', methods=['POST'])
+def ask():
+    car_data = CAR_DATA  # read once: a reload mid-request must not mix two catalogs
+    if not car_data:
+        return jsonify({'answer': 'I am sorry, my knowledge base of cars could not be loaded.'})
+
+    user_message = request.json['message']
+    context_id, context, new_context = load_context()
+    last_filter = context.get('filter')
+    if last_filter and user_message.strip().lower().rstrip('.!?') in NEXT_PAGE_MESSAGES:
+        response_text, offset = answer_next_page(last_filter, car_data)
+        context['filter'] = {**last_filter, 'offset': offset}
     else:
-        response_text = generate_response(intent, None, req_currency)
-    
-    time.sleep(1.5) 
-    return jsonify({'answer': response_text})
+        last_car_model = context.get('last_car_model')
+        profile = request.headers.get('X-Profile') == '1' and is_admin_request()
+        with REQUEST_PROFILER.capture(user_message, {'context': last_car_model}, force=profile):
+            response_text, remembered_model, filter_criteria, currency = answer_cached(
+                user_message, last_car_model, car_data, default_currency=context.get('currency'))
+        if remembered_model:
+            context['last_car_model'] = remembered_model
+        if currency:
+            context['currency'] = currency
+        if filter_criteria:
+            context['filter'] = {'criteria': filter_criteria, 'currency': currency or 'USD',
+                                 'offset': RESULTS_PAGE_SIZE}
+    CONTEXT_STORE.put(context_id, context)
+    response = jsonify({'answer': response_text})
+    if new_context:
+        response.set_cookie(CONTEXT_COOKIE, context_id, httponly=True, samesite='Lax')
+    return response
+
+# Bulk clients send up to this many messages per /ask_batch request.
+MAX_BATCH_MESSAGES = int(os.environ.get('CARGENIE_MAX_BATCH_MESSAGES', '500'))
+
+def parse_batch_item(item):
+    """(message, currency, context) from a batch entry: a string or {message, currency?, context?}."""
+    if isinstance(item, str):
+        return item, None, None
+    if not isinstance(item, dict) or not isinstance(item.get('message'), str):
+        raise ValueError("each entry needs a 'message' string")
+    currency = item.get('currency')
+    if currency is not None:
+        currency = str(currency).upper()
+        if currency not in EXCHANGE_RATES:
+            raise ValueError(f"unknown currency '{currency}'")
+    context = item.get('context')
+    if context is not None and not isinstance(context, str):
+        raise ValueError("'context' must be a car model name")
+    return item['message'], currency, context
+
+@app.route('/ask_batch', methods=['POST'])
+def ask_batch():
+    """Answers many messages in one request, in order, with no typing delay.
+
+    Each entry may set its own currency and the car model it follows up on
+    ("context"); the model each answer would remember comes back as "context"
+    so a client can chain follow-ups. The conversation context is not read or changed.
+    """
+    car_data = CAR_DATA  # one catalog for the whole batch
+    if not car_data:
+        return jsonify({'error': 'I am sorry, my knowledge base of cars could not be loaded.'}), 503
+    payload = request.get_json(silent=True)
+    messages = payload.get('messages') if isinstance(payload, dict) else None
+    if not isinstance(messages, list):
+        return jsonify({'error': "Expected a JSON body with a 'messages' array."}), 400
+    if len(messages) > MAX_BATCH_MESSAGES:
+        return jsonify({'error': f'At most {MAX_BATCH_MESSAGES} messages per batch.'}), 413
+    items = []
+    for position, item in enumerate(messages):
+        try:
+            items.append(parse_batch_item(item))
+        except ValueError as e:
+            return jsonify({'error': f'Message {position}: {e}.'}), 400
+
+    # Repeats within the batch are answered once; the rest share the keyword matcher and response cache.
+    answers = {}
+    results = []
+    for message, currency, context in items:
+        key = (message.strip().lower(), currency, context)
+        if key not in answers:
+            answers[key] = answer_cached(message, context, car_data, currency)
+        response_text, remembered_model = answers[key][:2]
+        results.append({'answer': response_text, 'context': remembered_model or context})
+    return jsonify({'answers': results})
+
+def stream_filter_results(criteria, row_ids, offset, limit, currency, car_data):
+    """NDJSON lines: one per car, then a last line with the total and the next cursor (or null)."""
+    end = min(offset + limit, len(row_ids))
+    prices = listing_prices(car_data, currency)
+    for i in range(offset, end):
+        car = car_data[row_ids[i]]
+        yield json.dumps({
+            'company': car['Company'],
+            'model': car['Model'],
+            'type': car['Type'],
+            'price_base_usd': car['Price_Base_USD'],
+            'price': prices[row_ids[i]],
+        }) + '\n'
+    next_cursor = encode_cursor(criteria, currency, end) if end < len(row_ids) else None
+    yield json.dumps({'total': len(row_ids), 'next_cursor': next_cursor}) + '\n'
+
+@app.route('/filter_results')
+def filter_results():
+    """The next page of a filter answer, from ?cursor=... or from filter fields in the query string.
+
+    ?format=ndjson streams the page line by line, so large pages (&limit=, up to
+    MAX_RESULTS_PAGE_SIZE) start arriving at once and never sit whole in memory.
+    """
+    car_data = CAR_DATA  # read once: a reload mid-request must not mix two catalogs
+    if not car_data:
+        return jsonify({'answer': 'I am sorry, my knowledge base of cars could not be loaded.'})
+    try:
+        if 'cursor' in request.args:
+            criteria, currency, offset = decode_cursor(request.args['cursor'])
+        else:
+            criteria = clean_filter_criteria({key: request.args[key] for key in FILTER_CRITERIA if key in request.args})
+            currency = request.args.get('currency', 'USD').upper()
+            offset = 0
+            if currency not in EXCHANGE_RATES:
+                raise ValueError(f"unknown currency '{currency}'")
+        limit = int(request.args.get('limit', RESULTS_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({'error': f'Bad request: {e}.'}), 400
+    limit = max(1, min(limit, MAX_RESULTS_PAGE_SIZE))
+
+    row_ids = filter_car_ids(criteria, car_data)
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(stream_filter_results(criteria, row_ids, offset, limit, currency, car_data)),
+                        mimetype='application/x-ndjson')
+    return jsonify({'answer': filter_page_html(criteria, row_ids, offset, currency, car_data)})
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(RESPONSE_CACHE.stats())
+
+@app.route('/metrics')
+def metrics():
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+def is_admin_request():
+    admin_token = os.environ.get('CARGENIE_ADMIN_TOKEN')
+    return bool(admin_token) and request.headers.get('X-Admin-Token') == admin_token
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not is_admin_request():
+        return jsonify({'error': 'Not allowed.'}), 403
+    started = CATALOG_RELOADER.reload()
+    status = CATALOG_RELOADER.status()
+    status['cars'] = len(CAR_DATA) if CAR_DATA else 0
+    return jsonify(status), 202 if started else 409
+
+@app.route('/admin/reload_rates', methods=['POST'])
+def admin_reload_rates():
+    if not is_admin_request():
+        return jsonify({'error': 'Not allowed.'}), 403
+    reloaded = RATES.reload()
+    return jsonify(RATES.status()), 200 if reloaded else 422
+
+# --- App factory ---
+def create_app(watch_catalog=True):
+    """The app with its catalog loaded and indexed, for WSGI servers (serve.py, gunicorn --preload).
+
+    Everything the requests share is built here, so a server that calls this before it
+    forks its workers holds one copy of the catalog for all of them. gc.freeze() moves
+    those objects out of the collector's reach: otherwise the first collection in each
+    worker writes to every object's header and copies the shared pages.
+    """
+    if CAR_DATA is None:
+        car_data = load_knowledge_base(CATALOG_FILE)
+        if car_data:
+            car_data.freeze()
+            publish_knowledge_base(car_data)
+    scan_keywords('', CAR_DATA)  # builds the keyword automaton for this catalog
+    if CAR_DATA:
+        price_table(CAR_DATA)
+    if watch_catalog:
+        CATALOG_RELOADER.start()
+    gc.collect()
+    gc.freeze()
+    return app
+
+def init_worker():
+    """Per-process setup for a worker forked after create_app()."""
+    # SQLite connections must not be used on both sides of a fork.
+    if isinstance(CAR_DATA, SqliteCarStore):
+        CAR_DATA.reopen()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Single-pass keyword matching with an Aho-Corasick automaton.
+
+Every keyword the chatbot reacts to (intent words, currencies, catalog
+companies and types) is compiled into one automaton, so a message is read
+once no matter how large the vocabulary is. Each keyword carries a category,
+a value and a rank; a scan reports, per category, the value of the
+lowest-ranked keyword found, which reproduces "first match wins" checks.
+"""
+
+
+def is_word_char(char):
+    # Same notion of a word character as \w in Python's re module.
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    def __init__(self):
+        self._goto = [{}]      # state -> {char: next state}
+        self._fail = [0]
+        self._output = [[]]    # state -> [(length, category, rank, value, whole_word)]
+        self._matches = None   # _output plus the outputs reachable through failure links
+
+    def add(self, keyword, category, value=True, rank=0, whole_word=False):
+        """Registers keyword; whole_word keywords only count between word boundaries (like \\b...\\b)."""
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(keyword), category, rank, value, whole_word))
+        self._matches = None
+
+    def _build(self):
+        # Breadth-first failure links; each state also inherits the outputs of its failure state.
+        goto, fail = self._goto, self._fail
+        outputs = [list(output) for output in self._output]
+        queue = list(goto[0].values())
+        for state in queue:
+            fail[state] = 0
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+        self._matches = outputs
+
+    def scan(self, text):
+        """Returns {category: value} for every category with at least one keyword in text."""
+        if self._matches is None:
+            self._build()
+        goto, fail, outputs = self._goto, self._fail, self._matches
+        found = {}  # category -> (rank, value)
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, category, rank, value, whole_word in outputs[state]:
+                if whole_word and not self._is_whole_word(text, end - length, end):
+                    continue
+                best = found.get(category)
+                if best is None or rank < best[0]:
+                    found[category] = (rank, value)
+        return {category: value for category, (rank, value) in found.items()}
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        # \b on each side: a word character on exactly one side of the position.
+        def boundary(position):
+            before = position > 0 and is_word_char(text[position - 1])
+            after = position < len(text) and is_word_char(text[position])
+            return before != after
+        return boundary(start) and boundary(end)
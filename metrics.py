@@ -0,0 +1,239 @@
+"""
+Low-overhead counters and histograms, exposed in the Prometheus text format.
+
+Every label combination is declared up front, so a metric is a fixed run of
+float slots in one flat buffer and recording a value is a dict lookup plus a
+bisect. share(slots) moves the buffer into anonymous shared memory before a
+pre-forking server (serve.py) starts its workers: each worker then writes only
+its own slot and render() adds all slots up, so any worker can answer a scrape
+for the whole server.
+
+Stage timings are collected per request with stage(name): the timer for the
+current request (see timing()) is found through a context variable, so deep
+helpers can time themselves without threading it through every call.
+"""
+import itertools
+import mmap
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Upper bounds, in seconds, for latency histograms: 50 µs up to 10 s.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_timer = ContextVar('stage_timer', default=None)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labels, width):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.width = width
+        self._offsets = {}  # label values -> offset of the series in the registry's buffer
+        for values in itertools.product(*labels.values()):
+            self._offsets[values] = registry._allocate(width)
+
+    def offset(self, *label_values):
+        return self._offsets[label_values]
+
+    def series(self, totals):
+        """(label pairs, slice of totals) for every series."""
+        for values, offset in self._offsets.items():
+            yield list(zip(self.label_names, values)), totals[offset:offset + self.width]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labels):
+        super().__init__(registry, name, help_text, labels, 1)
+
+    def inc(self, *label_values, amount=1):
+        self.registry.record(self.updates(*label_values, amount=amount))
+
+    def updates(self, *label_values, amount=1):
+        return ((self._offsets[label_values], amount),)
+
+    def render(self, totals):
+        for pairs, (value,) in self.series(totals):
+            yield f"{self.name}{_format_labels(pairs)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Bucket counts (not cumulative; render() adds them up) followed by the sum of observations."""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(registry, name, help_text, labels, len(self.buckets) + 2)
+
+    def observe(self, value, *label_values):
+        self.registry.record(self.updates(value, *label_values))
+
+    def updates(self, value, *label_values):
+        offset = self._offsets[label_values]
+        return (offset + bisect_left(self.buckets, value), 1), (offset + len(self.buckets) + 1, value)
+
+    def render(self, totals):
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for pairs, values in self.series(totals):
+            counts = values[:-1]
+            count = sum(counts)
+            if not count:
+                continue  # series nothing was recorded in are left out to keep scrapes small
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(pairs + [('le', bound)])} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(pairs)} {values[-1]!r}"
+            yield f"{self.name}_count{_format_labels(pairs)} {_format_value(count)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._size = 0           # floats per slot
+        self._slots = 1
+        self._buffer = None      # the mmap holding every slot
+        self._values = None      # this process's slot, as a memoryview of doubles
+        self._lock = threading.Lock()
+
+    def _allocate(self, width):
+        if self._buffer is not None:
+            raise RuntimeError("Metrics must be declared before any value is recorded.")
+        offset = self._size
+        self._size += width
+        return offset
+
+    def _ensure_buffer(self):
+        if self._buffer is None:
+            self._map(1)
+
+    def _map(self, slots):
+        # An anonymous mapping is MAP_SHARED, so forked children write to the same pages.
+        buffer = mmap.mmap(-1, max(1, slots * self._size) * 8)
+        if self._buffer is not None:
+            buffer[:len(self._buffer)] = self._buffer[:min(len(self._buffer), len(buffer))]
+        self._buffer = buffer
+        self._slots = slots
+        self.use_slot(0)
+
+    def counter(self, name, help_text, labels=None):
+        metric = Counter(self, name, help_text, labels or {})
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=None, buckets=LATENCY_BUCKETS):
+        metric = Histogram(self, name, help_text, labels or {}, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    # --- Recording ---
+    def record(self, updates):
+        """Applies (index, amount) pairs from the metrics' updates() under one lock acquisition."""
+        if self._values is None:
+            self._ensure_buffer()
+        with self._lock:
+            values = self._values
+            for index, amount in updates:
+                values[index] += amount
+
+    # --- Sharing between processes ---
+    def share(self, slots):
+        """Makes room for slots processes; call it before forking. Slot 0 keeps what was recorded so far."""
+        self._map(slots)
+
+    def use_slot(self, slot):
+        """Records into the given slot from now on (call it in a freshly forked worker)."""
+        if not 0 <= slot < self._slots:
+            raise ValueError(f"slot {slot} is out of range; share() made {self._slots}")
+        start = slot * self._size * 8
+        self._values = memoryview(self._buffer)[start:start + self._size * 8].cast('d')
+        self._lock = threading.Lock()  # a lock held at fork time would never be released in the child
+
+    @property
+    def slots(self):
+        return self._slots
+
+    # --- Exposition ---
+    def totals(self):
+        self._ensure_buffer()
+        every_slot = memoryview(self._buffer)[:self._slots * self._size * 8].cast('d')
+        totals = list(every_slot[:self._size])
+        for slot in range(1, self._slots):
+            start = slot * self._size
+            for index, value in enumerate(every_slot[start:start + self._size]):
+                if value:
+                    totals[index] += value
+        return totals
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        totals = self.totals()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(totals))
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Durations of the stages of one request, recorded once the request's labels are known.
+
+    Used as a context manager (see timing()); stage() blocks run inside it add to it.
+    """
+    __slots__ = ('stages', '_token')
+
+    def __init__(self):
+        self.stages = []  # (stage, seconds)
+
+    def __enter__(self):
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_timer.reset(self._token)
+
+
+class _Stage:
+    __slots__ = ('name', 'timer', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timer = _current_timer.get()
+        if self.timer is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.stages.append((self.name, time.perf_counter() - self.started))
+
+
+def timing():
+    """Collects the stage() timings made inside the with-block into a new StageTimer."""
+    return StageTimer()
+
+
+def stage(name):
+    """Times the with-block as one stage of the current request; nearly free when none is being timed."""
+    return _Stage(name)
@@ -0,0 +1,233 @@
+"""
+Fuzzy model-name matching backed by a trigram inverted index.
+
+process.extractOne compares the message against every model name. Here the
+names are indexed once by their padded word trigrams; a message only scores
+the names that cover the most of their trigrams, using the same scorer and
+processor as extractOne, so acceptance still means "best score > 78".
+Two cases trigrams cannot see are handled apart: very short names (which
+WRatio can match inside any longer word) are always scored, and a short message
+("ok", "x5", a lone digit) also scores the first names that contain it or one of
+its words, found through the grams that contain it rather than by scoring every
+name.
+"""
+import heapq
+from array import array
+from collections import Counter
+from itertools import islice
+
+from fuzzywuzzy import process, utils
+
+# A model must score strictly above this to be accepted (unchanged from the old check).
+MATCH_THRESHOLD = 78
+
+# How many of the best-covered names are handed to the real scorer.
+CANDIDATE_LIMIT = 16
+
+# The first pass keeps limit * POOL_FACTOR names, re-ranked against the full message.
+POOL_FACTOR = 8
+
+# Roughly how many posting entries the first pass may count per message.
+POSTINGS_BUDGET = 20_000
+
+# Up to this many characters (after processing) a message only clears MATCH_THRESHOLD against
+# a longer name by containing it exactly, sharing a word with it or (see below) ending in most
+# of it, and WRatio then gives every such name the same score, so only the first needs scoring.
+SHORT_QUERY_CHARS = 7
+
+# From this many characters, a name ending in the message less one character scores
+# 8/9 * 90 = 80 (see ModelMatcher._containing).
+TAIL_QUERY_CHARS = 5
+
+# WRatio compares the whole strings up to this length ratio and scales partial matches by 0.6
+# (too low to match) past LONG_NAME_RATIO.
+PARTIAL_RATIO = 1.5
+LONG_NAME_RATIO = 8
+
+# Names with at most this many trigrams (a word of up to three letters) are always scored.
+SHORT_NAME_TRIGRAMS = 5
+
+
+def trigrams(text):
+    """Padded word trigrams of the processed text (two spaces before each word, one after)."""
+    grams = set()
+    for word in utils.full_process(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def substring_grams(text):
+    """The trigrams every name containing text (processed, so single spaces) must have.
+
+    Words inside text are whole words of the name; the first may be the end of a longer
+    word and the last the start of one, so their outer padding is left out.
+    """
+    words = text.split(' ')
+    grams = set()
+    for i, word in enumerate(words):
+        padded = ('  ' if i else '') + word + (' ' if i < len(words) - 1 else '')
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def short_name_ids(sizes):
+    """Ids of the names short enough that WRatio can match them inside an unrelated word."""
+    return [name_id for name_id, size in enumerate(sizes) if size <= SHORT_NAME_TRIGRAMS]
+
+
+class ModelMatcher:
+    def __init__(self, names=()):
+        self._names = []            # name id -> name, None once removed
+        self._ids = {}              # name -> name id
+        self._sizes = array('I')    # name id -> number of trigrams in the name
+        self._postings = {}         # trigram -> array of name ids
+        self._short_ids = []        # ids of names with at most SHORT_NAME_TRIGRAMS trigrams
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, name):
+        if name in self._ids:
+            return
+        name_id = len(self._names)
+        self._ids[name] = name_id
+        self._names.append(name)
+        grams = trigrams(name)
+        self._sizes.append(len(grams))
+        if len(grams) <= SHORT_NAME_TRIGRAMS:
+            self._short_ids.append(name_id)
+        postings = self._postings
+        for gram in grams:
+            name_ids = postings.get(gram)
+            if name_ids is None:
+                name_ids = postings[gram] = array('I')
+            name_ids.append(name_id)
+
+    def remove(self, name):
+        # Postings are left in place; a removed id is skipped when candidates are collected.
+        name_id = self._ids.pop(name, None)
+        if name_id is not None:
+            self._names[name_id] = None
+
+    def candidates(self, text, limit=CANDIDATE_LIMIT):
+        """Names sharing trigrams with text, best covered first cut to limit, returned in index order."""
+        grams = trigrams(text)
+        posting_sizes = self._posting_sizes(grams)
+        # Count hits from the rarest trigrams first and stop once the budget is spent,
+        # so very common trigrams (digits, short words) cannot make a message O(n).
+        counts = Counter()
+        budget = POSTINGS_BUDGET
+        for gram in sorted(posting_sizes, key=posting_sizes.__getitem__):
+            if counts and posting_sizes[gram] > budget:
+                break
+            counts.update(self._posting(gram))
+            budget -= posting_sizes[gram]
+        sizes = self._sizes
+        names = self._names
+        # Keep the names with the largest share of their trigrams hit, then re-rank them against
+        # the whole message; earlier names win ties because extractOne keeps the first of equal scores.
+        pool = heapq.nlargest(limit * POOL_FACTOR, [(count / sizes[name_id], -name_id) for name_id, count in counts.items()])
+        scored = []
+        for _, negative_id in pool:
+            name_id = -negative_id
+            name = names[name_id]
+            if name is not None:
+                scored.append((len(trigrams(name) & grams) / sizes[name_id], -name_id))
+        best = {-negative_id for _, negative_id in heapq.nlargest(limit, scored)}
+        best.update(self._containing(utils.full_process(text, force_ascii=True)))
+        best.update(name_id for name_id in self._short_ids if names[name_id] is not None)
+        return [names[name_id] for name_id in sorted(best)]
+
+    def _containing(self, query):
+        """Ids of the names a short query can match without sharing enough trigrams.
+
+        Against a name PARTIAL_RATIO to LONG_NAME_RATIO times its length, a query of up to
+        SHORT_QUERY_CHARS clears the threshold only if the name contains it (its words in
+        either order, 90), shares one of its words (86) or, from TAIL_QUERY_CHARS on, ends
+        with it less one character (partial_ratio's window is cut short at the end of the
+        name). Each case gives every such name the same score and extractOne keeps the first
+        of equal scores, so each scan stops at its first name. Names of about the query's
+        length are compared whole, so those containing it are all kept.
+        """
+        if not query or len(query) > SHORT_QUERY_CHARS:
+            return set()
+        words = query.split()
+        ordered = ' '.join(sorted(words))
+        shortest, longest = PARTIAL_RATIO * len(query), LONG_NAME_RATIO * len(query)
+        found = set()
+        for name_id, name in self._scan(self._ids_containing(query, ordered), longest):
+            if query in name or ordered in ' '.join(sorted(name.split())):
+                found.add(name_id)
+                if len(name) >= shortest:
+                    break
+        if len(words) > 1:
+            for word in set(words):
+                for name_id, name in self._scan(self._ids_with_word(word), longest):
+                    if len(name) >= shortest and word in name.split():
+                        found.add(name_id)
+                        break
+        if len(query) >= TAIL_QUERY_CHARS:
+            for tail in {query[:i] + query[i + 1:] for i in range(len(query))}:
+                if tail.strip() and '  ' not in tail:
+                    for name_id, name in self._scan(self._ids_containing(tail), longest):
+                        if len(name) >= shortest and name.endswith(tail):
+                            found.add(name_id)
+                            break
+        return found
+
+    def _scan(self, name_ids, longest):
+        """(name id, processed name) for the live names of at most longest characters, at most POSTINGS_BUDGET ids."""
+        names = self._names
+        sizes = self._sizes
+        previous = None
+        for name_id in islice(name_ids, POSTINGS_BUDGET):
+            # A name has at most one trigram more than characters.
+            if name_id == previous or sizes[name_id] > longest + 1:
+                continue
+            previous = name_id
+            name = names[name_id]
+            if name is not None:
+                name = utils.full_process(name, force_ascii=True)
+                if len(name) <= longest:
+                    yield name_id, name
+
+    def _ids_containing(self, *texts):
+        """Ids, ascending and possibly repeated, of a superset of the names containing any of texts."""
+        grams = set.intersection(*map(substring_grams, texts))
+        if grams:
+            return self._rarest_posting(grams)
+        # A word of one or two letters: only the grams around it can say which names contain it.
+        key = max(texts[0].split(), key=len)
+        return heapq.merge(*(self._posting(gram) for gram in self._grams_containing(key)))
+
+    def _ids_with_word(self, word):
+        """Ids, ascending, of a superset of the names having word as a whole word."""
+        return self._rarest_posting(trigrams(word))
+
+    def _rarest_posting(self, grams):
+        posting_sizes = self._posting_sizes(grams)
+        if len(posting_sizes) < len(grams):
+            return ()  # no name has every gram
+        return self._posting(min(posting_sizes, key=posting_sizes.__getitem__))
+
+    # Where the postings live; a subclass can keep them somewhere other than in memory.
+    def _posting_sizes(self, grams):
+        """{gram: number of names containing it} for the grams that occur in any name."""
+        postings = self._postings
+        return {gram: len(postings[gram]) for gram in grams if gram in postings}
+
+    def _posting(self, gram):
+        return self._postings[gram]
+
+    def _grams_containing(self, text):
+        return [gram for gram in self._postings if text in gram]
+
+    def extract_one(self, text):
+        """The best (name, score) pair like process.extractOne, or None when nothing is close."""
+        choices = self.candidates(text)
+        if not choices:
+            return None
+        return process.extractOne(text, choices)
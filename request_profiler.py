@@ -0,0 +1,128 @@
+"""
+Sampled profiling and slow-request capture for /ask.
+
+A fraction of requests (sample_rate), plus any request an admin asks for, runs
+under cProfile. A request slower than slow_ms is written to the capture
+directory: a .json file with its message and timing and, when it was profiled,
+a .prof file (open it with pstats or snakeviz) and a .txt summary of the top
+functions. Only the newest `keep` captures are kept.
+
+With sampling off, a request costs two perf_counter() calls and a comparison.
+cProfile can only watch one request at a time per process, so a request that
+would be sampled while another is being profiled just runs normally.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+
+# Lines of the per-function summary written next to each profile.
+SUMMARY_LINES = 40
+
+
+class _Capture:
+    __slots__ = ('owner', 'message', 'details', 'profile', 'started')
+
+    def __init__(self, owner, message, details, profile):
+        self.owner = owner
+        self.message = message
+        self.details = details
+        self.profile = profile
+
+    def __enter__(self):
+        if self.profile is not None:
+            self.profile.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        if self.profile is not None:
+            self.profile.disable()
+            self.owner._busy.release()
+        if seconds * 1000 >= self.owner.slow_ms:
+            self.owner.save(self.message, self.details, seconds, self.profile)
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, slow_ms=500.0, keep=100):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self.profiled = 0
+        self.captured = 0
+        self._busy = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def capture(self, message, details=None, force=False):
+        """A with-block that times (and maybe profiles) one request for message.
+
+        details is a dict saved with a slow request; force profiles this request
+        whatever the sample rate.
+        """
+        profile = None
+        if (force or (self.sample_rate and random.random() < self.sample_rate)) and self._busy.acquire(blocking=False):
+            profile = cProfile.Profile()
+            self.profiled += 1
+        return _Capture(self, message, details, profile)
+
+    def save(self, message, details, seconds, profile):
+        """Writes one slow request to the capture directory and drops the oldest captures."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._save_lock:
+                self.captured += 1
+                stem = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{seconds * 1000:.0f}ms-"
+                                                    f"{os.getpid()}-{self.captured}")
+            record = {
+                'message': message,
+                'milliseconds': round(seconds * 1000, 3),
+                'profiled': profile is not None,
+                'pid': os.getpid(),
+                'time': time.time(),
+                **(details or {}),
+            }
+            with open(stem + '.json', 'w', encoding='utf-8') as file:
+                json.dump(record, file, indent=2)
+            if profile is not None:
+                profile.dump_stats(stem + '.prof')
+                summary = io.StringIO()
+                pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+                with open(stem + '.txt', 'w', encoding='utf-8') as file:
+                    file.write(f"{message!r} took {seconds * 1000:.1f} ms\n")
+                    file.write(summary.getvalue())
+            self.rotate()
+        except Exception as e:
+            print(f"Error saving slow request capture: {e}")
+
+    def rotate(self):
+        """Deletes all but the newest `keep` captures (a capture is the files sharing a name stem)."""
+        with self._save_lock:
+            captures = {}
+            for entry in os.scandir(self.directory):
+                stem, extension = os.path.splitext(entry.name)
+                if extension in ('.json', '.prof', '.txt'):
+                    captures.setdefault(stem, []).append(entry)
+            if len(captures) <= self.keep:
+                return
+            by_age = sorted(captures.values(), key=lambda entries: min(entry.stat().st_mtime for entry in entries))
+            for entries in by_age[:len(captures) - self.keep]:
+                for entry in entries:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass  # another worker rotated it first
+
+    def status(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'directory': self.directory,
+            'profiled': self.profiled,
+            'captured': self.captured,
+        }
@@ -0,0 +1,131 @@
+"""
+Bounded LRU/TTL cache for /ask answers, with request coalescing.
+
+Answers are cached per catalog: the first lookup against a new catalog object
+(for example after the knowledge base is reloaded) empties the cache. Requests
+still running against a catalog that has been replaced are answered without
+the cache, so they cannot empty it again. Every clear starts a new generation,
+and an answer is only stored if no clear happened while it was being computed.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+class _Pending:
+    """A computation in progress that identical requests wait on instead of repeating."""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._pending = {}             # key -> _Pending
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._retired = weakref.WeakSet()  # catalogs that have been replaced
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, catalog, key, context, compute):
+        """Returns the cached value for key, computing it at most once across threads.
+
+        compute() returns (value, uses_context). Values that did not use the context
+        are stored under key alone and shared by every context; the others are stored
+        under (key, context).
+        """
+        shared_key, context_key = (key,), (key, context)
+        with self._lock:
+            if catalog is not self._catalog and catalog not in self._retired:
+                if self._catalog is not None:
+                    self._retired.add(self._catalog)
+                self._clear()
+                self._catalog = catalog
+            stale = catalog is not self._catalog
+            if not stale:
+                value = self._lookup(shared_key)
+                if value is None:
+                    value = self._lookup(context_key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+            pending = None if stale else self._pending.get(context_key)
+            owner = pending is None
+            generation = self._generation
+            if owner:
+                pending = _Pending()
+                if not stale:
+                    self._pending[context_key] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            value, uses_context = compute()
+            pending.value = value
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._pending.get(context_key) is pending:
+                    del self._pending[context_key]
+                if pending.error is None and not stale and generation == self._generation and self.max_entries > 0:
+                    self._store(context_key if uses_context else shared_key, value)
+            pending.done.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
+
+    # --- Internal helpers (caller holds the lock) ---
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _clear(self):
+        # Computations already running finish for their own callers but are no longer joined or stored.
+        self._entries.clear()
+        self._pending = {}
+        self._generation += 1
@@ -0,0 +1,229 @@
+"""
+Production server: pre-forked workers sharing one read-only catalog.
+
+The master process loads and indexes the catalog once (flask_app.create_app),
+freezes the garbage collector and only then forks the workers, so all of them
+read the same copy-on-write pages instead of parsing and holding a catalog each.
+A catalog compiled with compile_catalog.py is better still: its columns are
+mapped from the snapshot file and shared through the page cache, which reference
+counting never writes to. With CARGENIE_STORAGE=sqlite the workers share the
+database file the same way.
+
+Catalog reloads happen in the master, for everyone: on SIGHUP, on POST
+/admin/reload in any worker, or when CARGENIE_RELOAD_INTERVAL is set and
+cars.csv changes. The master loads the new catalog, forks a fresh set of workers
+from it and lets the old ones finish their requests and exit. SIGTERM or Ctrl-C
+stops the server the same way. /metrics on any worker reports the totals of all
+of them (see metrics.py). With more than one worker, conversation context is
+kept in CARGENIE_CONTEXT_DB, a SQLite file they all share, since a follow-up
+message may reach any worker.
+
+    python serve.py --workers 16 --bind 0.0.0.0:8000
+
+gunicorn can serve the same factory; with --preload it also runs in the master:
+
+    gunicorn --preload -w 16 'flask_app:create_app(watch_catalog=False)'
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import flask_app
+from context_store import MemoryContextStore, SqliteContextStore
+
+BIND = os.environ.get('CARGENIE_BIND', '127.0.0.1:8000')
+WORKERS = int(os.environ.get('CARGENIE_WORKERS', '0')) or os.cpu_count() or 1
+BACKLOG = 1024
+
+# How often the master checks on its workers, in seconds.
+TICK = 0.5
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = False  # server_close() waits for the requests in flight
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ForwardedReloader:
+    """Stands in for the catalog reloader inside a worker: asks the master to reload for every worker."""
+
+    def __init__(self, reloader):
+        self._reloader = reloader
+
+    def reload(self, wait=False):
+        os.kill(os.getppid(), signal.SIGHUP)
+        return True
+
+    def status(self):
+        # The master's status when this worker was forked, which was after its catalog's reload.
+        return self._reloader.status()
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def open_listener(bind):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(parse_bind(bind))
+    listener.listen(BACKLOG)
+    return listener
+
+
+def run_worker(listener, app, access_log, metrics_slot):
+    """Serves requests on the shared listening socket until SIGTERM. Never returns."""
+    # Until the server exists a worker has nothing to finish, so SIGTERM may just end it.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the master, which stops the workers
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    flask_app.init_worker()
+    flask_app.METRICS.use_slot(metrics_slot)
+    flask_app.CATALOG_RELOADER = ForwardedReloader(flask_app.CATALOG_RELOADER)
+    handler = WSGIRequestHandler if access_log else QuietRequestHandler
+    host, port = listener.getsockname()[:2]
+    server = ThreadingWSGIServer((host, port), handler, bind_and_activate=False)
+    # What server_bind() would have set up, for a socket that is already bound.
+    server.socket = listener
+    server.server_name = socket.getfqdn(host)
+    server.server_port = port
+    server.setup_environ()
+    server.set_app(app)
+    # shutdown() blocks until serve_forever() returns, so it cannot run in the signal handler itself.
+    stop = lambda signum, frame: threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGTERM, stop)
+    status = 0
+    try:
+        server.serve_forever()
+        server.server_close()
+    except Exception as e:
+        print(f"Worker {os.getpid()} failed: {e}")
+        status = 1
+    sys.stdout.flush()
+    os._exit(status)
+
+
+class Master:
+    def __init__(self, listener, app, workers, access_log=False):
+        self.listener = listener
+        self.app = app
+        self.workers = workers
+        self.access_log = access_log
+        self.generation = 0          # bumped whenever a new catalog is published
+        self.children = {}           # pid -> generation it was forked for
+        self.metrics_slots = {}      # pid -> the worker's slot in the shared metrics
+        # Slot 0 is the master's. A reload briefly runs two sets of workers, so each gets room.
+        flask_app.METRICS.share(2 * workers + 1)
+        self.stopping = False
+        self.reload_requested = False
+        reloader = flask_app.CATALOG_RELOADER
+        publish = reloader.publish
+        def publish_and_restart(car_data):
+            gc.unfreeze()  # lets the collector free the old catalog
+            publish(car_data)
+            flask_app.create_app(watch_catalog=False)  # warms and freezes the new one
+            self.generation += 1
+        reloader.publish = publish_and_restart
+        self.reloader = reloader
+
+    def spawn(self):
+        """Forks a worker; False if every metrics slot is still taken by a worker that has not exited."""
+        free = set(range(1, flask_app.METRICS.slots)) - set(self.metrics_slots.values())
+        if not free:
+            return False
+        # A reused slot keeps its counts, so the server's totals never go down.
+        slot = min(free)
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.listener, self.app, self.access_log, slot)
+        self.children[pid] = self.generation
+        self.metrics_slots[pid] = slot
+        return True
+
+    def terminate(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            self.metrics_slots.pop(pid, None)
+            if generation == self.generation and not self.stopping:
+                print(f"Worker {pid} exited unexpectedly (status {status}); starting a new one.")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.request_reload)
+        self.reloader.start()
+        host, port = self.listener.getsockname()[:2]
+        print(f"Serving on http://{host}:{port} with {self.workers} workers (master {os.getpid()}).")
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reloader.reload(wait=True)
+            current = [pid for pid, generation in self.children.items() if generation == self.generation]
+            for _ in range(self.workers - len(current)):
+                if not self.spawn():
+                    break
+            # Workers forked for an older catalog finish their requests and exit.
+            self.terminate([pid for pid, generation in self.children.items() if generation != self.generation])
+            time.sleep(TICK)
+            self.reap()
+        self.terminate(list(self.children))
+        while self.children:
+            pid, _ = os.wait()
+            self.children.pop(pid, None)
+            self.metrics_slots.pop(pid, None)
+        self.listener.close()
+        print("Server stopped.")
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def request_reload(self, signum, frame):
+        self.reload_requested = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bind', default=BIND, help="host:port to listen on (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes (default: %(default)s)")
+    parser.add_argument('--access-log', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit("serve.py needs os.fork(); on this platform run a WSGI server with flask_app:create_app().")
+    app = flask_app.create_app(watch_catalog=False)
+    if flask_app.CAR_DATA is None:
+        sys.exit("The catalog could not be loaded; not starting the server.")
+    if args.workers > 1 and isinstance(flask_app.CONTEXT_STORE, MemoryContextStore):
+        # A per-worker store would lose the conversation whenever a follow-up reaches another worker.
+        flask_app.CONTEXT_STORE = SqliteContextStore(flask_app.CONTEXT_DB, ttl_seconds=flask_app.CONTEXT_TTL)
+        print(f"Conversation context is shared by the workers through '{flask_app.CONTEXT_DB}'.")
+    Master(open_listener(args.bind), app, max(1, args.workers), args.access_log).run()
+
+
+if __name__ == '__main__':
+    main()
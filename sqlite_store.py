@@ -0,0 +1,422 @@
+"""
+SQLite-backed car catalog, for catalogs larger than RAM.
+
+SqliteCarStore answers the same calls as CarStore (row access, find, lookup,
+keys, select, top, column, numbers and the model matcher), so flask_app
+works with either. Rows, model-name trigram postings and covering indexes for
+the hot queries (numeric ranges by type and company, cheapest and most efficient
+car) live in a local database file. A worker only keeps the distinct companies
+and types and the trigram count of each model name in memory.
+
+Queries go through a fixed pool of read-only connections opened up front, and
+every query is a constant SQL string, so sqlite3's per-connection statement
+cache prepares each one once. Opening the pool up front also pins the file: a
+rebuilt database replaces it under a new inode, and a store that is still
+serving requests keeps reading the old one.
+"""
+import csv
+import json
+import os
+import queue
+import sqlite3
+import time
+from array import array
+from collections.abc import Mapping
+from contextlib import contextmanager
+from itertools import islice
+
+from car_store import CHUNK_ROWS, INDEXED_COLUMNS, NUMERIC_COLUMNS, NAN, RANKINGS, SORTED_COLUMNS, parse_number, resident_memory_mb
+from catalog_snapshot import source_matches, source_stamp
+from filter_engine import COMPARISONS
+from model_matcher import ModelMatcher, short_name_ids, trigrams
+
+FORMAT_VERSION = 2
+POOL_SIZE = 4
+IN_CHUNK = 500  # row ids per query when reading many rows
+
+
+def default_database_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.sqlite'
+
+
+# --- Building ---
+def _create_schema(connection, columns):
+    text = [f'c{i} TEXT' for i in range(len(columns))]
+    keys = [f'k_{name} TEXT' for name in INDEXED_COLUMNS if name in columns]
+    numbers = [f'n_{name} REAL' for name in NUMERIC_COLUMNS if name in columns]
+    connection.executescript(f"""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+        CREATE TABLE cars (row_id INTEGER PRIMARY KEY, {', '.join(text + keys + numbers)});
+        CREATE TABLE models (name_id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE model_grams (gram TEXT, name_id INTEGER, PRIMARY KEY (gram, name_id)) WITHOUT ROWID;
+        CREATE TABLE gram_sizes (gram TEXT PRIMARY KEY, postings INTEGER) WITHOUT ROWID;
+    """)
+
+
+def _create_indexes(connection, columns):
+    """Indexes for every query SqliteCarStore makes; each one covers its query."""
+    sorted_names = [name for name in SORTED_COLUMNS if name in columns]
+    statements = []
+    for name in INDEXED_COLUMNS:
+        if name in columns:
+            covered = ''.join(f', n_{sorted_name}' for sorted_name in sorted_names)
+            statements.append(f'CREATE INDEX ix_k_{name} ON cars (k_{name}{covered})')
+    for name in sorted_names:
+        statements.append(f'CREATE INDEX ix_n_{name} ON cars (n_{name})')
+    for sort_by, (name, direction) in RANKINGS.items():
+        if name in columns:
+            order = 'ASC' if direction > 0 else 'DESC'
+            statements.append(f'CREATE INDEX ix_top_{sort_by} ON cars (n_{name} {order}, row_id)')
+            if 'Type' in columns:
+                statements.append(f'CREATE INDEX ix_top_{sort_by}_type ON cars (k_Type, n_{name} {order}, row_id)')
+    for statement in statements:
+        connection.execute(statement)
+
+
+def build_database(csv_path, db_path, chunk_rows=CHUNK_ROWS, progress=None):
+    """Loads a CSV into a new database at db_path, replacing any old one once it is complete."""
+    started = time.perf_counter()
+    temporary_path = f'{db_path}.tmp'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('PRAGMA cache_size = -262144')  # 256 MB for the index sorts; only while building
+        with open(csv_path, mode='r', encoding='utf-8', newline='') as file:
+            reader = csv.reader(file)
+            columns = [name.strip() for name in next(reader, [])]
+            _create_schema(connection, columns)
+            width = len(columns)
+            key_positions = [(columns.index(name), normalise) for name, normalise in INDEXED_COLUMNS.items()
+                             if name in columns]
+            number_positions = [columns.index(name) for name in NUMERIC_COLUMNS if name in columns]
+            placeholders = ', '.join('?' * (width + len(key_positions) + len(number_positions)))
+            insert = f'INSERT INTO cars VALUES (?, {placeholders})'
+            rows = 0
+            while True:
+                chunk = list(islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                records = []
+                for row in chunk:
+                    if not row:
+                        continue  # a blank line
+                    values = [value.strip() for value in (row + [''] * width)[:width]]
+                    numbers = [parse_number(values[i]) for i in number_positions]
+                    records.append([rows + len(records)] + values + [normalise(values[i]) for i, normalise in key_positions]
+                                   + [None if number != number else number for number in numbers])
+                connection.executemany(insert, records)
+                rows += len(records)
+                if progress:
+                    progress(rows, rows / max(time.perf_counter() - started, 1e-9))
+
+        _create_indexes(connection, columns)
+        if 'Model' in columns:
+            _build_model_postings(connection, chunk_rows)
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'columns': json.dumps(columns),
+            'rows': rows,
+            'source': json.dumps(source_stamp(csv_path)),
+        }
+        for name in ('Company', 'Type'):
+            if name in columns:
+                keys = connection.execute(f'SELECT k_{name} FROM cars GROUP BY k_{name} ORDER BY MIN(row_id)')
+                meta[f'keys_{name}'] = json.dumps([key for key, in keys])
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporary_path, db_path)
+    return rows
+
+
+def _build_model_postings(connection, chunk_rows):
+    # Model names get ids in first-seen order, as in ModelMatcher, so ties break the same way.
+    connection.execute('INSERT INTO models (name_id, name) '
+                       'SELECT ROW_NUMBER() OVER (ORDER BY MIN(row_id)) - 1, k_Model FROM cars GROUP BY k_Model')
+    connection.execute('CREATE TEMP TABLE grams_unsorted (gram TEXT, name_id INTEGER)')
+    sizes = array('I')
+    names = connection.execute('SELECT name_id, name FROM models ORDER BY name_id')
+    while True:
+        chunk = names.fetchmany(chunk_rows)
+        if not chunk:
+            break
+        pairs = []
+        for name_id, name in chunk:
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            pairs.extend((gram, name_id) for gram in grams)
+        connection.executemany('INSERT INTO grams_unsorted VALUES (?, ?)', pairs)
+    connection.execute('INSERT INTO model_grams SELECT gram, name_id FROM grams_unsorted ORDER BY gram, name_id')
+    connection.execute('DROP TABLE grams_unsorted')
+    connection.execute('INSERT INTO gram_sizes SELECT gram, COUNT(*) FROM model_grams GROUP BY gram')
+    connection.execute('INSERT INTO meta VALUES (?, ?)', ('model_sizes', sizes.tobytes()))
+
+
+# --- Reading ---
+class SqliteCarRow(Mapping):
+    """One row, read in a single query; behaves like CarRow."""
+    __slots__ = ('_store', '_values', '_numbers', 'row_id')
+
+    def __init__(self, store, row_id, values, numbers):
+        self._store = store
+        self._values = values
+        self._numbers = numbers
+        self.row_id = row_id
+
+    def __getitem__(self, key):
+        return self._values[self._store.column_positions[key]]
+
+    def __iter__(self):
+        return iter(self._store.columns)
+
+    def __len__(self):
+        return len(self._store.columns)
+
+    def number(self, key):
+        value = self._numbers[key]
+        return NAN if value is None else value
+
+    def __repr__(self):
+        return f"SqliteCarRow({self.row_id}, {dict(self)!r})"
+
+
+class _CellReader:
+    """column(name) / numbers(name): indexable by row id, one query per cell."""
+    __slots__ = ('_store', '_sql', '_is_number')
+
+    def __init__(self, store, sql, is_number):
+        self._store = store
+        self._sql = sql
+        self._is_number = is_number
+
+    def __getitem__(self, row_id):
+        rows = self._store._query(self._sql, (row_id,))
+        if not rows:
+            raise IndexError(row_id)
+        value = rows[0][0]
+        return (NAN if value is None else value) if self._is_number else value
+
+    def __len__(self):
+        return len(self._store)
+
+
+class _ModelNames:
+    __slots__ = ('_store',)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, name_id):
+        return self._store._query('SELECT name FROM models WHERE name_id = ?', (name_id,))[0][0]
+
+
+class SqliteModelMatcher(ModelMatcher):
+    """ModelMatcher reading names and trigram postings from the database; only the name sizes stay in memory."""
+    def __init__(self, store, sizes):
+        super().__init__()
+        self._store = store
+        self._names = _ModelNames(store)
+        self._sizes = sizes
+        self._short_ids = short_name_ids(sizes)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def add(self, name):
+        raise RuntimeError("The SQLite catalog is read-only.")
+
+    def remove(self, name):
+        raise RuntimeError("The SQLite catalog is read-only.")
+
+    def _posting_sizes(self, grams):
+        sizes = {}
+        for gram in grams:
+            rows = self._store._query('SELECT postings FROM gram_sizes WHERE gram = ?', (gram,))
+            if rows:
+                sizes[gram] = rows[0][0]
+        return sizes
+
+    def _posting(self, gram):
+        return [name_id for name_id, in self._store._query('SELECT name_id FROM model_grams WHERE gram = ?', (gram,))]
+
+    def _grams_containing(self, text):
+        return [gram for gram, in self._store._query('SELECT gram FROM gram_sizes WHERE instr(gram, ?) > 0', (text,))]
+
+
+class SqliteCarStore:
+    def __init__(self, path, pool_size=POOL_SIZE):
+        started = time.perf_counter()
+        self.path = path
+        self._pool_size = pool_size
+        self._pool = self._open_pool()
+        meta = dict(self._query('SELECT key, value FROM meta'))
+        if meta.get('format_version') != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"'{path}' is not a catalog database this version can read.")
+        self.source = json.loads(meta['source'])
+        self.columns = json.loads(meta['columns'])
+        self.column_positions = {name: i for i, name in enumerate(self.columns)}
+        self._keys = {name: json.loads(meta[f'keys_{name}']) for name in ('Company', 'Type') if f'keys_{name}' in meta}
+        self._size = meta['rows']
+        self._numeric = [name for name in NUMERIC_COLUMNS if name in self.columns]
+        self._row_sql = (f"SELECT {', '.join(f'c{i}' for i in range(len(self.columns)))}"
+                         f"{''.join(f', n_{name}' for name in self._numeric)} FROM cars WHERE row_id = ?")
+        self._values_sql = {name: f"SELECT row_id, c{i} FROM cars WHERE row_id IN ({', '.join('?' * IN_CHUNK)})"
+                            for i, name in enumerate(self.columns)}
+        self.model_matcher = None
+        if 'model_sizes' in meta:
+            sizes = array('I')
+            sizes.frombytes(meta['model_sizes'])
+            self.model_matcher = SqliteModelMatcher(self, sizes)
+        self.key_generation = 0  # read-only: the keys never change
+        seconds = time.perf_counter() - started
+        self.load_stats = {'rows': self._size, 'seconds': seconds,
+                           'rows_per_second': self._size / max(seconds, 1e-9), 'memory_mb': resident_memory_mb()}
+
+    @classmethod
+    def open_or_build(cls, csv_path, db_path=None, chunk_rows=CHUNK_ROWS, progress=None):
+        """Opens the database for csv_path, (re)building it first if it is missing or out of date."""
+        db_path = db_path or default_database_path(csv_path)
+        if os.path.exists(db_path):
+            try:
+                store = cls(db_path)
+            except (sqlite3.Error, ValueError, KeyError) as e:
+                print(f"Rebuilding '{db_path}' ({e}).")
+            else:
+                if source_matches(store.source, csv_path):
+                    return store
+                store.close()
+                print(f"'{csv_path}' has changed; rebuilding '{db_path}'.")
+        build_database(csv_path, db_path, chunk_rows, progress)
+        return cls(db_path)
+
+    def _open_pool(self):
+        pool = queue.Queue()
+        for _ in range(self._pool_size):
+            pool.put(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False,
+                                     cached_statements=256))
+        return pool
+
+    def reopen(self):
+        """Replaces the connections with new ones, in a process forked from the one that opened them."""
+        self._pool = self._open_pool()
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+    @contextmanager
+    def _connection(self):
+        connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def _query(self, sql, params=()):
+        with self._connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def freeze(self):
+        """Already read-only; here so the store can be published like a CarStore."""
+
+    # --- Rows and columns ---
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row_id in range(self._size):
+            yield self[row_id]
+
+    def __getitem__(self, row_id):
+        rows = self._query(self._row_sql, (row_id,))
+        if not rows:
+            raise IndexError(row_id)
+        record = rows[0]
+        width = len(self.columns)
+        return SqliteCarRow(self, row_id, record[:width], dict(zip(self._numeric, record[width:])))
+
+    def column(self, name):
+        if name not in self.column_positions:
+            raise KeyError(name)
+        return _CellReader(self, f'SELECT c{self.column_positions[name]} FROM cars WHERE row_id = ?', False)
+
+    def values(self, name, row_ids):
+        """The text of one column for many rows, read IN_CHUNK rows per query."""
+        if name not in self.column_positions:
+            raise KeyError(name)
+        row_ids = list(row_ids)
+        found = {}
+        for start in range(0, len(row_ids), IN_CHUNK):
+            chunk = row_ids[start:start + IN_CHUNK]
+            # Short chunks are padded so every query has the same text and reuses one prepared statement.
+            chunk += [-1] * (IN_CHUNK - len(chunk))
+            found.update(self._query(self._values_sql[name], chunk))
+        return [found[row_id] for row_id in row_ids]
+
+    def numbers(self, name):
+        if name not in self._numeric:
+            raise KeyError(name)
+        return _CellReader(self, f'SELECT n_{name} FROM cars WHERE row_id = ?', True)
+
+    # --- Hash-index style lookups ---
+    def _check_indexed(self, name):
+        if name not in INDEXED_COLUMNS or name not in self.column_positions:
+            raise KeyError(name)
+
+    def lookup(self, name, key):
+        self._check_indexed(name)
+        return [row_id for row_id, in self._query(f'SELECT row_id FROM cars WHERE k_{name} = ? ORDER BY row_id', (key,))]
+
+    def keys(self, name):
+        self._check_indexed(name)
+        if name in self._keys:
+            return self._keys[name]
+        if name == 'Model':
+            return [name for name, in self._query('SELECT name FROM models ORDER BY name_id')]
+        return [key for key, in self._query(f'SELECT k_{name} FROM cars GROUP BY k_{name} ORDER BY MIN(row_id)')]
+
+    def find(self, name, key):
+        self._check_indexed(name)
+        rows = self._query(f'SELECT row_id FROM cars WHERE k_{name} = ? ORDER BY row_id LIMIT 1', (key,))
+        return self[rows[0][0]] if rows else None
+
+    # --- Range queries and rankings ---
+    def select(self, equals=None, conditions=()):
+        """Row ids, in catalog order, matching every equality key and numeric comparison (like CarStore.select)."""
+        where, params = [], []
+        for name, key in (equals or {}).items():
+            self._check_indexed(name)
+            where.append(f'k_{name} = ?')
+            params.append(key)
+        for name, op, value in conditions:
+            if name not in self._numeric:
+                raise KeyError(name)
+            if op not in COMPARISONS:
+                raise ValueError(f"unknown comparison '{op}'")
+            # A NULL (not a number in the CSV) never compares true, as in CarStore.
+            where.append(f'n_{name} {op} ?')
+            params.append(float(value))
+        if not where:
+            return range(self._size)
+        return [row_id for row_id, in self._query(f"SELECT row_id FROM cars WHERE {' AND '.join(where)} ORDER BY row_id",
+                                                  params)]
+
+    def top(self, sort_by, car_type=None):
+        """The best row for a ranking, overall or within one (lowercase) type, or None."""
+        name, direction = RANKINGS[sort_by]
+        if name not in self._numeric:
+            return None
+        order = 'ASC' if direction > 0 else 'DESC'
+        if car_type is None:
+            rows = self._query(f'SELECT row_id FROM cars WHERE n_{name} IS NOT NULL '
+                               f'ORDER BY n_{name} {order}, row_id LIMIT 1')
+        else:
+            rows = self._query(f'SELECT row_id FROM cars WHERE k_Type = ? AND n_{name} IS NOT NULL '
+                               f'ORDER BY n_{name} {order}, row_id LIMIT 1', (car_type,))
+        return self[rows[0][0]] if rows else None
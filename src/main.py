@@ -1,22 +1,21 @@
-import csv
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from car_store import CarStore
 
 def load_knowledge_base(filename='cars.csv'):
     """
-    Loads the car data from a CSV file into a list of dictionaries.
+    Streams the car data from a CSV file into a columnar CarStore.
     """
     
     filepath = os.path.join(os.path.dirname(__file__), '..', filename)
     
-    knowledge_base = []
     try:
-        with open(filepath, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-               
-                clean_row = {key.strip(): val.strip() for key, val in row.items()}
-                knowledge_base.append(clean_row)
-        print("Knowledge base loaded successfully!")
+        knowledge_base = CarStore.from_csv(filepath)
+        stats = knowledge_base.load_stats
+        print(f"Knowledge base loaded successfully! ({stats['rows_per_second']:,.0f} rows/s)")
         return knowledge_base
     except FileNotFoundError:
         print(f"Error: The file at '{filepath}' was not found. Please make sure '{filename}' is in the main project folder.")
@@ -0,0 +1,172 @@
+const chatBox = document.getElementById('chatBox');
+const userInput = document.getElementById('userInput');
+const sendButton = document.getElementById('sendButton');
+const greeting = document.getElementById('greeting');
+const suggestionArea = document.getElementById('suggestionArea');
+const resetButton = document.getElementById('resetButton');
+
+// Settings Elements
+const settingsModal = document.getElementById('settingsModal');
+const themeToggle = document.getElementById('themeToggle');
+const fontToggle = document.getElementById('fontToggle');
+const logoToggle = document.getElementById('logoToggle');
+const appLogo = document.getElementById('appLogo');
+const mainContainer = document.getElementById('mainContainer');
+
+// --- Toggle Image Function (Global Scope) ---
+window.toggleImage = function(btn) {
+    const imgContainer = btn.nextElementSibling;
+    if (imgContainer.style.display === 'none') {
+        imgContainer.style.display = 'block';
+        btn.textContent = '🙈 Hide Image';
+    } else {
+        imgContainer.style.display = 'none';
+        btn.textContent = '📸 Show Image';
+    }
+}
+
+// --- "Show more" for long filter results (Global Scope) ---
+window.showMoreResults = async function(btn) {
+    btn.disabled = true;
+    try {
+        const response = await fetch('/filter_results?cursor=' + encodeURIComponent(btn.dataset.cursor));
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        btn.insertAdjacentHTML('afterend', data.answer);
+        btn.remove();
+    } catch (error) {
+        console.error('Error:', error);
+        addMessage('Sorry, I could not load more results. Please try again.', 'bot-message');
+        btn.disabled = false;
+    }
+}
+
+// --- Settings Logic ---
+function toggleSettings() {
+    if (settingsModal.style.display === 'flex') {
+        settingsModal.style.display = 'none';
+    } else {
+        settingsModal.style.display = 'flex';
+    }
+}
+
+themeToggle.addEventListener('change', function() {
+    if (this.checked) {
+        document.body.classList.add('light-mode');
+    } else {
+        document.body.classList.remove('light-mode');
+    }
+});
+
+fontToggle.addEventListener('change', function() {
+    if (this.checked) {
+        mainContainer.classList.add('large-font');
+    } else {
+        mainContainer.classList.remove('large-font');
+    }
+});
+
+logoToggle.addEventListener('change', function() {
+    if (this.checked) {
+        appLogo.style.display = 'block';
+    } else {
+        appLogo.style.display = 'none';
+    }
+});
+
+function clearChatHistory() {
+    chatBox.innerHTML = ''; 
+    chatBox.appendChild(greeting); 
+    greeting.style.display = 'block'; 
+    suggestionArea.style.display = 'flex'; 
+    resetButton.style.display = 'none';
+    fetch('/reset_memory', { method: 'POST' });
+    toggleSettings(); // Close modal
+}
+
+// Close modal if clicked outside
+window.onclick = function(event) {
+    if (event.target == settingsModal) {
+        settingsModal.style.display = "none";
+    }
+}
+
+// --- Chat Logic ---
+const suggestionButtons = document.querySelectorAll('.suggestion-btn');
+suggestionButtons.forEach(button => {
+    button.addEventListener('click', () => {
+        const suggestionText = button.innerText;
+        userInput.value = suggestionText;
+        sendMessage();
+    });
+});
+
+async function sendMessage() {
+    const userText = userInput.value.trim();
+    if (userText === '') return;
+
+    if (greeting.style.display !== 'none') {
+        greeting.style.display = 'none';
+        suggestionArea.style.display = 'none';
+        resetButton.style.display = 'block'; 
+    }
+
+    addMessage(userText, 'user-message');
+    userInput.value = '';
+
+    try {
+        const typingIndicatorHTML = `
+            <div class="typing-indicator">
+                <div></div>
+                <div></div>
+                <div></div>
+            </div>`;
+        const typingIndicator = addMessage(typingIndicatorHTML, 'bot-message');
+        const startedAt = Date.now();
+
+        const response = await fetch('/ask', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: userText })
+        });
+        const data = await response.json();
+
+        // Keep the typing indicator up for at least TYPING_DELAY_MS
+        const remaining = TYPING_DELAY_MS - (Date.now() - startedAt);
+        if (remaining > 0) {
+            await new Promise(resolve => setTimeout(resolve, remaining));
+        }
+
+        chatBox.removeChild(typingIndicator);
+        addMessage(data.answer, 'bot-message');
+
+    } catch (error) {
+        console.error('Error:', error);
+        addMessage('Sorry, something went wrong. Please try again.', 'bot-message');
+    }
+}
+
+function addMessage(text, className) {
+    const messageElement = document.createElement('div');
+    messageElement.classList.add('message', className);
+    messageElement.innerHTML = text; 
+    chatBox.appendChild(messageElement);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return messageElement; 
+}
+
+function resetChat() {
+    clearChatHistory();
+}
+
+sendButton.addEventListener('click', sendMessage);
+resetButton.addEventListener('click', resetChat); 
+
+userInput.addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        e.preventDefault(); 
+        sendMessage();
+    }
+});
@@ -0,0 +1,90 @@
+"""
+Fingerprinted, pre-compressed static files for the chat UI.
+
+Every file under static/ is read once at startup. Its URL carries a hash of its
+contents (css/chat.css -> css/chat.3f9a0c1d2e4b.css), so browsers and the edge
+can cache it for a year: a changed file gets a new URL. Text files are
+compressed once with gzip, and with brotli when the brotli package is installed;
+a request gets the smallest encoding it accepts.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Files smaller than this are sent as they are; compression would not pay for the framing.
+MIN_COMPRESS_BYTES = 256
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# Preferred first when the client accepts several.
+ENCODINGS = ('br', 'gzip')
+
+
+def fingerprint(body):
+    return hashlib.sha256(body).hexdigest()[:12]
+
+
+def compress(body, mimetype):
+    """{encoding: compressed body} for the encodings that make body smaller."""
+    if len(body) < MIN_COMPRESS_BYTES or not mimetype.startswith(COMPRESSIBLE_TYPES):
+        return {}
+    encoded = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=11)
+    return {encoding: data for encoding, data in encoded.items() if len(data) < len(body)}
+
+
+class Asset:
+    """One file's bytes, its compressed variants and its ETag."""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = fingerprint(body)
+        self.encoded = compress(body, mimetype)
+
+    def negotiate(self, accepted):
+        """(encoding or None, bytes) for an Accept-Encoding mapping of encoding -> quality."""
+        for encoding in ENCODINGS:
+            if encoding in self.encoded and accepted[encoding] > 0:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+
+class StaticAssets:
+    def __init__(self, directory):
+        self.directory = directory
+        self._by_name = {}    # fingerprinted name -> Asset
+        self._urls = {}       # file name -> fingerprinted name
+        for root, _, files in os.walk(directory):
+            for file_name in sorted(files):
+                path = os.path.join(root, file_name)
+                self.add(os.path.relpath(path, directory).replace(os.sep, '/'), path)
+
+    def add(self, name, path):
+        with open(path, 'rb') as file:
+            body = file.read()
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/'):
+            mimetype += '; charset=utf-8'
+        asset = Asset(body, mimetype)
+        stem, extension = os.path.splitext(name)
+        versioned = f"{stem}.{asset.etag}{extension}"
+        self._by_name[versioned] = asset
+        self._urls[name] = versioned
+
+    def versioned_name(self, name):
+        """The fingerprinted name for a file under the static directory (KeyError if there is none)."""
+        return self._urls[name]
+
+    def get(self, versioned_name):
+        return self._by_name.get(versioned_name)
+
+    def __len__(self):
+        return len(self._by_name)
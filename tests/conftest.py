@@ -0,0 +1,61 @@
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+# test_main.py is an elided copy of an old flask_app.py ("# ... identical to ..."), not a test module.
+collect_ignore = ['test_main.py']
+
+
+def pytest_configure(config):
+    # fuzzywuzzy warns on import when python-Levenshtein is missing.
+    config.addinivalue_line('filterwarnings', 'ignore:Using slow pure-python SequenceMatcher')
+
+
+# --- Shared catalog ---
+# The shipped cars.csv, 2,000 synthetic cars and a few awkward rows: a repeated model,
+# prices that are not numbers, an empty cell and non-ASCII text.
+EXTRA_ROWS = [
+    ['Toyota', 'Camry', '2019', '14.0', '2500', 'Sedan', '24000', '30000', 'USA', '', 'An older Camry.'],
+    ['Škoda', 'Octavia RS', '2022', '16.5', '2000', 'Wagon', 'TBD', '', 'Europe', '', 'Preis auf Anfrage – €'],
+    ['Tesla', 'Model Y', '2024', '', '0', 'SUV', '44990', '52490', 'Global', '', 'Electric Vehicle.'],
+]
+
+
+@pytest.fixture(scope='session')
+def catalog_csv(tmp_path_factory):
+    from create_large_db import generate_large_catalog
+    directory = tmp_path_factory.mktemp('catalog')
+    synthetic = directory / 'synthetic.csv'
+    generate_large_catalog(str(synthetic), 2000, seed=3, workers=1)
+    path = directory / 'cars.csv'
+    with open(REPO / 'cars.csv', newline='', encoding='utf-8') as shipped, \
+            open(synthetic, newline='', encoding='utf-8') as generated, \
+            open(path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerows(csv.reader(shipped))
+        writer.writerows(list(csv.reader(generated))[1:])
+        writer.writerows(EXTRA_ROWS)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def catalog(catalog_csv):
+    from car_store import CarStore
+    store = CarStore.from_csv(catalog_csv)
+    store.build_indexes()
+    store.freeze()
+    return store
+
+
+@pytest.fixture
+def client(catalog, monkeypatch):
+    """A test client for flask_app serving the shared catalog, with an empty response cache."""
+    import flask_app
+    monkeypatch.setattr(flask_app, 'CAR_DATA', catalog)
+    flask_app.RESPONSE_CACHE.clear()
+    return flask_app.app.test_client()
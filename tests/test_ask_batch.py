@@ -0,0 +1,72 @@
+import pytest
+
+import flask_app
+
+
+def ask_batch(client, messages):
+    return client.post('/ask_batch', json={'messages': messages})
+
+
+def test_answers_in_order(client):
+    response = ask_batch(client, ['hello', 'how much is the Camry', {'message': 'price of camry', 'currency': 'bdt'}])
+    assert response.status_code == 200
+    answers = response.get_json()['answers']
+    assert len(answers) == 3
+    assert 'Hello' in answers[0]['answer'] and answers[0]['context'] is None
+    assert 'USD' in answers[1]['answer'] and answers[1]['context'] == 'Camry'
+    assert 'BDT' in answers[2]['answer']
+
+
+def test_context_chains_follow_ups(client):
+    first = ask_batch(client, ['tell me about the mustang']).get_json()['answers'][0]
+    follow_up = ask_batch(client, [{'message': 'what about its mileage', 'context': first['context']}])
+    answer = follow_up.get_json()['answers'][0]
+    assert answer['context'] == 'Mustang'
+    assert 'Mustang' in answer['answer']
+
+
+def test_repeats_are_answered_once(client):
+    flask_app.RESPONSE_CACHE.clear()
+    misses = flask_app.RESPONSE_CACHE.misses
+    answers = ask_batch(client, ['price of the civic'] * 20 + ['PRICE OF THE CIVIC ']).get_json()['answers']
+    assert len({answer['answer'] for answer in answers}) == 1
+    assert flask_app.RESPONSE_CACHE.misses == misses + 1
+
+
+def test_does_not_touch_the_conversation_context(client):
+    response = ask_batch(client, ['tell me about the camry'])
+    assert flask_app.CONTEXT_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {'message': 'hello'},
+    {'messages': 'hello'},
+    {'messages': [42]},
+    {'messages': [{'text': 'hello'}]},
+    {'messages': [{'message': 'hello', 'currency': 'GBP'}]},
+    {'messages': [{'message': 'hello', 'context': 7}]},
+])
+def test_bad_requests(client, body):
+    response = client.post('/ask_batch', json=body) if body is not None else client.post('/ask_batch', data='nope')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_bad_entry_is_reported_by_position(client):
+    response = ask_batch(client, ['hello', 'bye', {'message': None}])
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Message 2:')
+
+
+def test_too_many_messages(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'MAX_BATCH_MESSAGES', 3)
+    assert ask_batch(client, ['hello'] * 3).status_code == 200
+    response = ask_batch(client, ['hello'] * 4)
+    assert response.status_code == 413
+    assert '3' in response.get_json()['error']
+
+
+def test_no_catalog(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'CAR_DATA', None)
+    assert ask_batch(client, ['hello']).status_code == 503
@@ -0,0 +1,207 @@
+import math
+import operator
+import random
+
+import pytest
+
+import car_store
+import flask_app
+from car_store import INDEXED_COLUMNS, SORTED_COLUMNS, CarStore
+from filter_engine import COMPARISONS, Bounds, column_bounds
+
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq}
+
+
+def brute_force(store, equals, conditions):
+    """select() the slow way: every row, every constraint."""
+    row_ids = []
+    for row_id in range(len(store)):
+        if any(INDEXED_COLUMNS[name](store.column(name)[row_id]) != key for name, key in equals.items()):
+            continue
+        if all(OPERATORS[op](store.numbers(name)[row_id], float(value)) for name, op, value in conditions):
+            row_ids.append(row_id)
+    return row_ids
+
+
+def random_queries(store, count, seed):
+    """Equality keys and comparisons drawn from the catalog's own values, so boundaries and ties come up."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        equals = {}
+        for name in ('Company', 'Type'):
+            if rng.random() < 0.4:
+                equals[name] = rng.choice(list(store.keys(name)) + ['no such key'])
+        conditions = []
+        for _ in range(rng.randint(0, 3)):
+            name = rng.choice(SORTED_COLUMNS)
+            value = store.numbers(name)[rng.randrange(len(store))]
+            if rng.random() < 0.2:
+                value = rng.choice([value + 0.5, -1, 1e12, math.inf])
+            conditions.append((name, rng.choice(COMPARISONS), value))
+        queries.append((equals, conditions))
+    return queries
+
+
+@pytest.fixture(params=['stdlib', 'numpy'])
+def engine(request, monkeypatch):
+    """Runs a test once over the sorted indexes and once over numpy masks (if numpy is installed)."""
+    if request.param == 'numpy':
+        monkeypatch.setattr(car_store, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(car_store, 'numpy', None)
+    return request.param
+
+
+# --- Bounds ---
+@pytest.mark.parametrize('op', COMPARISONS)
+@pytest.mark.parametrize('value', [-2.0, 0.0, 1.5, 3.0])
+def test_bounds_single_comparison(op, value):
+    bounds = Bounds()
+    bounds.add(op, value)
+    numbers = [-2.0, -1.0, 0.0, 1.5, 3.0, 7.0, math.nan]
+    probe = bounds.probe(numbers)
+    assert [probe(row_id) for row_id in range(len(numbers))] == [OPERATORS[op](x, value) for x in numbers]
+
+
+def test_bounds_keep_the_narrowest_limits():
+    rng = random.Random(4)
+    numbers = [float(rng.randint(0, 20)) for _ in range(200)] + [math.nan]
+    for _ in range(300):
+        conditions = [(rng.choice(COMPARISONS), rng.randint(-1, 21)) for _ in range(rng.randint(1, 4))]
+        bounds = Bounds()
+        for op, value in conditions:
+            bounds.add(op, value)
+        probe = bounds.probe(numbers)
+        for row_id, x in enumerate(numbers):
+            assert probe(row_id) == all(OPERATORS[op](x, value) for op, value in conditions), conditions
+
+
+def test_bounds_nan_matches_nothing():
+    bounds = Bounds()
+    bounds.add('<', 10)
+    bounds.add('>=', math.nan)
+    probe = bounds.probe([-math.inf, 0.0, 5.0, math.inf, math.nan])
+    assert not any(probe(row_id) for row_id in range(5))
+
+
+def test_bounds_unknown_op():
+    with pytest.raises(ValueError):
+        Bounds().add('!=', 1)
+    with pytest.raises(ValueError):
+        column_bounds([('Year', '=>', 2020)])
+
+
+def test_column_bounds_merges_by_column():
+    bounds = column_bounds([('Year', '>=', 2018), ('Engine_CC', '==', 0), ('Year', '<', 2022), ('Year', '>', 2018)])
+    assert sorted(bounds) == ['Engine_CC', 'Year']
+    year = bounds['Year']
+    assert (year.low, year.low_inclusive, year.high, year.high_inclusive) == (2018, False, 2022, False)
+    engine_cc = bounds['Engine_CC']
+    assert (engine_cc.low, engine_cc.low_inclusive, engine_cc.high, engine_cc.high_inclusive) == (0, True, 0, True)
+
+
+def test_bounds_mask_matches_probe():
+    numpy = pytest.importorskip('numpy')
+    rng = random.Random(5)
+    numbers = [float(rng.randint(0, 20)) for _ in range(200)] + [math.nan]
+    values = numpy.array(numbers)
+    for _ in range(200):
+        bounds = Bounds()
+        for _ in range(rng.randint(1, 3)):
+            bounds.add(rng.choice(COMPARISONS), rng.randint(-1, 21))
+        probe = bounds.probe(numbers)
+        assert bounds.mask(values).tolist() == [probe(row_id) for row_id in range(len(numbers))]
+
+
+# --- CarStore.select ---
+def test_select_matches_brute_force(catalog, engine):
+    for equals, conditions in random_queries(catalog, 250, seed=6):
+        assert list(catalog.select(equals, conditions)) == brute_force(catalog, equals, conditions), (equals, conditions)
+
+
+@pytest.mark.parametrize('equals, conditions', [
+    ({}, []),
+    ({'Type': 'suv'}, []),
+    ({}, [('Price_Base_USD', '<', math.inf)]),
+    ({}, [('Year', '>', -math.inf)]),
+    ({}, [('Price_Base_USD', '<', math.nan)]),
+    ({'Company': 'no such key'}, [('Year', '>=', 2000)]),
+    ({'Company': 'tesla'}, [('Engine_CC', '==', 0)]),
+    ({'Company': 'škoda'}, [('Price_Base_USD', '>=', 0)]),
+    ({}, [('Mileage_kmpl', '>', 0), ('Mileage_kmpl', '<', 0)]),
+    ({}, [('Year', '>=', 2020), ('Year', '<=', 2020)]),
+])
+def test_select_edge_cases(catalog, engine, equals, conditions):
+    assert list(catalog.select(equals, conditions)) == brute_force(catalog, equals, conditions)
+
+
+def test_select_skips_cells_that_are_not_numbers(catalog, engine):
+    # The extra Octavia RS has price 'TBD' and the extra Model Y no mileage.
+    octavia = catalog.lookup('Model', 'Octavia RS')[-1]
+    model_y = catalog.lookup('Model', 'Model Y')[-1]
+    assert octavia not in catalog.select({}, [('Price_Base_USD', '>=', -math.inf)])
+    assert model_y not in catalog.select({}, [('Mileage_kmpl', '<', math.inf)])
+    assert model_y in catalog.select({'Company': 'tesla'}, [('Engine_CC', '==', 0)])
+
+
+def test_select_after_updates(catalog_csv, engine):
+    store = CarStore.from_csv(catalog_csv)
+    store.build_indexes()
+    rng = random.Random(7)
+    companies = list(store.keys('Company'))
+    for row_id in rng.sample(range(len(store)), 300):
+        store.update(row_id, Company=rng.choice(companies).title(),
+                     Price_Base_USD=rng.choice(['', 'TBD', str(rng.randint(5000, 90000))]),
+                     Year=str(rng.randint(2010, 2025)))
+    for equals, conditions in random_queries(store, 150, seed=8):
+        assert list(store.select(equals, conditions)) == brute_force(store, equals, conditions), (equals, conditions)
+
+
+# --- filter_car_ids ---
+@pytest.mark.parametrize('criteria, equals, conditions', [
+    ({'type': 'suv', 'price_less_than': 40000.0}, {'Type': 'suv'}, [('Price_Base_USD', '<', 40000.0)]),
+    ({'company': 'toyota', 'year_from': 2020, 'year_to': 2022}, {'Company': 'toyota'},
+     [('Year', '>=', 2020), ('Year', '<=', 2022)]),
+    ({'powertrain': 'ev', 'mileage_more_than': 5.0}, {}, [('Mileage_kmpl', '>', 5.0), ('Engine_CC', '==', 0)]),
+    ({'powertrain': 'ice', 'engine_cc_less_than': 1600.0, 'top_price_more_than': 30000.0}, {},
+     [('Price_TopTrim_USD', '>', 30000.0), ('Engine_CC', '<', 1600.0), ('Engine_CC', '>', 0)]),
+])
+def test_filter_car_ids(catalog, engine, criteria, equals, conditions):
+    expected = brute_force(catalog, equals, conditions)
+    assert expected
+    assert list(flask_app.filter_car_ids(criteria, catalog)) == expected
+
+
+# --- Parsing filter phrases ---
+@pytest.mark.parametrize('message, criteria', [
+    ('find cars under $30,000', {'price_less_than': 30000.0}),
+    ('show me cars above $30,000', {'price_more_than': 30000.0}),
+    ('find cars from $20,000', {'price_at_least': 20000.0}),
+    ('show me cars since $20,000', {'price_at_least': 20000.0}),
+    ('find cars from 20000 to 30000', {'price_at_least': 20000.0, 'price_at_most': 30000.0}),
+    ('find cars between $20,000 and $30,000', {'price_at_least': 20000.0, 'price_at_most': 30000.0}),
+    ('find cars between 1500 and 2500 cc', {'engine_cc_at_least': 1500.0, 'engine_cc_at_most': 2500.0}),
+    ('show me cars from 2020', {'year_from': 2020, 'year_to': 2020}),
+    ('show me cars since 2020', {'year_from': 2020}),
+    ('find cars after 2020', {'year_from': 2021}),
+    ('show me cars from 2018 to 2021', {'year_from': 2018, 'year_to': 2021}),
+    ('show me cars from 2020 until 2022', {'year_from': 2020, 'year_to': 2022}),
+    ('cars below 30000', {'price_less_than': 30000.0}),
+])
+def test_parse_filter_phrases(catalog, message, criteria):
+    assert flask_app.parse_user_input(message, catalog) == ('filter_cars', criteria)
+
+
+@pytest.mark.parametrize('message', ['is the toyota corolla above average?', 'is the toyota corolla below average'])
+def test_above_and_below_without_a_number_are_not_filters(catalog, message):
+    assert flask_app.parse_user_input(message, catalog) == ('get_all_info', 'Corolla')
+
+
+def test_inclusive_bounds_keep_the_bound(catalog):
+    price = catalog.numbers('Price_Base_USD')[0]
+    year = int(catalog.numbers('Year')[0])
+    from_price = flask_app.filter_car_ids(flask_app.parse_user_input(f'find cars from ${price:.0f}', catalog)[1], catalog)
+    from_year = flask_app.filter_car_ids(flask_app.parse_user_input(f'show me cars from {year}', catalog)[1], catalog)
+    assert 0 in from_price and 0 in from_year
+    assert all(catalog.numbers('Year')[row_id] == year for row_id in from_year)
@@ -0,0 +1,171 @@
+import os
+import shutil
+import zlib
+
+import pytest
+
+import flask_app
+from car_store import CarStore
+from catalog_snapshot import FORMAT_VERSION, PREFIX, SnapshotError, load_snapshot, snapshot_intact, write_snapshot
+
+MESSAGES = ['tell me about the camry', 'price of octavia rs', 'model y range', '4', 'cheapest sedan', 'hello']
+
+
+def same_number(x, y):
+    return x == y or (x != x and y != y)
+
+
+def assert_same_catalog(expected, actual):
+    assert len(actual) == len(expected)
+    assert actual.columns == expected.columns
+    for row_id in range(len(expected)):
+        assert dict(actual[row_id]) == dict(expected[row_id])
+    for name in ('Year', 'Mileage_kmpl', 'Engine_CC', 'Price_Base_USD', 'Price_TopTrim_USD'):
+        assert all(map(same_number, actual.numbers(name), expected.numbers(name)))
+    for name in ('Company', 'Type', 'Model'):
+        keys = list(expected.keys(name))
+        assert list(actual.keys(name)) == keys
+        for key in keys:
+            assert list(actual.lookup(name, key)) == list(expected.lookup(name, key))
+        assert list(actual.lookup(name, 'no such key')) == []
+    for sort_by in ('price_asc', 'mileage_desc'):
+        for group in [None, *expected.keys('Type')]:
+            best, found = expected.top(sort_by, group), actual.top(sort_by, group)
+            assert (found and found.row_id) == (best and best.row_id)
+    for equals, conditions in [({'Company': 'toyota'}, [('Price_Base_USD', '<', 30000)]),
+                               ({'Type': 'suv'}, [('Year', '>=', 2022), ('Mileage_kmpl', '>', 15)]),
+                               ({'Model': 'Camry'}, []),
+                               ({}, [('Engine_CC', '==', 0)])]:
+        assert list(actual.select(equals, conditions)) == list(expected.select(equals, conditions))
+    for message in MESSAGES:
+        assert actual.model_matcher.extract_one(message) == expected.model_matcher.extract_one(message)
+    assert len(actual.model_matcher) == len(expected.model_matcher)
+    assert actual.key_generation == expected.key_generation
+
+
+@pytest.fixture
+def snapshot_path(catalog, catalog_csv, tmp_path):
+    path = str(tmp_path / 'cars.snapshot')
+    write_snapshot(catalog, path, source_path=catalog_csv)
+    return path
+
+
+def test_round_trip(catalog, catalog_csv, snapshot_path):
+    loaded = load_snapshot(snapshot_path, source_path=catalog_csv)
+    assert_same_catalog(catalog, loaded)
+
+
+def test_loaded_catalog_is_frozen(catalog_csv, snapshot_path):
+    loaded = load_snapshot(snapshot_path, source_path=catalog_csv)
+    with pytest.raises(RuntimeError):
+        loaded.update(0, Model='Something else')
+    with pytest.raises(RuntimeError):
+        loaded.model_matcher.add('Something else')
+
+
+def test_removed_model_names_stay_removed(catalog_csv, tmp_path):
+    store = CarStore.from_csv(catalog_csv)
+    store.build_indexes()
+    store.update(0, Model='Camry Hybrid')  # the first 'Camry' row; the extra one keeps the name
+    store.update(1, Model='Mustang Mach-E')  # 'Mustang' is gone
+    path = str(tmp_path / 'edited.snapshot')
+    write_snapshot(store, path)
+    loaded = load_snapshot(path)
+    assert_same_catalog(store, loaded)
+    assert 'Mustang' not in loaded.model_matcher.candidates('tell me about the mustang')
+
+
+def test_empty_catalog(tmp_path):
+    store = CarStore()
+    path = str(tmp_path / 'empty.snapshot')
+    write_snapshot(store, path)
+    loaded = load_snapshot(path)
+    assert len(loaded) == 0
+    assert list(loaded.keys('Model')) == []
+    assert loaded.model_matcher.extract_one('camry') is None
+
+
+def test_changed_csv_is_refused(catalog_csv, snapshot_path, tmp_path):
+    csv_path = str(tmp_path / 'cars.csv')
+    shutil.copy(catalog_csv, csv_path)
+    load_snapshot(snapshot_path, source_path=csv_path)  # a copy (new mtime, same content) is still current
+    with open(csv_path, 'a', encoding='utf-8') as file:
+        file.write('Kia,Niro,2024,20,1600,SUV,27000,36000,Global,,\n')
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path, source_path=csv_path)
+
+
+def test_stale_snapshot_falls_back_to_the_csv(catalog, catalog_csv, tmp_path):
+    csv_path = str(tmp_path / 'cars.csv')
+    shutil.copy(catalog_csv, csv_path)
+    write_snapshot(catalog, str(tmp_path / 'cars.snapshot'), source_path=csv_path)
+    assert flask_app.load_knowledge_base(csv_path).snapshot_buffer is not None
+
+    with open(csv_path, 'a', encoding='utf-8') as file:
+        file.write('Kia,Niro,2024,20,1600,SUV,27000,36000,Global,,\n')
+    reloaded = flask_app.load_knowledge_base(csv_path)
+    assert reloaded.snapshot_buffer is None
+    assert len(reloaded) == len(catalog) + 1
+    assert reloaded.find('Model', 'Niro') is not None
+
+
+def flip_last_byte(path):
+    with open(path, 'r+b') as file:
+        file.seek(os.path.getsize(path) - 1)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_CUR)
+        file.write(bytes([last[0] ^ 0xFF]))
+
+
+def test_corrupt_snapshot_is_refused(snapshot_path):
+    flip_last_byte(snapshot_path)
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path)
+    load_snapshot(snapshot_path, verify=False)
+
+
+class RecordingReloader:
+    def __init__(self):
+        self.reloads = 0
+
+    def reload(self, wait=False):
+        self.reloads += 1
+        return True
+
+
+@pytest.mark.parametrize('corrupt', [False, True])
+def test_snapshot_checksum_is_checked_after_startup(catalog, catalog_csv, tmp_path, monkeypatch, corrupt):
+    csv_path = str(tmp_path / 'cars.csv')
+    shutil.copy(catalog_csv, csv_path)
+    write_snapshot(catalog, str(tmp_path / 'cars.snapshot'), source_path=csv_path)
+    if corrupt:
+        flip_last_byte(str(tmp_path / 'cars.snapshot'))
+    loaded = flask_app.load_knowledge_base(csv_path)
+    assert loaded.snapshot_buffer is not None  # mapped without reading the whole file
+    assert snapshot_intact(loaded) is not corrupt
+
+    reloader = RecordingReloader()
+    monkeypatch.setattr(flask_app, 'CATALOG_RELOADER', reloader)
+    monkeypatch.setattr(flask_app, 'CAR_DATA', loaded)
+    monkeypatch.setattr(flask_app, '_corrupt_snapshots', set())
+    flask_app.check_snapshot_in_background(loaded).join()
+    assert reloader.reloads == corrupt
+    assert (flask_app.load_knowledge_base(csv_path).snapshot_buffer is None) is corrupt
+
+
+def test_other_format_version_is_refused(snapshot_path):
+    with open(snapshot_path, 'r+b') as file:
+        magic, version, header_len, checksum = PREFIX.unpack(file.read(PREFIX.size))
+        file.seek(0)
+        file.write(PREFIX.pack(magic, FORMAT_VERSION + 1, header_len, checksum))
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path)
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'cars.snapshot'
+    path.write_bytes(b'Company,Model\n' + zlib.compress(b'x' * 100))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(tmp_path / 'missing.snapshot'))
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+import flask_app
+from context_store import MemoryContextStore, SqliteContextStore
+
+
+@pytest.fixture
+def conversation(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'CONTEXT_STORE', MemoryContextStore())
+    return lambda message: client.post('/ask', json={'message': message}).get_json()['answer']
+
+
+def test_follow_up_uses_the_remembered_car(conversation):
+    assert 'Mustang' in conversation('tell me about the mustang')
+    assert 'Mustang' in conversation('what about its mileage')
+
+
+def test_currency_sticks_until_another_is_named(conversation):
+    assert 'BDT' in conversation('price of the camry in bdt')
+    assert 'BDT' in conversation('price of the civic')
+    assert 'EUR' in conversation('price of the civic in euro')
+    assert 'EUR' in conversation('price of the mustang')
+
+
+def test_dollar_sign_switches_back_to_usd(conversation):
+    assert 'BDT' in conversation('price of the camry in bdt')
+    answer = conversation('find cars under $30000')
+    assert 'USD' in answer and 'BDT' not in answer
+    assert 'USD' in conversation('price of the civic')
+
+
+def test_dollar_sign_names_usd():
+    assert flask_app.detect_currency('under $30,000') == 'USD'
+    assert flask_app.detect_currency('under 30,000') is None
+    assert flask_app.detect_currency('$30,000 in taka') == 'BDT'
+
+
+def test_next_page_continues_the_last_filter(conversation):
+    first = conversation('show me suvs under $40000')
+    assert 'data-cursor' in first
+    second = conversation('next')
+    assert f'Cars {flask_app.RESULTS_PAGE_SIZE + 1} to' in second
+
+
+def test_unknown_cookie_gets_a_new_id(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'CONTEXT_STORE', MemoryContextStore())
+    client.set_cookie(flask_app.CONTEXT_COOKIE, 'chosen-by-the-client')
+    response = client.post('/ask', json={'message': 'tell me about the camry'})
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith(f'{flask_app.CONTEXT_COOKIE}=') and 'chosen-by-the-client' not in cookie
+    assert len(flask_app.CONTEXT_STORE) == 1
+
+
+# --- Context stores ---
+@pytest.fixture(params=['memory', 'sqlite'])
+def store_factory(request, tmp_path):
+    if request.param == 'memory':
+        return lambda ttl_seconds: MemoryContextStore(ttl_seconds=ttl_seconds)
+    return lambda ttl_seconds: SqliteContextStore(str(tmp_path / 'contexts.sqlite'), ttl_seconds=ttl_seconds)
+
+
+def test_store_round_trip(store_factory):
+    store = store_factory(60)
+    assert store.get('missing') is None
+    store.put('a', {'last_car_model': 'Camry', 'filter': {'criteria': {'type': 'suv'}, 'offset': 20}})
+    context = store.get('a')
+    assert context == {'last_car_model': 'Camry', 'filter': {'criteria': {'type': 'suv'}, 'offset': 20}}
+    context['last_car_model'] = 'Civic'
+    assert store.get('a')['last_car_model'] == 'Camry'
+    store.delete('a')
+    assert store.get('a') is None and len(store) == 0
+
+
+def test_store_expiry(store_factory, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    store = store_factory(10)
+    store.put('a', {'currency': 'BDT'})
+    now[0] += 9
+    assert store.get('a') == {'currency': 'BDT'}
+    now[0] += 2
+    assert store.get('a') is None
+    assert len(store) == 0
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryContextStore(max_entries=2)
+    store.put('a', {})
+    store.put('b', {})
+    store.get('a')
+    store.put('c', {})
+    assert store.get('a') == {} and store.get('b') is None and store.get('c') == {}
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / 'contexts.sqlite')
+    SqliteContextStore(path).put('a', {'last_car_model': 'Camry'})
+    assert SqliteContextStore(path).get('a') == {'last_car_model': 'Camry'}
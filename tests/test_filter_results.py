@@ -0,0 +1,86 @@
+import base64
+import json
+
+import pytest
+
+import flask_app
+from flask_app import decode_cursor, encode_cursor
+
+CRITERIA = {'type': 'suv', 'price_less_than': 40000.0}
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(CRITERIA, 'BDT', 40)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (CRITERIA, 'BDT', 40)
+
+
+def test_cursor_criteria_are_cleaned():
+    cursor = raw_cursor({'criteria': {'company': 'Toyota', 'year_from': '2020', 'price_more_than': '1e4'},
+                         'currency': 'USD', 'offset': '20'})
+    assert decode_cursor(cursor) == ({'company': 'toyota', 'year_from': 2020, 'price_more_than': 10000.0}, 'USD', 20)
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),
+    raw_cursor([1, 2, 3]),
+    raw_cursor({'criteria': {}, 'currency': 'USD'}),
+    raw_cursor({'criteria': {}, 'currency': 'USD', 'offset': -1}),
+    raw_cursor({'criteria': {}, 'currency': 'USD', 'offset': 'ten'}),
+    raw_cursor({'criteria': {}, 'currency': 'GBP', 'offset': 0}),
+    raw_cursor({'criteria': {'colour': 'red'}, 'currency': 'USD', 'offset': 0}),
+    raw_cursor({'criteria': {'price_less_than': 'cheap'}, 'currency': 'USD', 'offset': 0}),
+    raw_cursor({'criteria': {'powertrain': 'steam'}, 'currency': 'USD', 'offset': 0}),
+    raw_cursor({'criteria': ['type'], 'currency': 'USD', 'offset': 0}),
+    raw_cursor({'criteria': {}, 'currency': 'USD', 'offset': 1e999}),
+    raw_cursor({'criteria': {'year_from': 1e999}, 'currency': 'USD', 'offset': 0}),
+    raw_cursor({'criteria': {}, 'currency': ['USD'], 'offset': 0}),
+])
+def test_bad_cursor(client, cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    response = client.get('/filter_results', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('query', [{'currency': 'GBP'}, {'limit': 'all'}, {'year_from': 'new'}])
+def test_bad_query_string(client, query):
+    assert client.get('/filter_results', query_string=query).status_code == 400
+
+
+def test_cursors_walk_every_match_once(client, catalog):
+    expected = list(flask_app.filter_car_ids(CRITERIA, catalog))
+    assert len(expected) > 2 * flask_app.RESULTS_PAGE_SIZE
+    seen = []
+    cursor = encode_cursor(CRITERIA, 'USD', 0)
+    while cursor:
+        lines = client.get('/filter_results', query_string={'cursor': cursor, 'format': 'ndjson', 'limit': 50}).data
+        *cars, last = [json.loads(line) for line in lines.decode('utf-8').splitlines()]
+        assert len(cars) <= 50 and last['total'] == len(expected)
+        seen.extend(car['model'] for car in cars)
+        cursor = last['next_cursor']
+    assert seen == [catalog[row_id]['Model'] for row_id in expected]
+
+
+def test_html_page_has_a_show_more_cursor(client, catalog):
+    response = client.get('/filter_results', query_string={'type': 'SUV', 'price_less_than': '40000',
+                                                           'currency': 'eur'})
+    answer = response.get_json()['answer']
+    assert answer.count('<b>') == flask_app.RESULTS_PAGE_SIZE
+    assert 'EUR' in answer
+    cursor = answer.split('data-cursor="')[1].split('"')[0]
+    assert decode_cursor(cursor) == (CRITERIA, 'EUR', flask_app.RESULTS_PAGE_SIZE)
+
+
+def test_limit_is_capped(client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'MAX_RESULTS_PAGE_SIZE', 5)
+    lines = client.get('/filter_results', query_string={'format': 'ndjson', 'limit': 1000}).data.splitlines()
+    assert len(lines) == 6
+    assert json.loads(lines[-1])['next_cursor'] is not None
@@ -0,0 +1,93 @@
+import re
+
+import pytest
+
+import flask_app
+from keyword_matcher import KeywordMatcher
+
+TYPES = ['suv', 'sedan', 'truck', 'coupe']
+COMPANIES = ['toyota', 'kia', 'tesla', 'ford']
+
+MESSAGES = [
+    "hello", "hi there", "this is the best", "which", "thank you so much", "bye", "exit the chat",
+    "show me the cheapest suv", "most efficient sedan under 30000", "best mileage kia",
+    "find ford trucks over $40,000", "cheaper than 20000 please", "looking for a coupe more than 50000",
+    "what is the price in bdt", "how much in euro", "cost in rupees", "price in dollars", "in usd",
+    "tell me about the toyota", "engine cc of the mustang", "is it available in india", "sell in bangladesh",
+    "fuel range of the tesla", "information on kia", "electric suv under 40000", "petrol cars",
+    "evs above 300 km", "gasoline sedans below 25000", "every ev", "eventually", "diesel truck from ford",
+    "the highest mileage", "recommend me a car", "lowest price coupe", "details", "nothing to see",
+    "kiara", "fordable", "thinking", "hiking boots", "seventy", "the bye-law", "gas", "gastly",
+]
+
+# The checks the automaton replaced: first entry in each group wins, conversation and
+# powertrain words only between word boundaries.
+def first_value(text, keywords_by_value, whole_word=False):
+    for value, keywords in keywords_by_value.items():
+        for keyword in keywords:
+            if re.search(r'\b' + re.escape(keyword) + r'\b', text) if whole_word else keyword in text:
+                return value
+    return None
+
+
+def cascade(text):
+    text = text.lower()
+    found = {
+        'conversation': first_value(text, flask_app.CONV_INTENTS, whole_word=True),
+        'sort_by': first_value(text, flask_app.SORT_KEYWORDS),
+        'price_bound': first_value(text, flask_app.PRICE_BOUND_KEYWORDS),
+        'task': first_value(text, flask_app.TASK_INTENTS),
+        'currency': first_value(text, flask_app.CURRENCY_KEYWORDS),
+        'powertrain': first_value(text, flask_app.POWERTRAIN_KEYWORDS, whole_word=True),
+        'recommend': any(k in text for k in flask_app.RECOMMEND_KEYWORDS) or None,
+        'filter': any(k in text for k in flask_app.FILTER_KEYWORDS) or None,
+        'number_filter': any(k in text for k in flask_app.NUMBER_FILTER_KEYWORDS) or None,
+        'type': next((t for t in TYPES if t in text), None),
+        'company': next((c for c in COMPANIES if c in text), None),
+    }
+    return {category: value for category, value in found.items() if value is not None}
+
+
+class Catalog:
+    def keys(self, name):
+        return {'Type': TYPES, 'Company': COMPANIES}[name]
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return flask_app.build_keyword_matcher(Catalog())
+
+
+@pytest.mark.parametrize('message', MESSAGES)
+def test_matches_if_any_cascade(matcher, message):
+    assert matcher.scan(message.lower()) == cascade(message)
+
+
+def test_lowest_rank_wins_whatever_the_position():
+    matcher = KeywordMatcher()
+    matcher.add('second', 'word', 'second', rank=1)
+    matcher.add('first', 'word', 'first', rank=0)
+    assert matcher.scan('second then first') == {'word': 'first'}
+
+
+def test_overlapping_keywords_and_failure_links():
+    matcher = KeywordMatcher()
+    for keyword in ['he', 'she', 'his', 'hers']:
+        matcher.add(keyword, keyword)
+    assert set(matcher.scan('ushers')) == {'he', 'she', 'hers'}
+
+
+def test_whole_word_boundaries():
+    matcher = KeywordMatcher()
+    matcher.add('hi', 'greeting', whole_word=True)
+    assert matcher.scan('hi!') == {'greeting': True}
+    assert matcher.scan('this') == {}
+    assert matcher.scan('hi_there') == {}
+
+
+def test_keyword_added_after_a_scan():
+    matcher = KeywordMatcher()
+    matcher.add('kia', 'company', 'Kia')
+    assert matcher.scan('a kia') == {'company': 'Kia'}
+    matcher.add('ford', 'company', 'Ford', rank=-1)
+    assert matcher.scan('a kia or ford') == {'company': 'Ford'}
@@ -0,0 +1,95 @@
+import logging
+import random
+
+import pytest
+from fuzzywuzzy import process
+
+from create_large_db import models
+from model_matcher import MATCH_THRESHOLD, ModelMatcher
+
+NAMES = [model for model_list in models.values() for model in model_list]
+
+TEMPLATES = [
+    "tell me about the {}",
+    "how much is the {}",
+    "what is the mileage of {}",
+    "{} price in bdt",
+    "engine of the {}",
+    "is the {} available in india",
+    "price of {} in usd",
+    "{}",
+]
+
+MESSAGES = [
+    "a", "y", "4", "x", "es",
+    "what about its mileage", "show me suvs under $30000", "cheapest sedan",
+    "is it good", "rav 4", "model y price", "the x5 please", "audi a4",
+    "3 series", "tesla model 3 range", "hello", "thanks",
+]
+
+
+# Replies short enough to take the containment path, and numbers that only a name's end can match.
+SHORT_MESSAGES = [
+    "ok", "yes", "no", "x5", "k5", "hi", "go on", "ok thanks", "is it", "a b", "5 x", "4 x",
+    "q", "z", "7", "es", "gt", "se", "lx 5", "30000", "35880", "23846", "82470", "se 9", "!!",
+]
+
+
+def corpus():
+    messages = list(MESSAGES)
+    for name in NAMES:
+        for template in TEMPLATES:
+            messages.append(template.format(name))
+            if len(name) > 4:
+                messages.append(template.format(name[:-1]))  # misspelt
+    return messages
+
+
+def decision(result):
+    return result[0] if result and result[1] > MATCH_THRESHOLD else None
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return ModelMatcher(NAMES)
+
+
+def test_matches_full_scan(matcher, caplog):
+    caplog.set_level(logging.ERROR)
+    mismatches = [(message, decision(process.extractOne(message, NAMES)), decision(matcher.extract_one(message)))
+                  for message in corpus()]
+    assert [m for m in mismatches if m[1] != m[2]] == []
+
+
+@pytest.mark.parametrize('message, expected', [('4', 'RAV4'), ('a', 'Camry'), ('y', 'Camry'), ('cheapest sedan', 'ES')])
+def test_short_tokens_and_short_names(matcher, message, expected):
+    assert decision(matcher.extract_one(message)) == expected
+
+
+@pytest.fixture(scope='module')
+def trimmed_names():
+    rng = random.Random(2)
+    names = list(NAMES)
+    while len(names) < 400:
+        names.append(f"{rng.choice(NAMES)} {rng.choice(['LX', 'SE', 'GT', 'Sport'])} {rng.randint(100, 99999)}")
+    return list(dict.fromkeys(names))
+
+
+def test_short_messages_match_full_scan(trimmed_names, caplog):
+    caplog.set_level(logging.ERROR)
+    matcher = ModelMatcher(trimmed_names)
+    mismatches = [(message, decision(process.extractOne(message, trimmed_names)), decision(matcher.extract_one(message)))
+                  for message in SHORT_MESSAGES]
+    assert [m for m in mismatches if m[1] != m[2]] == []
+
+
+@pytest.mark.parametrize('message', ['ok', 'yes', 'x5', '4', 'go on'])
+def test_short_messages_score_few_names(trimmed_names, message):
+    assert len(ModelMatcher(trimmed_names).candidates(message)) < 40
+
+
+def test_removed_name_is_not_matched():
+    matcher = ModelMatcher(NAMES)
+    matcher.remove('Camry')
+    assert decision(matcher.extract_one('tell me about the camry')) != 'Camry'
+    assert 'Camry' not in matcher.candidates('a')
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+import weakref
+
+import pytest
+
+import flask_app
+from exchange_rates import ExchangeRates
+
+
+@pytest.fixture
+def rates_file(tmp_path, monkeypatch, catalog):
+    """Writes the rates file behind a fresh flask_app.RATES; the shared catalog gets a fresh price table."""
+    path = tmp_path / 'rates.json'
+
+    def write(bdt):
+        path.write_text(json.dumps({'base': 'USD', 'rates': {'BDT': bdt}}))
+
+    write(100.0)
+    rates = ExchangeRates(str(path), flask_app.EXCHANGE_RATES, check_interval=0, on_change=flask_app.rates_changed)
+    monkeypatch.setattr(flask_app, 'RATES', rates)
+    monkeypatch.setattr(flask_app, '_price_tables', weakref.WeakKeyDictionary())
+    flask_app.price_table(catalog)
+    return write
+
+
+def bdt_price(catalog, row_id):
+    return flask_app.listing_prices(catalog, 'BDT')[row_id]
+
+
+def test_rate_change_rebuilds_in_the_background(rates_file, catalog, monkeypatch):
+    row_id = next(row_id for row_id in range(len(catalog)) if catalog.numbers('Price_Base_USD')[row_id] == 26420)
+    assert bdt_price(catalog, row_id) == '৳2,642,000 BDT'
+
+    started, release = threading.Event(), threading.Event()
+    builds = []
+    build = flask_app.build_price_table
+
+    def slow_build(car_data, rates):
+        builds.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+        return build(car_data, rates)
+
+    monkeypatch.setattr(flask_app, 'build_price_table', slow_build)
+    rates_file(200.0)
+    flask_app.RATES.reload()  # starts the rebuild
+    assert started.wait(5)
+
+    # While it runs, requests keep answering from the previous table and build nothing themselves.
+    answers = []
+    readers = [threading.Thread(target=lambda: answers.append(bdt_price(catalog, row_id))) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join(5)
+    assert answers == ['৳2,642,000 BDT'] * 8
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while bdt_price(catalog, row_id) != '৳5,284,000 BDT' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert bdt_price(catalog, row_id) == '৳5,284,000 BDT'
+    assert builds == ['price-tables']
+
+
+def test_rate_change_empties_the_response_cache_after_the_rebuild(rates_file, client, catalog):
+    ask = lambda: client.post('/ask_batch', json={'messages': [{'message': 'find toyota sedans',
+                                                                 'currency': 'BDT'}]}).get_json()['answers'][0]
+    before = ask()['answer']
+    rates_file(200.0)
+    flask_app.RATES.reload()
+    deadline = time.monotonic() + 5
+    while ask()['answer'] == before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ask()['answer'] != before
+    assert flask_app.price_table(catalog).rates is flask_app.RATES.rates
+
+
+def test_new_catalog_gets_its_table_built_once(rates_file, catalog_csv, monkeypatch):
+    from car_store import CarStore
+    store = CarStore.from_csv(catalog_csv)
+    builds = []
+    build = flask_app.build_price_table
+    monkeypatch.setattr(flask_app, 'build_price_table', lambda car_data, rates: builds.append(1) or build(car_data, rates))
+    readers = [threading.Thread(target=flask_app.listing_prices, args=(store, 'USD')) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join(5)
+    assert builds == [1]
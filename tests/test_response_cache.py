@@ -0,0 +1,144 @@
+import threading
+import time
+
+from response_cache import ResponseCache
+
+
+class Catalog:
+    pass
+
+
+def answer(value, uses_context=False):
+    return lambda: (value, uses_context)
+
+
+def test_hit_after_miss():
+    cache, catalog = ResponseCache(), Catalog()
+    assert cache.get(catalog, 'k', None, answer('a')) == 'a'
+    assert cache.get(catalog, 'k', None, answer('b')) == 'a'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_context_answers_are_kept_per_context():
+    cache, catalog = ResponseCache(), Catalog()
+    cache.get(catalog, 'k', 'Camry', answer('camry', uses_context=True))
+    assert cache.get(catalog, 'k', 'Civic', answer('civic', uses_context=True)) == 'civic'
+    assert cache.get(catalog, 'k', 'Camry', answer('x')) == 'camry'
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache, catalog = ResponseCache(ttl_seconds=10), Catalog()
+    cache.get(catalog, 'k', None, answer('old'))
+    now[0] += 9
+    assert cache.get(catalog, 'k', None, answer('new')) == 'old'
+    now[0] += 2
+    assert cache.get(catalog, 'k', None, answer('new')) == 'new'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, catalog = ResponseCache(max_entries=2), Catalog()
+    cache.get(catalog, 'a', None, answer(1))
+    cache.get(catalog, 'b', None, answer(2))
+    cache.get(catalog, 'a', None, answer(0))
+    cache.get(catalog, 'c', None, answer(3))
+    assert cache.get(catalog, 'a', None, answer(0)) == 1
+    assert cache.get(catalog, 'b', None, answer(0)) == 0
+
+
+def test_identical_requests_are_computed_once():
+    cache, catalog = ResponseCache(), Catalog()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'answer', False
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(catalog, 'k', None, slow))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.coalesced < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['answer'] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_waiters_get_the_error():
+    cache, catalog = ResponseCache(), Catalog()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError('boom')
+
+    errors = []
+
+    def call():
+        try:
+            cache.get(catalog, 'k', None, failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.coalesced < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 3
+    assert cache.get(catalog, 'k', None, answer('ok')) == 'ok'
+
+
+def test_new_catalog_empties_the_cache():
+    cache, old, new = ResponseCache(), Catalog(), Catalog()
+    cache.get(old, 'k', None, answer('old'))
+    assert cache.get(new, 'k', None, answer('new')) == 'new'
+
+
+def test_requests_on_a_replaced_catalog_do_not_clear_the_cache():
+    cache, old, new = ResponseCache(), Catalog(), Catalog()
+    cache.get(old, 'k', None, answer('old'))
+    cache.get(new, 'k', None, answer('new'))
+    assert cache.get(old, 'k', None, answer('from old')) == 'from old'
+    assert cache.get(new, 'k', None, answer('x')) == 'new'
+    assert cache.get(old, 'other', None, answer('from old')) == 'from old'
+    assert cache.get(new, 'other', None, answer('from new')) == 'from new'
+
+
+def test_answer_computed_before_a_clear_is_not_stored():
+    cache, catalog = ResponseCache(), Catalog()
+
+    def compute_then_clear():
+        cache.clear()  # e.g. the rates changed while this answer was being built
+        return 'stale', False
+
+    assert cache.get(catalog, 'k', None, compute_then_clear) == 'stale'
+    assert cache.get(catalog, 'k', None, answer('fresh')) == 'fresh'
+    assert cache.get(catalog, 'k', None, answer('x')) == 'fresh'
+
+
+def test_answer_computed_before_a_reload_is_not_stored():
+    cache, old, new = ResponseCache(), Catalog(), Catalog()
+
+    def compute_then_reload():
+        cache.get(new, 'other', None, answer('new'))
+        return 'old', False
+
+    assert cache.get(old, 'k', None, compute_then_reload) == 'old'
+    assert cache.get(new, 'k', None, answer('new')) == 'new'
@@ -0,0 +1,64 @@
+import http.cookiejar
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="serve.py needs os.fork()")
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def server(tmp_path):
+    """serve.py with two workers and the default (memory) context store setting."""
+    port = free_port()
+    env = {**os.environ, 'CARGENIE_CONTEXT_DB': str(tmp_path / 'contexts.sqlite'), 'CARGENIE_WORKERS': '2',
+           'CARGENIE_PROFILE_DIR': str(tmp_path / 'profiles')}
+    env.pop('CARGENIE_CONTEXT_STORE', None)
+    process = subprocess.Popen([sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}'], cwd=REPO, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f'{url}/metrics', timeout=1).close()
+            break
+        except (urllib.error.URLError, ConnectionError):
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                pytest.fail(f"serve.py did not start:\n{process.communicate()[0]}")
+            time.sleep(0.1)
+    yield url
+    process.terminate()
+    output = process.communicate(timeout=30)[0]
+    assert 'Conversation context is shared by the workers' in output
+
+
+def test_follow_ups_keep_their_context_on_any_worker(server):
+    # Every request opens a new connection, so the two workers take turns at random.
+    for _ in range(3):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def ask(message):
+            request = urllib.request.Request(f'{server}/ask', data=json.dumps({'message': message}).encode(),
+                                             headers={'Content-Type': 'application/json'})
+            with opener.open(request, timeout=10) as response:
+                return json.load(response)['answer']
+
+        assert 'Camry' in ask('tell me about the camry')
+        for _ in range(8):
+            assert 'Camry' in ask('what about its mileage')
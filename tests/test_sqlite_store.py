@@ -0,0 +1,121 @@
+import random
+import shutil
+
+import pytest
+
+import flask_app
+from car_store import CSV_COLUMNS, CarStore
+from sqlite_store import SqliteCarStore, build_database
+
+MESSAGES = [
+    'tell me about the camry', 'price of the mustang in bdt', 'mileage of model y', 'octavia rs price',
+    'show me the cheapest suv', 'most efficient sedan', 'find toyota under $30,000', 'ev over 400 km range',
+    'engine of the 3 series', 'tell me about toyota', 'where is the civic available', '4', 'hello',
+]
+
+
+def same_number(x, y):
+    return x == y or (x != x and y != y)
+
+
+@pytest.fixture(scope='module')
+def database(catalog_csv, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sqlite') / 'cars.sqlite')
+    build_database(catalog_csv, path)
+    store = SqliteCarStore(path)
+    yield store
+    store.close()
+
+
+def test_rows(catalog, database):
+    assert len(database) == len(catalog)
+    assert database.columns == catalog.columns
+    for row_id in range(len(catalog)):
+        assert dict(database[row_id]) == dict(catalog[row_id])
+    for name in ('Year', 'Mileage_kmpl', 'Price_Base_USD'):
+        numbers = database.numbers(name)
+        assert all(same_number(numbers[row_id], value) for row_id, value in enumerate(catalog.numbers(name)))
+    row_ids = random.Random(1).sample(range(len(catalog)), 700)
+    assert database.values('Model', row_ids) == catalog.values('Model', row_ids)
+
+
+def test_lookups(catalog, database):
+    for name in ('Company', 'Type', 'Model'):
+        keys = list(catalog.keys(name))
+        assert list(database.keys(name)) == keys
+        for key in keys[:300]:
+            assert list(database.lookup(name, key)) == list(catalog.lookup(name, key))
+            assert database.find(name, key).row_id == catalog.find(name, key).row_id
+        assert list(database.lookup(name, 'no such key')) == []
+        assert database.find(name, 'no such key') is None
+
+
+def test_rankings(catalog, database):
+    for sort_by in ('price_asc', 'mileage_desc'):
+        for group in [None, *catalog.keys('Type')]:
+            assert database.top(sort_by, group).row_id == catalog.top(sort_by, group).row_id
+
+
+def test_select(catalog, database):
+    rng = random.Random(2)
+    companies, types = list(catalog.keys('Company')), list(catalog.keys('Type'))
+    for _ in range(200):
+        equals = {}
+        if rng.random() < 0.4:
+            equals['Company'] = rng.choice(companies)
+        if rng.random() < 0.4:
+            equals['Type'] = rng.choice(types)
+        conditions = [(rng.choice(['Price_Base_USD', 'Price_TopTrim_USD', 'Mileage_kmpl', 'Engine_CC', 'Year']),
+                       rng.choice(['<', '<=', '>', '>=', '==']), rng.choice([0, 15, 2020, 25000, 40000]))
+                      for _ in range(rng.randint(0, 3))]
+        assert list(database.select(equals, conditions)) == list(catalog.select(equals, conditions))
+
+
+def test_model_matcher(catalog, database):
+    names = list(catalog.keys('Model'))
+    messages = MESSAGES + [f'tell me about the {name}' for name in random.Random(3).sample(names, 30)]
+    assert len(database.model_matcher) == len(catalog.model_matcher)
+    for message in messages:
+        assert database.model_matcher.extract_one(message) == catalog.model_matcher.extract_one(message)
+
+
+def test_answers(catalog, database):
+    for message in MESSAGES:
+        expected = flask_app.answer_message(message, 'Camry', catalog)
+        assert flask_app.answer_message(message, 'Camry', database) == expected
+
+
+def test_read_only(database):
+    with pytest.raises(RuntimeError):
+        database.model_matcher.add('Camry 2')
+
+
+def test_rebuilt_when_the_csv_changes(catalog_csv, tmp_path):
+    csv_path = str(tmp_path / 'cars.csv')
+    shutil.copy(catalog_csv, csv_path)
+    store = SqliteCarStore.open_or_build(csv_path)
+    size = len(store)
+    store.close()
+    with open(csv_path, 'a', encoding='utf-8') as file:
+        file.write('Kia,Niro,2024,20,1600,SUV,27000,36000,Global,,\n')
+    store = SqliteCarStore.open_or_build(csv_path)
+    assert len(store) == size + 1
+    assert store.find('Model', 'Niro') is not None
+    store.close()
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    csv_path = tmp_path / 'cars.csv'
+    csv_path.write_text(','.join(CSV_COLUMNS) + '\n'
+                        'Kia,Niro,2024,20,1600,SUV,27000,36000,Global,,\n'
+                        '\n'
+                        'Kia,EV6,2024,0,0,SUV,42600,52900,Global,,\n'
+                        '\n', encoding='utf-8')
+    memory = CarStore.from_csv(str(csv_path), chunk_rows=1)
+    build_database(str(csv_path), str(tmp_path / 'cars.sqlite'), chunk_rows=1)
+    database = SqliteCarStore(str(tmp_path / 'cars.sqlite'))
+    for store in (memory, database):
+        assert len(store) == 2
+        assert [row['Model'] for row in store] == ['Niro', 'EV6']
+        assert list(store.lookup('Model', '')) == []
+    database.close()
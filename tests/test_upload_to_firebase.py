@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+
+import pytest
+
+from upload_to_firebase import FakeFirestore, read_batches, upload_csv_to_firestore
+
+HEADER = ['Company', 'Model', 'Year', 'Price_Base_USD']
+OPTIONS = {'backoff': 0, 'progress_interval': 3600}
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def cars_csv(tmp_path):
+    rows = [['Make', f'Model {i}', str(2000 + i % 25), str(10000 + i)] for i in range(50)]
+    rows[30] = ['Make', 'Model 3', '2030', '99999']  # a later row for a model from the first batch
+    rows[45] = ['Make', '', '2020', '1']             # no model: skipped
+    return write_csv(tmp_path / 'cars.csv', rows)
+
+
+def expected_documents(csv_path):
+    documents = {}
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            if row['Model']:
+                documents[row['Model']] = {**row, 'Year': float(row['Year']),
+                                           'Price_Base_USD': float(row['Price_Base_USD'])}
+    return documents
+
+
+def test_repeated_model_is_written_once_with_its_last_row(cars_csv):
+    stats = {'skipped': 0, 'replaced': 0}
+    batches = list(read_batches(cars_csv, 7, stats))
+    ids = [model_id for _, documents in batches for model_id, _ in documents]
+    assert len(ids) == len(set(ids)) == 48
+    assert stats == {'skipped': 1, 'replaced': 1}
+    assert [number for number, _ in batches] == list(range(len(batches)))
+    assert all(len(documents) == 7 for _, documents in batches[:-1])
+
+
+@pytest.mark.parametrize('concurrency', [1, 8])
+def test_upload(cars_csv, concurrency):
+    db = FakeFirestore()
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, concurrency=concurrency, **OPTIONS) == 48
+    assert db.collections['cars'] == expected_documents(cars_csv)
+    assert db.collections['cars']['Model 3']['Year'] == 2030.0
+    assert not os.path.exists(f'{cars_csv}.upload-checkpoint.json')
+
+
+def test_failed_batches_are_retried(cars_csv):
+    db = FakeFirestore(fail_rate=0.5, seed=1)
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, max_retries=20, **OPTIONS) == 48
+    assert db.collections['cars'] == expected_documents(cars_csv)
+
+
+def test_resume_from_checkpoint(cars_csv):
+    db = FakeFirestore(fail_rate=0.3, seed=5)  # fails after six batches
+    checkpoint_path = f'{cars_csv}.upload-checkpoint.json'
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, concurrency=1, max_retries=0,
+                                   **OPTIONS) is None
+    with open(checkpoint_path, encoding='utf-8') as file:
+        done_below = json.load(file)['done_below']
+    assert 0 < db.commits == done_below < 10
+
+    db.fail_rate = 0
+    commits = db.commits
+    written = upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, concurrency=1, **OPTIONS)
+    assert written == 48 - 5 * done_below
+    assert db.commits - commits == 10 - done_below  # committed batches are not uploaded again
+    assert db.collections['cars'] == expected_documents(cars_csv)
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_checkpoint_for_other_settings_is_ignored(cars_csv):
+    db = FakeFirestore(fail_rate=0.3, seed=5)  # fails after six batches
+    upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, concurrency=1, max_retries=0, **OPTIONS)
+    db.fail_rate = 0
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=6, **OPTIONS) == 48
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, **OPTIONS) == 48
+
+
+def test_restart_uploads_everything(cars_csv):
+    db = FakeFirestore(fail_rate=0.3, seed=5)  # fails after six batches
+    upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, concurrency=1, max_retries=0, **OPTIONS)
+    db.fail_rate = 0
+    assert upload_csv_to_firestore(db, cars_csv, 'cars', batch_size=5, restart=True, **OPTIONS) == 48
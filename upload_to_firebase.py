@@ -1,23 +1,43 @@
+import argparse
 import csv
-import firebase_admin
-from firebase_admin import credentials, firestore
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURATION ---
 # This is the file you downloaded from Google
-SERVICE_ACCOUNT_FILE = 'serviceAccountKey.json' 
+SERVICE_ACCOUNT_FILE = 'serviceAccountKey.json'
 # This is the name of the "collection" (like a folder) we will create in Firebase
-COLLECTION_NAME = 'cars' 
+COLLECTION_NAME = 'cars'
 # This is your local CSV file
-CSV_FILE_PATH = 'cars.csv' 
+CSV_FILE_PATH = 'cars.csv'
+# Firestore commits at most 500 writes per batch
+BATCH_SIZE = 500
+# How many batches are committed at the same time
+CONCURRENCY = 8
+# How often a failed batch is retried, waiting RETRY_BACKOFF * 2**attempt seconds (plus jitter) in between
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5.0
 # --- END OF CONFIGURATION ---
 
-def upload_csv_to_firestore():
-    """
-    Reads a CSV file and uploads its data to a Firestore collection.
-    Each row in the CSV becomes a new "document" (car) in the collection.
+NUMERIC_FIELDS = ['Mileage_kmpl', 'Engine_CC', 'Price_Base_USD', 'Price_TopTrim_USD', 'Year']
+
+
+def connect_to_firestore():
+    """Returns a Firestore client, or None if Firebase could not be initialized.
+
+    Set FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) to upload to the local emulator instead.
     """
-    
-    # 1. Initialize Firebase Admin SDK
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     try:
         # Check if the app is already initialized to avoid errors
         if not firebase_admin._apps:
@@ -29,56 +49,417 @@ def upload_csv_to_firestore():
     except Exception as e:
         print(f"Error initializing Firebase: {e}")
         print("Please make sure your 'serviceAccountKey.json' file is in the correct folder.")
-        return
-
-    db = firestore.client()
-    collection_ref = db.collection(COLLECTION_NAME)
-    
-    print(f"Starting upload of '{CSV_FILE_PATH}' to Firestore collection '{COLLECTION_NAME}'...")
-    
-    # 2. Read the CSV file
-    try:
-        with open(CSV_FILE_PATH, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            count = 0
-            # 3. Loop through each row (car) in the CSV
-            for row in reader:
-                # Get the car model as the "ID" for the document
-                # This makes sure we don't upload duplicate cars
-                model_id = row.get('Model')
-                if not model_id:
-                    print("Skipping row with no model.")
-                    continue
-                
-                # Convert numeric strings to actual numbers (float)
-                # This is better for sorting by price/mileage later
-                data_to_upload = {}
-                for key, value in row.items():
-                    if key in ['Mileage_kmpl', 'Engine_CC', 'Price_Base_USD', 'Price_TopTrim_USD', 'Year']:
-                        try:
-                            # Try to convert to float
-                            data_to_upload[key] = float(value)
-                        except (ValueError, TypeError):
-                            data_to_upload[key] = value # Keep as string if it's not a number
-                    else:
-                        data_to_upload[key] = value
-                
-                # 4. Upload the car data to Firebase
+        return None
+    return firestore.client()
+
+
+# --- In-process fake client ---
+class FakeFirestore:
+    """Just enough of the Firestore client for the uploader: collection().document(), batch().set().commit().
+
+    Documents end up in self.collections[name][doc_id]. With fail_rate > 0 a commit
+    fails at random before writing anything, like a real batch, to exercise the retries.
+    """
+    def __init__(self, fail_rate=0.0, seed=None):
+        self.collections = {}
+        self.commits = 0
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+
+class _FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, doc_id):
+        return (self.name, doc_id)
+
+
+class _FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, reference, data):
+        self.writes.append((reference, dict(data)))
+
+    def delete(self, reference):
+        self.writes.append((reference, None))
+
+    def commit(self):
+        client = self.client
+        with client._lock:
+            if client._random.random() < client.fail_rate:
+                raise ConnectionError("simulated Firestore outage")
+            for (collection, doc_id), data in self.writes:
+                documents = client.collections.setdefault(collection, {})
+                if data is None:
+                    documents.pop(doc_id, None)
+                else:
+                    documents[doc_id] = data
+            client.commits += 1
+
+
+# --- Reading the CSV ---
+def car_document(row):
+    """(document id, data) for one CSV row, or None if the row has no model."""
+    # Get the car model as the "ID" for the document
+    # This makes sure we don't upload duplicate cars
+    model_id = row.get('Model')
+    if not model_id:
+        return None
+    # Convert numeric strings to actual numbers (float)
+    # This is better for sorting by price/mileage later
+    data_to_upload = {}
+    for key, value in row.items():
+        if key in NUMERIC_FIELDS:
+            try:
+                data_to_upload[key] = float(value)
+            except (ValueError, TypeError):
+                data_to_upload[key] = value # Keep as string if it's not a number
+        else:
+            data_to_upload[key] = value
+    return model_id, data_to_upload
+
+
+def read_documents(csv_path, stats):
+    """Yields (document id, data) for every row with a model, streaming the CSV."""
+    with open(csv_path, mode='r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file):
+            document = car_document(row)
+            if document is None:
+                stats['skipped'] += 1
+                continue
+            yield document
+
+
+def read_batches(csv_path, batch_size, stats):
+    """Yields (batch number, [(document id, data)]) in file order, streaming the CSV.
+
+    Batches commit in parallel, so a model listed more than once is only put in the
+    batch of its last row, which is what a row-by-row upload would have left behind.
+    """
+    # First pass: the position of each model's last row.
+    last_rows = {}
+    for position, (model_id, _) in enumerate(read_documents(csv_path, {'skipped': 0})):
+        last_rows[model_id] = position
+    batch = []
+    number = 0
+    for position, (model_id, data) in enumerate(read_documents(csv_path, stats)):
+        if last_rows.get(model_id) != position:
+            stats['replaced'] += 1
+            continue
+        batch.append((model_id, data))
+        if len(batch) == batch_size:
+            yield number, batch
+            batch = []
+            number += 1
+    if batch:
+        yield number, batch
+
+
+# --- Checkpoint ---
+class UploadCheckpoint:
+    """Which batches of a CSV are already in Firestore, saved to a JSON file after every batch.
+
+    It only applies to the same file (size and mtime), collection and batch size;
+    anything else starts the upload from the beginning.
+    """
+    def __init__(self, path, csv_path, collection_name, batch_size):
+        stat = os.stat(csv_path)
+        self.path = path
+        # 'layout' changes whenever read_batches starts grouping rows differently.
+        self.source = {'csv': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                       'collection': collection_name, 'batch_size': batch_size, 'layout': 2}
+        self.done_below = 0    # every batch before this one is committed
+        self.done = set()      # committed batches at or after done_below
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Picks up a previous run's progress. Returns True if there was any."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if saved.get('source') != self.source:
+            print(f"Checkpoint '{self.path}' is for another file or settings; starting from the beginning.")
+            return False
+        self.done_below = saved['done_below']
+        self.done = set(saved['done'])
+        return True
+
+    def is_done(self, number):
+        return number < self.done_below or number in self.done
+
+    def mark_done(self, number):
+        with self._lock:
+            self.done.add(number)
+            while self.done_below in self.done:
+                self.done.remove(self.done_below)
+                self.done_below += 1
+            state = {'source': self.source, 'done_below': self.done_below, 'done': sorted(self.done)}
+            temporary_path = f'{self.path}.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+            os.replace(temporary_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# --- Upload ---
+def commit_batch(db, collection_name, documents, max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF):
+    """Writes one batch atomically, retrying with exponential backoff. Re-raises the last error.
+
+    documents is a list of (document id, data); data None deletes the document.
+    """
+    collection_ref = db.collection(collection_name)
+    for attempt in range(max_retries + 1):
+        batch = db.batch()
+        for model_id, data in documents:
+            if data is None:
+                batch.delete(collection_ref.document(model_id))
+            else:
                 # We use .set() to create or overwrite the document
-                collection_ref.document(model_id).set(data_to_upload)
-                print(f"  -> Uploaded/Updated: {model_id}")
-                count += 1
-                
-            print(f"\nUpload complete! Successfully uploaded/updated {count} cars.")
-
-    except FileNotFoundError:
-        print(f"Error: The file '{CSV_FILE_PATH}' was not found.")
+                batch.set(collection_ref.document(model_id), data)
+        try:
+            batch.commit()
+            return
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"  -> Batch failed ({e}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+def commit_batches(db, collection_name, batches, on_committed, concurrency=CONCURRENCY, max_retries=MAX_RETRIES,
+                   backoff=RETRY_BACKOFF, progress_interval=PROGRESS_INTERVAL):
+    """Commits (batch number, documents) pairs with up to concurrency in flight; returns the writes made.
+
+    on_committed(number, documents) runs after each batch is in Firestore. The first
+    batch that still fails after its retries stops the run and its error is raised.
+    """
+    written = 0
+    started = last_report = time.monotonic()
+
+    def commit(number, documents):
+        commit_batch(db, collection_name, documents, max_retries, backoff)
+        on_committed(number, documents)
+        return len(documents)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Keep a bounded number of batches in flight so the CSV is streamed, not read whole.
+        pending = deque()
+        for number, documents in batches:
+            pending.append(executor.submit(commit, number, documents))
+            while len(pending) >= concurrency * 2 or (pending and pending[0].done()):
+                written += pending.popleft().result()
+            if time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                print(f"  ... {written:,} writes committed ({written / (last_report - started):,.0f}/s)")
+        while pending:
+            written += pending.popleft().result()
+    return written
+
+
+def upload_csv_to_firestore(db=None, csv_path=CSV_FILE_PATH, collection_name=COLLECTION_NAME,
+                            batch_size=BATCH_SIZE, concurrency=CONCURRENCY, checkpoint_path=None,
+                            restart=False, max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF,
+                            progress_interval=PROGRESS_INTERVAL):
+    """
+    Reads a CSV file and uploads its data to a Firestore collection.
+    Each row in the CSV becomes a new "document" (car) in the collection.
+
+    Rows are written in batches of up to batch_size, with up to concurrency batches
+    in flight. Committed batches are recorded in a checkpoint file (by default next
+    to the CSV), so running again after a failure only uploads what is missing; the
+    file is deleted once everything is uploaded. A model listed more than once is
+    written once, with its last row.
+    Returns the number of documents written in this run, or None on failure.
+    """
+    if db is None:
+        db = connect_to_firestore()
+        if db is None:
+            return None
+    batch_size = max(1, min(batch_size, BATCH_SIZE))
+    if not os.path.exists(csv_path):
+        print(f"Error: The file '{csv_path}' was not found.")
+        return None
+
+    checkpoint = UploadCheckpoint(checkpoint_path or f'{csv_path}.upload-checkpoint.json',
+                                  csv_path, collection_name, batch_size)
+    if restart:
+        checkpoint.remove()
+    elif checkpoint.load():
+        print(f"Resuming from '{checkpoint.path}': the first {checkpoint.done_below} batches are already uploaded.")
+
+    print(f"Starting upload of '{csv_path}' to Firestore collection '{collection_name}'...")
+    stats = {'skipped': 0, 'replaced': 0}
+    already_uploaded = 0
+    started = time.monotonic()
+
+    def batches_to_upload():
+        nonlocal already_uploaded
+        for number, documents in read_batches(csv_path, batch_size, stats):
+            if checkpoint.is_done(number):
+                already_uploaded += len(documents)
+            else:
+                yield number, documents
+
+    try:
+        written = commit_batches(db, collection_name, batches_to_upload(),
+                                 lambda number, documents: checkpoint.mark_done(number),
+                                 concurrency, max_retries, backoff, progress_interval)
     except Exception as e:
         print(f"An error occurred during upload: {e}")
+        print(f"Run again to resume from '{checkpoint.path}'; committed batches are not uploaded twice.")
+        return None
+
+    checkpoint.remove()
+    seconds = time.monotonic() - started
+    print(f"\nUpload complete! Successfully uploaded/updated {written:,} cars in {seconds:.1f}s"
+          + (f" ({already_uploaded:,} were already uploaded)" if already_uploaded else "")
+          + (f"; {stats['replaced']} rows were replaced by a later row for the same model" if stats['replaced'] else "")
+          + (f"; skipped {stats['skipped']} rows with no model." if stats['skipped'] else "."))
+    return written
+
+
+# --- Incremental sync ---
+def content_hash(data):
+    return hashlib.blake2b(json.dumps(data, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def load_manifest(path, collection_name):
+    """{document id: content hash} of what the last sync left in the collection ({} if unknown)."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            saved = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if saved.get('collection') != collection_name:
+        print(f"Manifest '{path}' is for collection '{saved.get('collection')}'; syncing everything.")
+        return {}
+    return saved['documents']
+
+
+def save_manifest(path, collection_name, documents):
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump({'collection': collection_name, 'documents': documents}, file, separators=(',', ':'))
+    os.replace(temporary_path, path)
+
+
+def sync_csv_to_firestore(db=None, csv_path=CSV_FILE_PATH, collection_name=COLLECTION_NAME, manifest_path=None,
+                          delete_removed=False, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                          max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF, progress_interval=PROGRESS_INTERVAL):
+    """
+    Brings a Firestore collection in line with the CSV, writing only what changed.
+
+    A local manifest keeps a content hash per document from the last sync, so only
+    new and changed rows are uploaded, and with delete_removed documents whose model
+    is gone from the CSV are deleted. Without a manifest everything is uploaded once.
+    The manifest assumes nobody else edits the collection; use the plain upload to
+    rewrite everything. Returns the number of writes made, or None on failure.
+    """
+    if db is None:
+        db = connect_to_firestore()
+        if db is None:
+            return None
+    batch_size = max(1, min(batch_size, BATCH_SIZE))
+    if not os.path.exists(csv_path):
+        print(f"Error: The file '{csv_path}' was not found.")
+        return None
+    manifest_path = manifest_path or os.path.join(os.path.dirname(csv_path), f'{collection_name}.sync-manifest.json')
+    synced = load_manifest(manifest_path, collection_name)
+
+    # First pass: the final content of every document (the last row wins for a repeated model).
+    stats = {'skipped': 0}
+    wanted = {model_id: content_hash(data) for model_id, data in read_documents(csv_path, stats)}
+    changed = {model_id for model_id, digest in wanted.items() if synced.get(model_id) != digest}
+    removed = [model_id for model_id in synced if model_id not in wanted] if delete_removed else []
+    print(f"Syncing '{csv_path}' to '{collection_name}': {len(changed):,} new or changed, "
+          f"{len(removed):,} to delete, {len(wanted) - len(changed):,} unchanged.")
+
+    def batches_to_write():
+        # Second pass streams the rows again and picks up the changed ones, each model once.
+        batch, number = [], 0
+        for model_id, data in read_documents(csv_path, {'skipped': 0}) if changed else ():
+            if model_id in changed and content_hash(data) == wanted[model_id]:
+                changed.discard(model_id)
+                batch.append((model_id, data))
+                if len(batch) == batch_size:
+                    yield number, batch
+                    batch, number = [], number + 1
+        for model_id in removed:
+            batch.append((model_id, None))
+            if len(batch) == batch_size:
+                yield number, batch
+                batch, number = [], number + 1
+        if batch:
+            yield number, batch
+
+    lock = threading.Lock()
+    def record(number, documents):
+        with lock:
+            for model_id, data in documents:
+                if data is None:
+                    synced.pop(model_id, None)
+                else:
+                    synced[model_id] = wanted[model_id]
+
+    started = time.monotonic()
+    try:
+        written = commit_batches(db, collection_name, batches_to_write(), record,
+                                 concurrency, max_retries, backoff, progress_interval)
+    except Exception as e:
+        print(f"An error occurred during sync: {e}")
+        print("Batches committed so far are kept in the manifest; run again to sync the rest.")
+        return None
+    finally:
+        # Also after a failure, so the next run does not redo what was committed.
+        with lock:
+            save_manifest(manifest_path, collection_name, synced)
+
+    print(f"\nSync complete! {written:,} writes in {time.monotonic() - started:.1f}s"
+          + (f"; skipped {stats['skipped']} rows with no model." if stats['skipped'] else "."))
+    return written
+
 
 # --- Run the uploader script ---
-if __name__ == "__main__":
-    upload_csv_to_firestore()
+def main():
+    parser = argparse.ArgumentParser(description="Upload cars.csv to a Firestore collection.")
+    parser.add_argument('csv_path', nargs='?', default=CSV_FILE_PATH)
+    parser.add_argument('--collection', default=COLLECTION_NAME)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f"documents per batch (at most {BATCH_SIZE})")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="batches committed at the same time")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <csv>.upload-checkpoint.json)")
+    parser.add_argument('--restart', action='store_true', help="ignore any checkpoint and upload everything")
+    parser.add_argument('--fake', action='store_true', help="upload to an in-process fake instead of Firestore")
+    parser.add_argument('--sync', action='store_true', help="only write rows that changed since the last sync")
+    parser.add_argument('--manifest', help="sync manifest file (default: <collection>.sync-manifest.json next to the CSV)")
+    parser.add_argument('--delete-removed', action='store_true',
+                        help="with --sync, delete documents whose model is no longer in the CSV")
+    args = parser.parse_args()
 
+    db = FakeFirestore() if args.fake else None
+    if args.sync:
+        sync_csv_to_firestore(db, args.csv_path, args.collection, args.manifest, args.delete_removed,
+                              args.batch_size, args.concurrency)
+    else:
+        upload_csv_to_firestore(db, args.csv_path, args.collection, args.batch_size, args.concurrency,
+                                args.checkpoint, args.restart)
 
+
+if __name__ == "__main__":
+    main()